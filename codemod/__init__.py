@@ -0,0 +1,20 @@
+"""Shared engine for the fix_*.py / replace_*.py codemod scripts"""
+
+from codemod.cache import Manifest, ruleset_version
+from codemod.cli import diagnostic_windows, parse_args, print_undo, write_profile
+from codemod.csharp import ShouldRewriter, Tokens
+from codemod.diagnostics import DiagnosticIndex
+from codemod.journal import Journal
+from codemod.jsonscript import ScriptConverter
+from codemod.plan import Plan
+from codemod.registry import Registry
+from codemod.rules import Rule, RuleSet
+from codemod.structure import RewriteRejected
+from codemod.symbols import SymbolIndex, symbol_index
+from codemod.transaction import Transaction
+from codemod.walker import find_files, rewrite_files
+
+__all__ = ['DiagnosticIndex', 'Journal', 'Manifest', 'Plan', 'Registry', 'RewriteRejected', 'Rule', 'RuleSet',
+           'ScriptConverter', 'ShouldRewriter', 'SymbolIndex', 'Tokens', 'Transaction', 'diagnostic_windows',
+           'find_files', 'parse_args', 'print_undo', 'rewrite_files', 'ruleset_version', 'symbol_index',
+           'write_profile']
@@ -0,0 +1,225 @@
+"""Benchmark the codemod transforms on a synthetic corpus.
+
+    python -m codemod.bench [--files N] [--size BYTES] [--save-baseline]
+    python -m codemod.bench --io-latency MS [--prefetch N]
+
+Each transform runs in a fresh process so its peak RSS is its own. Results
+are compared against the stored baseline (when it was measured on the same
+corpus); a transform slower than the baseline by more than --tolerance makes
+the run exit with status 1.
+
+With --io-latency, each target instead rewrites the corpus on disk through a
+SlowFileSystem (every read and staged write delayed by that latency), once
+with the serial loop and once with the read-ahead / write-behind pipeline.
+"""
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from codemod.corpus import generate_corpus, write_corpus
+from codemod.pipeline import DEPTH, SlowFileSystem
+from codemod.walker import rewrite_files
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# name -> (module, transform function, rule set attribute or None)
+TARGETS = {
+    'fix_all_should': ('fix_all_should', 'fix_all_should_patterns', 'RULES'),
+    'fix_complex_should': ('fix_complex_should', 'fix_complex_should_patterns', 'RULES'),
+    'fix_final_should': ('fix_final_should', 'fix_all_should_patterns', 'RULES'),
+    'migrate_should': ('migrate_should', 'migrate_should_patterns', 'PIPELINE'),
+    'replace_quotes': ('replace_quotes', 'replace_double_quotes_in_json', None),
+    'replace_all_quotes': ('replace_all_quotes', 'replace_double_quotes_comprehensive', None),
+}
+
+BASELINE = '.codemod-bench.json'
+
+
+def _peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak  # bytes on macOS, KiB elsewhere
+
+
+def _best_time(function, contents, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for content in contents:
+            function(content)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _named_rules(rule_set):
+    """(name, rule) of each rule; a Pipeline's names are prefixed with their stage, as in its profile"""
+    stages = getattr(rule_set, 'stages', None)
+    if stages is not None:
+        return [(f'{stage}.{rule.name}', rule) for stage, transform in stages for rule in transform.rules]
+    return [(rule.name, rule) for rule in getattr(rule_set, 'rules', ())]
+
+
+def run_target(name, files, size, seed, repeat):
+    """Measure one target in this process; returns a JSON-serializable dict"""
+    module_name, function_name, rules_name = TARGETS[name]
+    module = importlib.import_module(module_name)
+    transform = getattr(module, function_name)
+    contents = [content for _, content in generate_corpus(files, size, seed)]
+    total_bytes = sum(len(content.encode('utf-8')) for content in contents)
+
+    seconds = _best_time(transform, contents, repeat)
+
+    # Cost of each rule as a standalone pass over the corpus
+    rules = {}
+    rule_set = getattr(module, rules_name) if rules_name else None
+    for rule_name, rule in _named_rules(rule_set):
+        regex = getattr(rule, 'regex', None)
+        if regex is not None:
+            rules[rule_name] = _best_time(lambda content: regex.subn(rule.replacement, content), contents, repeat)
+
+    return {
+        'files': len(contents),
+        'bytes': total_bytes,
+        'seconds': seconds,
+        'files_per_s': len(contents) / seconds if seconds else None,
+        'mb_per_s': total_bytes / 1e6 / seconds if seconds else None,
+        'peak_rss_kb': _peak_rss_kb(),
+        'rules': rules,
+    }
+
+
+def run_io(name, files, size, seed, latency, bandwidth, prefetch):
+    """Seconds to rewrite the corpus on a SlowFileSystem, serially and pipelined"""
+    module_name, function_name, _ = TARGETS[name]
+    transform = getattr(importlib.import_module(module_name), function_name)
+    fs = SlowFileSystem(latency, bandwidth)
+    seconds = {}
+    for mode, depth in (('serial', None), ('pipelined', prefetch)):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = write_corpus(directory, files, size, seed)
+            start = time.perf_counter()
+            for _ in rewrite_files(paths, transform, workers=1, prefetch=depth, fs=fs):
+                pass
+            seconds[mode] = time.perf_counter() - start
+    return seconds
+
+
+def _report_io(results, latency):
+    print(f"{'target':<22}{'serial s':>10}{'pipelined s':>13}{'speedup':>9}   ({latency * 1000:g} ms per I/O)")
+    for name, seconds in results.items():
+        print(f"{name:<22}{seconds['serial']:>10.2f}{seconds['pipelined']:>13.2f}"
+              f"{seconds['serial'] / seconds['pipelined']:>8.1f}x")
+
+
+def run(targets, files, size, seed, repeat):
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    for name in targets:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results[name] = pool.submit(run_target, name, files, size, seed, repeat).result()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Lines describing each target against the baseline, and whether any regressed"""
+    lines = []
+    regressed = False
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None or not before.get('seconds'):
+            continue
+        ratio = result['seconds'] / before['seconds']
+        flag = ''
+        if ratio > 1 + tolerance:
+            flag = '  REGRESSION'
+            regressed = True
+        lines.append(f"  {name}: {before['seconds'] * 1000:.1f} ms -> {result['seconds'] * 1000:.1f} ms "
+                     f"({ratio:.2f}x){flag}")
+    return lines, regressed
+
+
+def _report(results, hot_rules):
+    print(f"{'target':<22}{'files/s':>10}{'MB/s':>9}{'ms':>10}{'peak RSS':>12}")
+    for name, result in results.items():
+        rss = f"{result['peak_rss_kb'] / 1024:.1f} MB" if result['peak_rss_kb'] is not None else 'n/a'
+        print(f"{name:<22}{result['files_per_s']:>10.0f}{result['mb_per_s']:>9.2f}"
+              f"{result['seconds'] * 1000:>10.1f}{rss:>12}")
+        rules = sorted(result['rules'].items(), key=lambda item: -item[1])
+        for rule, seconds in rules[:hot_rules]:
+            print(f"    {rule:<34}{seconds * 1000:>8.2f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the codemod transforms on a synthetic corpus")
+    parser.add_argument('--files', type=int, default=200, help='number of generated files')
+    parser.add_argument('--size', type=int, default=16 * 1024, help='approximate size of each file in bytes')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measurement; the best is kept')
+    parser.add_argument('--target', action='append', choices=sorted(TARGETS), help='benchmark only these')
+    parser.add_argument('--hot-rules', type=int, default=5, help='slowest rules to list per target')
+    parser.add_argument('--baseline', default=BASELINE, help='stored results to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.20, help='allowed slowdown before failing')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    parser.add_argument('--io-latency', type=float, metavar='MS',
+                        help='compare serial and pipelined rewrites on a filesystem this slow per read/write')
+    parser.add_argument('--bandwidth', type=float, default=50, help='MB/s of the slowed filesystem')
+    parser.add_argument('--prefetch', type=int, default=DEPTH, help='read-ahead depth of the pipelined run')
+    args = parser.parse_args(argv)
+
+    # The converter scripts live next to the codemod package
+    sys.path.insert(0, os.getcwd())
+    if args.io_latency is not None:
+        latency = args.io_latency / 1000
+        results = {name: run_io(name, args.files, args.size, args.seed, latency, args.bandwidth * 1e6, args.prefetch)
+                   for name in args.target or list(TARGETS)}
+        if args.json:
+            print(json.dumps(results, indent=2))
+        else:
+            _report_io(results, latency)
+        return 0
+
+    corpus = {'files': args.files, 'size': args.size, 'seed': args.seed}
+    results = run(args.target or list(TARGETS), args.files, args.size, args.seed, args.repeat)
+
+    if args.json:
+        print(json.dumps({'corpus': corpus, 'results': results}, indent=2))
+    else:
+        _report(results, args.hot_rules)
+
+    regressed = False
+    try:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    except (OSError, ValueError):
+        baseline = None
+    if baseline is not None and not args.save_baseline:
+        if baseline.get('corpus') != corpus:
+            print(f"\nBaseline {args.baseline} was measured on a different corpus; not comparing", file=sys.stderr)
+        else:
+            lines, regressed = compare(results, baseline['results'], args.tolerance)
+            print(f"\nCompared with {args.baseline}:", file=sys.stderr)
+            for line in lines:
+                print(line, file=sys.stderr)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'corpus': corpus, 'results': results}, f, indent=2)
+        print(f"\nSaved baseline to {args.baseline}", file=sys.stderr)
+
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+import hashlib
+import marshal
+import os
+from array import array
+
+# Bump when the on-disk layout changes; older manifests are then discarded
+FORMAT = 2
+
+DIGEST_SIZE = 16
+
+# The modules whose code decides what a ruleset's rules rewrite (matching, prefiltering, time-boxing,
+# tokenizing); editing any of them changes every ruleset's version
+ENGINE_MODULES = ('csharp.py', 'jsonscript.py', 'prefilter.py', 'registry.py', 'rules.py')
+
+_engine = None
+
+
+def digest(data):
+    """Content hash stored in the manifest (16-byte BLAKE2b)"""
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE).digest()
+
+
+def _code_fingerprint(code):
+    # marshal output of code objects is not stable across processes, so hash the parts that matter
+    consts = tuple(_code_fingerprint(const) if hasattr(const, 'co_code') else const
+                   for const in code.co_consts)
+    return code.co_code, consts, code.co_names
+
+
+def engine_version():
+    """Hash of the source of ENGINE_MODULES, read once per process"""
+    global _engine
+    if _engine is None:
+        hasher = hashlib.blake2b(digest_size=8)
+        directory = os.path.dirname(os.path.abspath(__file__))
+        for name in ENGINE_MODULES:
+            with open(os.path.join(directory, name), 'rb') as f:
+                hasher.update(f.read())
+        _engine = hasher.digest()
+    return _engine
+
+
+def ruleset_version(transform):
+    """Version string for a transform: changes whenever its rules or code change.
+
+    For a ruleset (a RuleSet, ShouldRewriter or Pipeline) the code is the
+    engine that runs the rules, so its version covers engine_version too.
+    """
+    rules = getattr(transform, 'rules', None)
+    if rules is not None:
+        # A time-boxed rule (see Rule.max_window) rewrites less than the same rule without the limit
+        source = engine_version() + repr([(rule.name, rule.pattern, rule.replacement)
+                                          + ((rule.max_window,) if getattr(rule, 'max_window', None) else ())
+                                          for rule in rules]).encode('utf-8')
+    else:
+        source = repr(_code_fingerprint(transform.__code__)).encode('utf-8')
+    return hashlib.blake2b(source, digest_size=8).hexdigest()
+
+
+class Manifest:
+    """Persistent per-file record of (size, mtime, content hash, ruleset version).
+
+    Entries are grouped by ruleset name and tagged with the ruleset version, so
+    bumping one script's version only invalidates that script's entries. Each
+    group is stored column-wise (one NUL-joined path string plus packed
+    integer/hash arrays) so 100k entries load in tens of milliseconds; a group
+    is only unpacked when a script asks for it.
+    """
+
+    def __init__(self, path, sections=None):
+        self.path = path
+        self._packed = sections if sections is not None else {}
+        self._sections = {}
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, 'rb') as f:
+                layout, sections = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return cls(path)
+        if layout != FORMAT:
+            return cls(path)
+        return cls(path, sections)
+
+    def save(self):
+        sections = dict(self._packed)
+        for name, section in self._sections.items():
+            sections[name] = section.pack()
+
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            marshal.dump((FORMAT, sections), f)
+        os.replace(temp_path, self.path)
+
+    def section(self, name, version):
+        """View of the manifest for one ruleset at one version.
+
+        Entries recorded under a different version of the ruleset are discarded.
+        """
+        section = self._sections.get(name)
+        if section is None or section.version != version:
+            packed = self._packed.pop(name, None)
+            if packed is not None and packed[0] != version:
+                packed = None
+            section = self._sections[name] = ManifestSection(version, packed)
+        return section
+
+
+class ManifestSection:
+    def __init__(self, version, packed=None):
+        self.version = version
+        if packed is None:
+            self.paths = []
+            self.sizes = array('q')
+            self.mtimes = array('q')
+            self.digests = bytearray()
+        else:
+            _, paths, sizes, mtimes, digests = packed
+            self.paths = paths.split('\0') if paths else []
+            self.sizes = array('q', sizes)
+            self.mtimes = array('q', mtimes)
+            self.digests = bytearray(digests)
+        self.index = dict(zip(self.paths, range(len(self.paths))))
+
+    def pack(self):
+        return (self.version, '\0'.join(self.paths), self.sizes.tobytes(),
+                self.mtimes.tobytes(), bytes(self.digests))
+
+    def is_fresh(self, path):
+        """True if path is unchanged since it was last processed by this ruleset version"""
+        i = self.index.get(path)
+        if i is None:
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return self.sizes[i] == stat.st_size and self.mtimes[i] == stat.st_mtime_ns
+
+    def known_digest(self, path):
+        """Content hash last seen for path under this ruleset version, if any"""
+        i = self.index.get(path)
+        if i is None:
+            return None
+        return bytes(self.digests[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE])
+
+    def record(self, path, content_hash):
+        stat = os.stat(path)
+        i = self.index.get(path)
+        if i is None:
+            self.index[path] = len(self.paths)
+            self.paths.append(path)
+            self.sizes.append(stat.st_size)
+            self.mtimes.append(stat.st_mtime_ns)
+            self.digests += content_hash
+        else:
+            self.sizes[i] = stat.st_size
+            self.mtimes[i] = stat.st_mtime_ns
+            self.digests[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE] = content_hash
@@ -0,0 +1,100 @@
+import argparse
+import os
+import sys
+
+from codemod.diagnostics import WINDOW, DiagnosticIndex
+from codemod.structure import validate
+
+
+def parse_args(description, argv=None, profile=False, diagnostics=None):
+    """Command-line options shared by the fix_*.py / replace_*.py scripts.
+
+    args.log is where progress messages go: stderr in dry runs, so stdout
+    carries only the diff. args.validator checks every rewrite before it is
+    written (see codemod/structure.py), unless --no-validate is given.
+    args.plan is where --plan saves the edits (see codemod/plan.py). With
+    profile, the per-rule instrumentation options are added too (see
+    write_profile). With diagnostics (the default build
+    logs), --diagnostics/--code/--window select the flagged lines to rewrite
+    (see diagnostic_windows), and --all rewrites every file instead.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument('--dry-run', action='store_true',
+                        help='write a unified diff of the changes to stdout instead of modifying files')
+    output.add_argument('--plan', metavar='PATH',
+                        help='save the edits as an edit plan instead of modifying files '
+                             '(review and apply it with python -m codemod.replay)')
+    parser.add_argument('--no-validate', action='store_true',
+                        help='write rewrites even if they leave brackets, literals or Assert calls broken')
+    parser.add_argument('--prefetch', type=int, metavar='N',
+                        help='read up to N files ahead and write behind, for slow or network-mounted trees')
+    if profile:
+        parser.add_argument('--profile', action='store_true',
+                            help='time every rule on its own and print the most expensive ones at the end')
+        parser.add_argument('--stats', metavar='PATH',
+                            help='write per-rule invocations, matches, bytes scanned and time as JSON')
+    if diagnostics is not None:
+        selection = parser.add_mutually_exclusive_group()
+        selection.add_argument('--diagnostics', metavar='LOG', action='append',
+                               help=f"build log whose errors select the files and lines to rewrite; if it flags "
+                                    f"none, nothing is rewritten (repeatable; default: {', '.join(diagnostics)})")
+        selection.add_argument('--all', action='store_true',
+                               help='rewrite every file under the test directory, whole, instead of the flagged lines')
+        parser.add_argument('--code', action='append', help='only errors with this code, e.g. CS1061 (repeatable)')
+        parser.add_argument('--window', type=int, default=WINDOW,
+                            help='lines rewritten on each side of a flagged line')
+    args = parser.parse_args(argv)
+    if diagnostics is not None and args.diagnostics is None:
+        args.diagnostics = list(diagnostics)
+    args.log = sys.stderr if args.dry_run else sys.stdout
+    args.validator = None if args.no_validate else validate
+    return args
+
+
+def write_profile(args, transform):
+    """Write the JSON report and/or hot-rule summary requested on the command line"""
+    if getattr(args, 'stats', None):
+        transform.profile.write_json(args.stats)
+    if getattr(args, 'profile', False):
+        print("\nRule profile:", file=args.log)
+        print(transform.profile.summary(), file=args.log)
+
+
+def diagnostic_windows(args, root):
+    """path -> line spans flagged under root in the build logs given on the command line.
+
+    Paths are compared as os.path.normcase(os.path.abspath(...)), so the
+    case the build wrote them in does not matter on Windows. Logs that do not
+    exist are skipped with a warning. If the logs flag nothing under root for
+    the selected codes (a clean build, or a stale log), an error is printed
+    and the map is empty: the caller rewrites nothing and exits non-zero.
+    With --all, the logs are not read and None is returned: the caller then
+    rewrites every file under root.
+    """
+    if args.all:
+        return None
+    logs = []
+    for log in args.diagnostics:
+        if os.path.exists(log):
+            logs.append(log)
+        else:
+            print(f"Warning: build log {log} not found", file=sys.stderr)
+    index = DiagnosticIndex.scan(logs)
+    for code, files, locations in index.summary():
+        if args.code is None or code in args.code:
+            print(f"  {code}: {locations} in {files} files", file=args.log)
+    prefix = os.path.join(os.path.normcase(os.path.abspath(root)), '')
+    windows = {path: spans for path, spans in index.windows(args.code, args.window).items()
+               if os.path.normcase(os.path.abspath(path)).startswith(prefix)}
+    if not windows:
+        codes = ', '.join(args.code) if args.code else 'build'
+        print(f"Error: no {codes} errors under {root} in {', '.join(args.diagnostics)}; nothing rewritten "
+              f"(rebuild and pass the log with --diagnostics, or rewrite every file with --all)", file=sys.stderr)
+    return windows
+
+
+def print_undo(args, journal, changed):
+    """Tell how to undo the run, if it changed anything"""
+    if changed and not args.dry_run and not args.plan:
+        print(f"Undo with: python -m codemod.undo --root {journal.root} undo {journal.run_id}", file=args.log)
@@ -0,0 +1,109 @@
+"""Deterministic synthetic xUnit/FluentAssertions test files for benchmarking the codemods.
+
+Modeled on Test/ and SemiStandard.Tests/ before conversion: state machines
+built from @"..." JSON scripts with "" escapes, .Should() chains of every
+shape the converters handle (including JValue casts and nested calls), and
+ordinary code in between.
+"""
+import os
+import random
+
+_IDENTIFIERS = ['result', 'state', 'count', 'machine', 'currentState', 'value', 'message', 'carrier',
+                'eventLog', 'snapshot', 'response', 'data', 'items', 'status', 'handler']
+_STATES = ['idle', 'running', 'paused', 'processing', 'completed', 'error', 'waiting', 'loading']
+_EVENTS = ['START', 'STOP', 'PAUSE', 'RESUME', 'COMPLETE', 'FAIL', 'RESET', 'TIMEOUT']
+
+_SHOULD = [
+    '{v}.Should().Be({n});',
+    '{v}.Should().Be("{s}");',
+    '{v}.Should().NotBe({n});',
+    '{v}.Should().BeTrue();',
+    '{v}.Should().BeFalse();',
+    '{v}.Should().NotBeNull();',
+    '{v}.Should().BeNull();',
+    '{v}.Should().Contain("{s}");',
+    '{v}.Should().HaveCount({n});',
+    '{v}.Should().StartWith("{s}");',
+    '{v}.Should().EndWith("{s}");',
+    '{v}.Should().BeGreaterThan({n});',
+    '{v}.Should().BeGreaterThanOrEqualTo({n}, "at least {n} events should arrive");',
+    '{v}.Should().BeLessThan({n});',
+    '{v}.Should().BeLessThanOrEqualTo({n});',
+    '{v}.Contains("{s}").Should().BeTrue();',
+    '{v}.Contains("{s}").Should().BeFalse();',
+    '{v}.Count.Should().Be({n});',
+    '_stateMachine.GetActiveStateNames().Should().Contain("{s}");',
+    '_stateMachine.ContextMap!["{s}"].Should().Be("{s}");',
+    '_contextValues["counter"].Should().Be({n});',
+    '({v} is Newtonsoft.Json.Linq.JValue jv ? jv.ToObject<int>() : (int)({v} ?? 0)).Should().Be({n});',
+    '({v} != null ? {v} : "").Should().Be("{s}");',
+    'GetValue<int>("{s}").Should().Be(Math.Max({n}, 1));',
+]
+
+_CODE = [
+    'var {v} = await machine.SendAsync("{e}");',
+    'await Task.Delay({n});',
+    '_output.WriteLine($"State: {{{v}}}");',
+    'var {v} = _stateMachine.GetActiveStateNames();',
+    'Assert.Equal({n}, {v}.Count);',
+    'machine.Send("{e}");',
+    'if ({v} == null) throw new InvalidOperationException("{s}");',
+]
+
+
+def _json_script(rng, machine_id):
+    lines = ['        const string script = @"', '        {', f'            ""id"": ""{machine_id}"",',
+             f'            ""initial"": ""{rng.choice(_STATES)}"",', '            ""states"": {']
+    states = rng.sample(_STATES, rng.randint(2, 5))
+    for i, state in enumerate(states):
+        target = rng.choice(states)
+        lines.append(f'                ""{state}"": {{')
+        lines.append(f'                    ""entry"": [""log{state.title()}""],')
+        lines.append(f'                    ""on"": {{ ""{rng.choice(_EVENTS)}"": ""{target}"" }}')
+        lines.append('                }' + (',' if i < len(states) - 1 else ''))
+    lines += ['            }', '        }";']
+    return lines
+
+
+def _fill(rng, template):
+    return template.format(v=rng.choice(_IDENTIFIERS), n=rng.randint(0, 100), s=rng.choice(_STATES),
+                           e=rng.choice(_EVENTS))
+
+
+def generate_file(rng, index, size):
+    """One test class of roughly size characters"""
+    lines = ['using System;', 'using System.Threading.Tasks;', 'using FluentAssertions;', 'using Xunit;', '',
+             'namespace XStateNet.Tests', '{', f'    public class GeneratedTests{index}', '    {']
+    length = sum(len(line) + 1 for line in lines)
+    method = 0
+    while length < size:
+        body = ['        [Fact]', f'        public async Task Scenario{method}()', '        {']
+        if rng.random() < 0.4:
+            body += _json_script(rng, f'machine{index}_{method}')
+        for _ in range(rng.randint(3, 12)):
+            template = rng.choice(_SHOULD) if rng.random() < 0.6 else rng.choice(_CODE)
+            body.append('            ' + _fill(rng, template))
+        body += ['        }', '']
+        lines += body
+        length += sum(len(line) + 1 for line in body)
+        method += 1
+    lines += ['    }', '}', '']
+    return '\n'.join(lines)
+
+
+def generate_corpus(count=200, size=16 * 1024, seed=0):
+    """(name, content) pairs; the same arguments always give the same corpus"""
+    rng = random.Random(seed)
+    return [(f'GeneratedTests{index}.cs', generate_file(rng, index, size)) for index in range(count)]
+
+
+def write_corpus(directory, count=200, size=16 * 1024, seed=0):
+    """Write the corpus into directory and return the file paths"""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for name, content in generate_corpus(count, size, seed):
+        path = os.path.join(directory, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        paths.append(path)
+    return paths
@@ -0,0 +1,542 @@
+import re
+import time
+
+from codemod.plan import apply_edits
+from codemod.stats import Profile
+
+# Token kinds
+IDENT = 'ident'
+NUMBER = 'number'
+STRING = 'string'
+CHAR = 'char'
+PUNCT = 'punct'
+
+_TOKEN = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<directive>\#[^\n]*)
+  | (?P<string>\$*@?\$*")
+  | (?P<ident>@?[^\W\d]\w*)
+  | (?P<number>\d[\w]*(?:\.\d[\w]*)?)
+  | (?P<char>'(?:[^'\\\n]|\\.)*'?)
+  | (?P<punct>\?\.|\?\?|=>|::|->|.)
+''', re.S | re.X)
+
+_OPENERS = {'(': ')', '[': ']', '{': '}'}
+
+# Text that can never start a literal, comment or directive, skipped in one step by block_end
+_PLAIN = re.compile(r'''[^"'/#@$]+''')
+
+# Keywords that can never end a member-access receiver
+_KEYWORDS = frozenset('''
+    abstract as await break case catch class const continue do else enum event explicit extern
+    finally fixed for foreach goto if implicit in interface internal is lock namespace operator
+    out override params private protected public readonly ref return sealed stackalloc static
+    struct switch throw try unsafe using virtual void volatile while yield var
+'''.split())
+
+# Operators binding looser than a comparison ('==', '<=', '&&' and '=' are tokenized a character at a time)
+_LOW_PRECEDENCE = frozenset(['?', '??', '=', '&', '|', '^', '<', '>', '=>', 'is', 'as'])
+
+# Tokens allowed between the angle brackets of a generic argument list
+_GENERIC_PUNCT = frozenset(['.', ',', '<', '>', '[', ']', '?', '::'])
+
+
+def _string_end(content, start, prefix_end):
+    """End offset of the string literal whose prefix ($, @) ends just before the opening quote"""
+    prefix = content[start:prefix_end]
+    interpolated = '$' in prefix
+    verbatim = '@' in prefix
+    length = len(content)
+
+    # Raw string literal: """...""" (optionally $-prefixed; @""" is a verbatim string starting with a quote)
+    quotes = prefix_end
+    while quotes < length and content[quotes] == '"':
+        quotes += 1
+    run = quotes - prefix_end
+    if run >= 3 and not verbatim:
+        end = content.find('"' * run, quotes)
+        return length if end == -1 else end + run
+
+    position = prefix_end + 1
+    while position < length:
+        char = content[position]
+        if char == '"':
+            if verbatim and content.startswith('"', position + 1):
+                position += 2
+                continue
+            return position + 1
+        if char == '\\' and not verbatim:
+            position += 2
+            continue
+        if char == '\n' and not verbatim:
+            return position
+        if char == '{' and interpolated:
+            if content.startswith('{', position + 1):
+                position += 2
+                continue
+            position = hole_end(content, position + 1)
+            continue
+        position += 1
+    return length
+
+
+def hole_end(content, position):
+    """Offset just past the '}' closing an interpolation hole that starts at position"""
+    depth = 0
+    length = len(content)
+    while position < length:
+        match = _TOKEN.match(content, position)
+        kind = match.lastgroup
+        if kind == 'string':
+            position = _string_end(content, position, match.end() - 1)
+            continue
+        text = match.group()
+        position = match.end()
+        if text in ('(', '[', '{'):
+            depth += 1
+        elif text in (')', ']', '}'):
+            if depth == 0:
+                return position
+            depth -= 1
+    return length
+
+
+def block_end(content):
+    """Offset just past the last line end of content that no literal, comment or interpolation spans, or 0.
+
+    Cut there, the pieces tokenize exactly like the whole text, so a large
+    file can be handled a block at a time (see stream.read_blocks).
+    """
+    end = 0
+    position = 0
+    length = len(content)
+    while position < length:
+        plain = _PLAIN.match(content, position)
+        if plain is not None:
+            # Outside any token but a space, identifier, number or operator: a line end here is a cut
+            newline = content.rfind('\n', position, plain.end())
+            if newline != -1:
+                end = newline + 1
+            position = plain.end()
+            continue
+        match = _TOKEN.match(content, position)
+        if match.lastgroup == 'string':
+            position = _string_end(content, position, match.end() - 1)
+        else:
+            position = match.end()
+    return end
+
+
+class Tokens:
+    """Linear-time C# tokenizer with bracket matching.
+
+    Understands regular, verbatim, interpolated and raw string literals, char
+    literals, comments and preprocessor lines, so brackets and '.Should()'
+    inside them are never mistaken for code.
+    """
+
+    def __init__(self, content):
+        self.content = content
+        self.kinds = []
+        self.starts = []
+        self.ends = []
+        self.texts = []
+        self.match = {}  # index of an opening/closing bracket -> index of its partner
+
+        kinds, starts, ends, texts = self.kinds, self.starts, self.ends, self.texts
+        stack = []
+        position = 0
+        length = len(content)
+        while position < length:
+            match = _TOKEN.match(content, position)
+            kind = match.lastgroup
+            if kind in ('space', 'comment', 'directive'):
+                position = match.end()
+                continue
+            if kind == 'string':
+                end = _string_end(content, position, match.end() - 1)
+                kind = STRING
+            else:
+                end = match.end()
+            text = content[position:end]
+
+            index = len(kinds)
+            kinds.append(kind)
+            starts.append(position)
+            ends.append(end)
+            texts.append(text)
+            if kind == PUNCT:
+                if text in _OPENERS:
+                    stack.append(index)
+                elif text in (')', ']', '}'):
+                    if stack and _OPENERS[texts[stack[-1]]] == text:
+                        opener = stack.pop()
+                        self.match[opener] = index
+                        self.match[index] = opener
+            position = end
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def _is_piece_end(self, index):
+        """True if the token can end an operand that an invocation or indexer applies to"""
+        kind = self.kinds[index]
+        if kind == IDENT:
+            return self.texts[index] not in _KEYWORDS
+        return self.texts[index] in (')', ']')
+
+    def _generic_open(self, close):
+        """Index of the '<' matching the '>' at close, if the span looks like type arguments"""
+        depth = 0
+        index = close
+        while index >= 0:
+            text = self.texts[index]
+            if self.kinds[index] == IDENT:
+                pass
+            elif text == '>':
+                depth += 1
+            elif text == '<':
+                depth -= 1
+                if depth == 0:
+                    return index if index > 0 and self.kinds[index - 1] == IDENT else None
+            elif text not in _GENERIC_PUNCT:
+                return None
+            index -= 1
+        return None
+
+    def _generic_close(self, open_):
+        """Index of the '>' matching the '<' at open_, if the span looks like type arguments"""
+        depth = 0
+        index = open_
+        count = len(self.kinds)
+        while index < count:
+            text = self.texts[index]
+            if self.kinds[index] == IDENT:
+                pass
+            elif text == '<':
+                depth += 1
+            elif text == '>':
+                depth -= 1
+                if depth == 0:
+                    return index
+            elif text not in _GENERIC_PUNCT:
+                return None
+            index += 1
+        return None
+
+    def receiver_start(self, dot):
+        """Index of the first token of the member-access chain ending just before dot"""
+        index = dot - 1
+        first = None
+        while index >= 0:
+            # Null-forgiving operators between the operand and the '.'
+            while index >= 0 and self.texts[index] == '!':
+                index -= 1
+            if index < 0:
+                break
+
+            kind = self.kinds[index]
+            text = self.texts[index]
+            if kind in (NUMBER, STRING, CHAR) or (kind == IDENT and text not in _KEYWORDS):
+                first = index
+                index -= 1
+            elif text in (')', ']') and index in self.match:
+                opener = self.match[index]
+                first = opener
+                index = opener - 1
+                # Invocation or indexer: keep consuming the operand it applies to
+                while index >= 0:
+                    # Null-forgiving operator after the operand, e.g. map!["key"]
+                    if self.texts[index] == '!' and index > 0 and self._is_piece_end(index - 1):
+                        index -= 1
+                        continue
+                    if self.texts[index] == '>' and text == ')':
+                        generic = self._generic_open(index)
+                        if generic is None:
+                            break
+                        first = index = generic - 1
+                        index -= 1
+                        break
+                    if not self._is_piece_end(index):
+                        break
+                    if self.kinds[index] == IDENT:
+                        # An assertion chain such as x.Should().BeOfType<T>().Which is not an operand
+                        if self.texts[index] == 'Should':
+                            return None
+                        first = index
+                        index -= 1
+                        break
+                    # ')' or ']' directly before another group, e.g. f(x)(y) or a[0][1]
+                    text = self.texts[index]
+                    opener = self.match.get(index)
+                    if opener is None:
+                        break
+                    first = opener
+                    index = opener - 1
+            else:
+                break
+
+            # Object creation: the chain starts at 'new'
+            if index >= 0 and self.texts[index] == 'new' and self.kinds[first] == IDENT:
+                first = index
+                break
+            if index >= 0 and self.texts[index] in ('.', '?.', '::', '->'):
+                index -= 1
+                continue
+            break
+        return first
+
+    def arguments(self, open_):
+        """(start, end) token index ranges of the top-level arguments inside the group at open_"""
+        close = self.match.get(open_)
+        if close is None:
+            return None
+        arguments = []
+        start = open_ + 1
+        index = start
+        while index < close:
+            text = self.texts[index]
+            if text in _OPENERS and index in self.match:
+                index = self.match[index] + 1
+                continue
+            if text == '<' and index > 0 and self.kinds[index - 1] == IDENT:
+                generic = self._generic_close(index)
+                if generic is not None and generic < close:
+                    index = generic + 1
+                    continue
+            if text == ',':
+                arguments.append((start, index))
+                start = index + 1
+            index += 1
+        if start < close or arguments:
+            arguments.append((start, close))
+        return arguments
+
+    def symbols(self):
+        """(symbol, offset) for every member invocation, member access and indexer in code.
+
+        Symbols are '.Name(' (generic invocations included), '.Name.' and
+        'Name[' (also for 'Name![' and 'Name?['); the offset is that of the
+        '.' or of Name. '?.' counts as '.'.
+        """
+        texts, kinds, starts = self.texts, self.kinds, self.starts
+        count = len(texts)
+        for index in range(count - 1):
+            if kinds[index] != IDENT:
+                continue
+            after = index + 1
+            if texts[after] in ('!', '?') and after + 1 < count and texts[after + 1] == '[':
+                after += 1
+            following = texts[after]
+            if following == '[':
+                yield texts[index] + '[', starts[index]
+                continue
+            if index == 0 or texts[index - 1] not in ('.', '?.'):
+                continue
+            if following == '<':
+                close = self._generic_close(after)
+                if close is not None and close + 1 < count and texts[close + 1] == '(':
+                    following = '('
+            if following in ('(', '.', '?.'):
+                yield f'.{texts[index]}{following[-1]}', starts[index - 1]
+
+    def should_calls(self):
+        """Every `receiver.Should().Method(args)` in code, in source order of the .Should()
+
+        Yields ShouldCall objects with character offsets into the content.
+        Calls whose result is used, as in `x.Should().Be(1).And.NotBeNull()`,
+        are left out: the Assert method replacing them returns void.
+        """
+        texts, kinds, starts, ends = self.texts, self.kinds, self.starts, self.ends
+        count = len(texts)
+        for index in range(1, count - 5):
+            if texts[index] != 'Should' or texts[index - 1] not in ('.', '?.'):
+                continue
+            if (texts[index + 1] != '(' or texts[index + 2] != ')' or texts[index + 3] != '.'
+                    or kinds[index + 4] != IDENT or texts[index + 5] != '('):
+                continue
+            first = self.receiver_start(index - 1)
+            arguments = self.arguments(index + 5)
+            if first is None or arguments is None:
+                continue
+            close = self.match[index + 5]
+            if close + 1 < count and texts[close + 1] in ('.', '?.'):
+                continue
+            yield ShouldCall(
+                start=starts[first],
+                end=ends[close],
+                receiver=(starts[first], starts[index - 1]),
+                method=texts[index + 4],
+                arguments=[(starts[a], ends[b - 1]) for a, b in arguments if b > a],
+            )
+
+
+class ShouldCall:
+    __slots__ = ('start', 'end', 'receiver', 'method', 'arguments')
+
+    def __init__(self, start, end, receiver, method, arguments):
+        self.start = start
+        self.end = end
+        self.receiver = receiver
+        self.method = method
+        self.arguments = arguments
+
+
+def _strip_parentheses(text):
+    """Drop one pair of parentheses wrapping the whole expression, if any"""
+    if not (text.startswith('(') and text.endswith(')')):
+        return text
+    tokens = Tokens(text)
+    if tokens.match.get(0) == len(tokens) - 1:
+        return text[1:-1]
+    return text
+
+
+def _operand(text):
+    """text, parenthesized if it holds an operator binding looser than the one it is placed next to"""
+    tokens = Tokens(text)
+    texts, kinds = tokens.texts, tokens.kinds
+    index = 0
+    while index < len(texts):
+        if kinds[index] in (PUNCT, IDENT) and texts[index] in _LOW_PRECEDENCE:
+            return f'({text})'
+        if texts[index] in _OPENERS and index in tokens.match:
+            index = tokens.match[index]
+        index += 1
+    return text
+
+
+class ShouldRule:
+    """Replacement template for one FluentAssertions method.
+
+    Placeholders: {receiver} (outer parentheses dropped), {operand} (as
+    written, for use next to operators or before a member access), {0}, {1},
+    ... for the expected arguments and {message} for the trailing 'because'
+    arguments. In a template where {operand} is followed by an operator, the
+    expected arguments stand next to it too and are parenthesized where
+    precedence needs it. A 'because' followed by format arguments becomes
+    string.Format(because, args...); a call with 'because' arguments the
+    template has no {message} for is not accepted.
+    """
+
+    _PLACEHOLDER = re.compile(r'\{(\d+)\}')
+    _COMPARISON = re.compile(r'\{operand\} [^.\s]')
+
+    def __init__(self, method, replacement):
+        self.name = method
+        self.pattern = method
+        self.replacement = replacement
+        self.arity = max((int(index) + 1 for index in self._PLACEHOLDER.findall(replacement)), default=0)
+        self.message = '{message}' in replacement
+        self.operator = self._COMPARISON.search(replacement) is not None
+
+    def accepts(self, count):
+        """True if a call with count arguments can be rendered without dropping any of them"""
+        return count == self.arity or (count > self.arity and self.message)
+
+    def render(self, receiver, arguments):
+        expected, extra = arguments[:self.arity], arguments[self.arity:]
+        if self.operator:
+            expected = [_operand(argument) for argument in expected]
+        if len(extra) > 1:
+            message = f", string.Format({', '.join(extra)})"
+        else:
+            message = f', {extra[0]}' if extra else ''
+        return self.replacement.format(*expected, receiver=_strip_parentheses(receiver),
+                                       operand=receiver, message=message)
+
+
+class ShouldRewriter:
+    """Rewrites `.Should().Method(...)` chains using the tokenizer instead of regexes.
+
+    Receivers and arguments are exact expression spans, so nested calls,
+    generics, casts and string literals containing parentheses need no
+    special-case rules. Calls whose method has no template, whose result is
+    used (see Tokens.should_calls) or whose arguments the template cannot all
+    carry (see ShouldRule.accepts) are left alone.
+
+    In self.profile, a rule's invocations are the call sites found for its
+    method and its matches the ones rewritten; the tokenizer's time and bytes
+    are charged to the 'tokenize' pass. With profiling set, the time spent
+    rendering each call and the length of the call are charged to its rule too.
+    """
+
+    def __init__(self, templates):
+        self.rules = [ShouldRule(method, replacement) for method, replacement in templates.items()]
+        self._by_method = {rule.name: rule for rule in self.rules}
+        self.profile = Profile(self._by_method, ('tokenize',))
+        self.profiling = False
+
+    @property
+    def hits(self):
+        return {name: stats.matches for name, stats in self.profile.rules.items()}
+
+    def apply(self, content):
+        edits = self.plan(content)
+        return apply_edits(content, edits) if edits else content
+
+    __call__ = apply
+
+    def plan(self, content):
+        """The edits apply() makes to content: one per outermost call, as (offset, length, replacement, method)"""
+        if '.Should()' not in content:
+            return []
+        started = time.perf_counter()
+        calls = []
+        for call in Tokens(content).should_calls():
+            rule = self._by_method.get(call.method)
+            if rule is None:
+                continue
+            self.profile.rules[rule.name].invocations += 1
+            if rule.accepts(len(call.arguments)):
+                calls.append(call)
+        edits = []
+        if calls:
+            calls.sort(key=lambda call: (call.start, -call.end))
+            self._render(content, 0, len(content), calls, edits)
+        self.profile.passes['tokenize'].add((1, len(calls), len(content), time.perf_counter() - started))
+        return edits
+
+    def _render(self, content, low, high, calls, edits=None):
+        """content[low:high] with every call inside it rewritten, innermost first.
+
+        With edits (a list), the rewritten calls are appended to it as edits instead.
+        """
+        calls = [call for call in calls if low <= call.start and call.end <= high]
+        pieces = []
+        position = low
+        index = 0
+        while index < len(calls):
+            call = calls[index]
+            # Calls nested inside this one (in its receiver or arguments)
+            inner_end = index + 1
+            while inner_end < len(calls) and calls[inner_end].start < call.end:
+                inner_end += 1
+            inner = calls[index + 1:inner_end]
+
+            receiver = self._render(content, *call.receiver, inner)
+            arguments = [self._render(content, start, end, inner) for start, end in call.arguments]
+            stats = self.profile.rules[call.method]
+            stats.matches += 1
+            started = time.perf_counter() if self.profiling else None
+            rendered = self._by_method[call.method].render(receiver, arguments)
+            if started is not None:
+                stats.bytes_scanned += call.end - call.start
+                stats.seconds += time.perf_counter() - started
+            if edits is not None:
+                edits.append((call.start, call.end - call.start, rendered, call.method))
+            else:
+                pieces.append(content[position:call.start])
+                pieces.append(rendered)
+            position = call.end
+            index = inner_end
+        if edits is not None:
+            return None
+        pieces.append(content[position:high])
+        return ''.join(pieces)
+
+    def report(self):
+        """Per-method hit counts, most frequent first"""
+        return sorted(((name, stats.matches) for name, stats in self.profile.rules.items() if stats.matches),
+                      key=lambda item: -item[1])
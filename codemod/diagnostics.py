@@ -0,0 +1,124 @@
+import os
+import re
+
+# path(line,col): error CS1061: <message>, optionally prefixed by the MSBuild node ("3>") and with an end
+# position (line,col,endline,endcol). The message and the trailing [project] are localized and ignored.
+# The path ends at the first (line,col) group, so it may hold parentheses (C:\Program Files (x86)\...).
+DIAGNOSTIC = re.compile(rb'^\s*(?:\d+>)?(?P<path>.+?)\((?P<line>\d+),(?P<column>\d+)(?:,\d+,\d+)?\)'
+                        rb'\s*:\s*(?P<severity>error|warning)\s+(?P<code>[A-Za-z]+\d+)\s*:')
+
+# dotnet writes UTF-8; logs redirected from older consoles are in the ANSI code page (cp949 on the Korean machines)
+LOG_ENCODINGS = ('utf-8', 'cp949')
+
+# Lines kept around each flagged line, so a multi-line statement is rewritten whole
+WINDOW = 3
+
+
+def _decode_path(raw):
+    for encoding in LOG_ENCODINGS:
+        try:
+            return os.path.normpath(raw.decode(encoding).strip())
+        except UnicodeDecodeError:
+            continue
+    return os.path.normpath(raw.decode('utf-8', 'replace').strip())
+
+
+class DiagnosticIndex:
+    """Compiler diagnostics from build logs, indexed as code -> file -> sorted (line, column) pairs.
+
+    Logs are read line by line as bytes and only the ASCII diagnostic prefix
+    is decoded, so localized messages in any encoding cost nothing. The same
+    diagnostic repeated in the build summary is counted once.
+    """
+
+    def __init__(self):
+        self.codes = {}
+
+    @classmethod
+    def scan(cls, log_paths, severities=('error',)):
+        index = cls()
+        wanted = {severity.encode('ascii') for severity in severities}
+        for log_path in log_paths:
+            with open(log_path, 'rb') as f:
+                for line in f:
+                    # Cheap test first: most lines of a build log are not diagnostics
+                    if b'):' not in line:
+                        continue
+                    match = DIAGNOSTIC.match(line)
+                    if match is None or match['severity'] not in wanted:
+                        continue
+                    index.add(match['code'].decode('ascii'), _decode_path(match['path']),
+                              int(match['line']), int(match['column']))
+        index._freeze()
+        return index
+
+    def add(self, code, path, line, column):
+        self.codes.setdefault(code, {}).setdefault(path, set()).add((line, column))
+
+    def _freeze(self):
+        for files in self.codes.values():
+            for path, locations in files.items():
+                files[path] = tuple(sorted(locations))
+
+    def __len__(self):
+        return sum(len(locations) for files in self.codes.values() for locations in files.values())
+
+    def _selected(self, codes):
+        return [files for code, files in self.codes.items() if codes is None or code in codes]
+
+    def files(self, codes=None):
+        """Sorted paths flagged with any of codes (all codes by default)"""
+        return sorted({path for files in self._selected(codes) for path in files})
+
+    def lines(self, path, codes=None):
+        """Sorted line numbers flagged in path"""
+        return sorted({line for files in self._selected(codes) for line, _ in files.get(path, ())})
+
+    def windows(self, codes=None, context=WINDOW):
+        """path -> line spans around each flagged line (see line_windows)"""
+        return {path: line_windows(self.lines(path, codes), context) for path in self.files(codes)}
+
+    def summary(self):
+        """(code, files, locations) per code, most frequent first"""
+        rows = [(code, len(files), sum(len(locations) for locations in files.values()))
+                for code, files in self.codes.items()]
+        return sorted(rows, key=lambda row: (-row[2], row[0]))
+
+
+def line_windows(lines, context=WINDOW):
+    """Merged [start, end) 0-based line spans covering each 1-based line in sorted lines and context lines around it"""
+    spans = []
+    for line in lines:
+        start, end = max(line - 1 - context, 0), line + context
+        if spans and start <= spans[-1][1]:
+            spans[-1] = (spans[-1][0], max(spans[-1][1], end))
+        else:
+            spans.append((start, end))
+    return spans
+
+
+def apply_windows(content, spans, transform):
+    """Apply transform to the given [start, end) line spans of content only, leaving the rest as is.
+
+    Spans must be sorted and disjoint (see DiagnosticIndex.windows). A span
+    ends at a line boundary, so a construct crossing its edge is left for a
+    full run.
+    """
+    # Split on '\n' only, like the compiler counts lines; splitlines would also split on form feeds
+    lines = content.split('\n')
+    lines = [line + '\n' for line in lines[:-1]] + [lines[-1]]
+    pieces = []
+    position = 0
+    warnings = getattr(transform, 'warnings', None)  # (line, rule, message), see RuleSet.warnings
+    for start, end in spans:
+        if start >= len(lines):
+            break
+        pieces.append(''.join(lines[position:start]))
+        mark = len(warnings) if warnings is not None else 0
+        pieces.append(transform(''.join(lines[start:end])))
+        if warnings:
+            # Lines of the span -> lines of the file
+            warnings[mark:] = [(line + start, rule, message) for line, rule, message in warnings[mark:]]
+        position = min(end, len(lines))
+    pieces.append(''.join(lines[position:]))
+    return ''.join(pieces)
@@ -0,0 +1,130 @@
+import difflib
+from collections import deque
+
+from codemod.stream import CHUNK_SIZE, read_blocks
+
+
+def _range(start, length):
+    # Same range notation as difflib.unified_diff
+    if length == 1:
+        return f'{start}'
+    if not length:
+        start -= 1
+    return f'{start},{length}'
+
+
+def _write_line(output, prefix, line):
+    output.write(prefix + line)
+    if not line.endswith('\n'):
+        output.write('\n\\ No newline at end of file\n')
+
+
+class DiffWriter:
+    """Writes a unified diff of each would-be rewrite to output instead of touching disk.
+
+    Stands in for a Transaction in dry runs. Each file's diff is written as
+    soon as the file is processed, so memory does not grow with the tree.
+    """
+
+    def __init__(self, output, context=3):
+        self.output = output
+        self.context = context
+
+    def diff(self, target, old_text, new_text):
+        """Write the diff between two versions of target's text"""
+        lines = difflib.unified_diff(old_text.splitlines(keepends=True), new_text.splitlines(keepends=True),
+                                     f'a/{target}', f'b/{target}', n=self.context)
+        for line in lines:
+            if line.startswith(('---', '+++', '@@')):
+                self.output.write(line if line.endswith('\n') else line + '\n')
+            else:
+                _write_line(self.output, line[0], line[1:])
+
+    def diff_blocks(self, target, transform, block_end, chunk_size=CHUNK_SIZE):
+        """Stream the diff of applying transform to target a block at a time (see stream.read_blocks).
+
+        Only the block and the hunk being built are held in memory. Returns
+        True if any block would change.
+        """
+        with open(target, 'rb', buffering=chunk_size) as f:
+            rows = (row for text in read_blocks(f, block_end, chunk_size) for row in _rows(text, transform(text)))
+            changed = False
+            for old_start, new_start, lines in _hunks(rows, self.context):
+                if not changed:
+                    self.output.write(f'--- a/{target}\n+++ b/{target}\n')
+                    changed = True
+                old_count = sum(1 for tag, _ in lines if tag != '+')
+                new_count = sum(1 for tag, _ in lines if tag != '-')
+                self.output.write(f'@@ -{_range(old_start, old_count)} +{_range(new_start, new_count)} @@\n')
+                for tag, line in lines:
+                    _write_line(self.output, tag, line)
+        return changed
+
+    def commit(self):
+        self.output.flush()
+        return []
+
+    def rollback(self):
+        self.output.flush()
+
+
+def _lines(text):
+    """text split after each '\n', like the compiler counts lines"""
+    lines = text.split('\n')
+    return [line + '\n' for line in lines[:-1]] + ([lines[-1]] if lines[-1] else [])
+
+
+def _rows(old, new):
+    """(old lines, new lines) rows of a block and its rewrite: one per unchanged line, one per changed run"""
+    old_lines = _lines(old)
+    if new == old:
+        return [((line,), (line,)) for line in old_lines]
+    new_lines = _lines(new)
+    if len(new_lines) == len(old_lines):
+        return [((before,), (after,)) for before, after in zip(old_lines, new_lines)]
+    rows = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            rows.extend(((line,), (line,)) for line in old_lines[i1:i2])
+        else:
+            rows.append((tuple(old_lines[i1:i2]), tuple(new_lines[j1:j2])))
+    return rows
+
+
+def _hunks(rows, context):
+    """Unified-diff hunks for (old lines, new lines) rows, yielded as (old start, new start, [(tag, line)])"""
+    before = deque(maxlen=context)
+    hunk = None
+    removed, added = [], []
+    unchanged = 0  # unchanged lines since the last change in the current hunk
+    old_number = new_number = 0  # lines before the current row
+    for old, new in rows:
+        if old != new:
+            if hunk is None:
+                hunk = (old_number - len(before) + 1, new_number - len(before) + 1, [(' ', line) for line in before])
+            removed.extend(('-', line) for line in old)
+            added.extend(('+', line) for line in new)
+            unchanged = 0
+        elif hunk is None:
+            before.extend(old)
+        else:
+            if removed or added:
+                hunk[2].extend(removed + added)
+                removed, added = [], []
+            hunk[2].extend((' ', line) for line in old)
+            unchanged += len(old)
+            if unchanged > 2 * context:
+                # Gap too wide to merge with a later change: close the hunk
+                lines = hunk[2]
+                before.clear()
+                before.extend(line for _, line in lines[len(lines) - context:])
+                yield hunk[0], hunk[1], lines[:len(lines) - (unchanged - context)]
+                hunk = None
+        old_number += len(old)
+        new_number += len(new)
+    if hunk is not None:
+        lines = hunk[2] + removed + added
+        if unchanged > context:
+            lines = lines[:len(lines) - (unchanged - context)]
+        yield hunk[0], hunk[1], lines
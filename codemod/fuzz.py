@@ -0,0 +1,297 @@
+"""Fuzz the regex rules for catastrophic backtracking and check the combined engine against chained re.sub.
+
+    python -m codemod.fuzz [--stage NAME] [--length N] [--write] [--files PATH ...]
+
+Budget: every regex rule of the registry is run over adversarial C# lines
+(identifier and whitespace runs, long member and LINQ chains, nested
+brackets, near misses of its literal) of --length characters, and its
+slowest substitution is timed. A rule with its own budget_ms, or clearly
+over its budget (--budget; see --tolerance) without a time box, is
+time-boxed (see Rule.max_window): every such rule whose receiver stops at
+the same characters (see prefilter.run_stops) gets one max_window, computed
+from the tightest budget of that class (see window_for), never from a
+timing, so it is the same on every machine. A rule whose max_window differs
+from that is flagged, and --write stores it in the registry. A time-boxed
+rule still over budget within its window is flagged too; that needs a
+smaller WINDOW or a larger budget_ms.
+
+Differential: every regex stage is run over the generated corpus, the fuzz
+lines, blocks holding a long hex constant (runs past every max_window, away
+from the .Should() calls) and any --files through RuleSet.apply and through
+plain chained re.sub passes over its rules, without any time box
+(chained_sub). Every input on which the two differ is reported, together
+with the sites the time box skipped in it; those differing only from a
+skipped site on (see time_boxed) are expected. differential() compares any
+two transforms the same way.
+
+Exits with status 1 if a rule is over budget or off its window, or an input differs unexpectedly.
+"""
+import argparse
+import difflib
+import json
+import math
+import random
+import sys
+import time
+
+from codemod.corpus import generate_corpus
+from codemod.prefilter import run_stops
+from codemod.registry import SHOULD_RULES, Registry
+from codemod.rules import RuleSet
+
+# Budget of a rule for its worst line of LENGTH characters (or of its max_window), and how far over it a
+# rule may run before it is flagged; the max_window that keeps a receiver within BUDGET_MS (see window_for),
+# well inside the budget so timing noise alone never flags it
+BUDGET_MS = 10.0
+TOLERANCE = 0.5
+LENGTH = 4096
+WINDOW = 768
+SHORTEST = 64
+
+_CHAIN = 'items.Where(x).Select(y)[0].'
+_LINQ = 'items.Where(x => x.Id != null).Select(y => y.Name).'
+
+
+def _near_miss(literal):
+    """literal with its last character changed, so a match fails only after reaching it"""
+    return literal[:-1] + ('X' if literal[-1] != 'X' else 'Y')
+
+
+def _repeat(unit, length):
+    return (unit * (length // len(unit) + 1))[:length]
+
+
+def adversarial_lines(rule, length, example=None):
+    """(kind, line) pairs of about length characters built to make rule backtrack"""
+    literal = rule.literal or rule.anchor
+    near = _near_miss(literal)
+    yield 'identifier run', 'a' * length + near
+    yield 'member chain', _repeat(_CHAIN, length) + near
+    yield 'member chain match', _repeat(_CHAIN, length) + literal
+    yield 'linq chain', _repeat(_LINQ, length) + near
+    yield 'whitespace run', 'a' + ' ' * length + near
+    yield 'nested brackets', '(' * (length // 2) + 'x' + ')' * (length // 2) + near
+    yield 'repeated near miss', _repeat(near, length)
+    yield 'repeated literal', _repeat(literal, length)
+    if example:
+        yield 'long receiver', _repeat(_CHAIN, length) + example
+
+
+def _worst(rule, length, example, repeat):
+    """(seconds, kind) of the slowest adversarial line of the given length, best of repeat runs each"""
+    worst = (0.0, None)
+    for kind, line in adversarial_lines(rule, length, example):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rule.regex.subn(rule.replacement, line)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        worst = max(worst, (best, kind))
+    return worst
+
+
+def _example(rule):
+    """Left-hand side of a registry entry's example, if it has one"""
+    example = rule.get('example', '')
+    return example.split(' -> ')[0] if ' -> ' in example else None
+
+
+def window_for(budget_ms):
+    """max_window of a receiver class whose tightest budget is budget_ms.
+
+    Backtracking over a run of n characters costs about n * n / 2 steps, so
+    the window grows with the square root of the budget. It depends on the
+    budget only, never on a timing.
+    """
+    return max(SHORTEST, int(WINDOW * math.sqrt(budget_ms / BUDGET_MS)) // SHORTEST * SHORTEST)
+
+
+def check_budgets(registry, table, names, length, budget_ms, tolerance, repeat, log):
+    """Time every regex rule; returns ({(stage, rule): max_window it should have, or None}, [(stage, rule)])
+    for the rules whose max_window is off and those over budget even within it
+
+    table is the registry's JSON, for each rule's budget_ms and example. A
+    rule needs a time box if it has its own budget_ms or runs clearly over
+    budget on lines of length characters; it then gets the window of its
+    receiver class: the rules whose receiver stops at the same characters
+    (see prefilter.run_stops) share the window_for their tightest budget.
+    """
+    entries = {(stage['name'], rule['name']): rule for stage in table['stages'] for rule in stage['rules']}
+    rules = {(stage_name, rule.name): rule for stage_name in names
+             if isinstance(registry.stage(stage_name), RuleSet) for rule in registry.stage(stage_name).rules}
+    budgets = {key: entries[key].get('budget_ms', budget_ms) for key in rules}
+    classes = {}
+    for key, rule in rules.items():
+        budgeted = 'budget_ms' in entries[key]
+        if budgeted or _worst(rule, length, _example(entries[key]), 1)[0] > budgets[key] / 1000 * (1 + tolerance):
+            classes.setdefault(run_stops(rule.pattern), []).append(key)
+    classes.pop(None, None)  # without the regex parser nothing is time-boxed (see Rule.max_window)
+    windows = {key: window_for(min(budgets[other] for other in members))
+               for members in classes.values() for key in members}
+
+    flagged = {}
+    slow = []
+    for key, rule in rules.items():
+        window = windows.get(key)
+        if window != rule.max_window:
+            flagged[key] = window
+            print(f"  {'/'.join(key)}: max_window {rule.max_window} should be {window}"
+                  f"{' (within budget without one)' if window is None else ' (its receiver class)'}", file=log)
+        if window is None:
+            continue
+        seconds, kind = _worst(rule, window, _example(entries[key]), repeat)
+        if seconds > budgets[key] / 1000 * (1 + tolerance):
+            slow.append(key)
+            print(f"  {'/'.join(key)}: {seconds * 1000:.1f} ms on a {window}-char {kind} line "
+                  f"(budget {budgets[key]:g} ms) within its max_window", file=log)
+    return flagged, slow
+
+
+def write_windows(path, table, flagged):
+    """Store the max_window of every flagged rule in the registry file"""
+    for stage in table['stages']:
+        for rule in stage['rules']:
+            if (stage['name'], rule['name']) not in flagged:
+                continue
+            window = flagged[stage['name'], rule['name']]
+            if window is None:
+                rule.pop('max_window', None)
+            else:
+                rule['max_window'] = window
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(table, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+
+def chained_sub(rules):
+    """The rules as plain re.sub passes in order, without any time box: the reference for differential()"""
+    def apply(content):
+        for rule in rules:
+            content = rule.regex.sub(rule.replacement, content)
+        return content
+    return apply
+
+
+def differential(engine, reference, inputs):
+    """(label, engine output, reference output) for every (label, text) input on which they differ"""
+    return [(label, new, old) for label, text in inputs
+            for new, old in [(engine(text), reference(text))] if new != old]
+
+
+def fuzz_inputs(registry, names, seed, lines, length, fixtures=2):
+    """(label, text) inputs for the differential check: single fuzz lines, blocks of them, and blocks
+    holding a hex constant longer than every max_window (as test fixtures do)"""
+    rng = random.Random(seed)
+    pool = []
+    longest = 0
+    for stage_name in names:
+        stage = registry.stage(stage_name)
+        for rule in getattr(stage, 'rules', ()):
+            if isinstance(stage, RuleSet):
+                longest = max(longest, rule.max_window or 0)
+                for kind, line in adversarial_lines(rule, rng.randint(8, length)):
+                    pool.append((f'{stage_name}/{rule.name} {kind}', line))
+    inputs = rng.sample(pool, min(lines, len(pool)))
+    for index in range(lines // 8):
+        block = rng.sample(pool, min(8, len(pool)))
+        inputs.append((f'block {index}', ';\n'.join('    ' + line for _, line in block) + ';\n'))
+    for index in range(fixtures if longest else 0):
+        block = [line for _, line in rng.sample(pool, min(8, len(pool)))]
+        payload = ''.join(rng.choice('0123456789abcdef') for _ in range(longest + 64))
+        block.insert(rng.randint(0, len(block)), f'const string Payload = "{payload}"')
+        inputs.append((f'fixture {index}', ';\n'.join('    ' + line for line in block) + ';\n'))
+    return inputs
+
+
+def time_boxed(stage, text, new, old):
+    """The time-box warnings of stage on text if they explain why its output new differs from old.
+
+    That is, if the time box skipped a site (see Rule.max_window) at or
+    before the first line on which the two differ; None otherwise.
+    """
+    del stage.warnings[:]
+    stage.apply(text)
+    skipped = list(stage.warnings)
+    del stage.warnings[:]
+    first = next((index for index, (a, b) in enumerate(zip(new.splitlines(), old.splitlines()), 1) if a != b),
+                 min(new.count('\n'), old.count('\n')) + 1)
+    return skipped if skipped and min(line for line, _, _ in skipped) <= first else None
+
+
+def _print_mismatch(label, new, old, skipped, log):
+    print(f"  {label}: RuleSet.apply differs from the chained re.sub passes", file=log)
+    for line, rule, message in skipped:
+        print(f"    time box: line {line}: {rule} {message}", file=log)
+    diff = difflib.unified_diff(old.splitlines(), new.splitlines(), 're.sub', 'apply', lineterm='', n=1)
+    for line in list(diff)[2:12]:
+        print(f"    {line[:160]}", file=log)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fuzz the regex rules for catastrophic backtracking and "
+                                                 "compare the combined engine with chained re.sub")
+    parser.add_argument('--registry', default=SHOULD_RULES, help='rule table to check')
+    parser.add_argument('--stage', action='append', help='only this stage (repeatable; default: all)')
+    parser.add_argument('--length', type=int, default=LENGTH, help='longest adversarial line')
+    parser.add_argument('--budget', type=float, default=BUDGET_MS,
+                        help='default per-rule budget in ms for its worst line (a rule may set budget_ms)')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='fraction over its budget a rule may run before it is flagged')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per timing; the best is kept')
+    parser.add_argument('--write', action='store_true', help='store the suggested max_window of flagged rules')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--lines', type=int, default=2000, help='fuzz inputs for the differential check')
+    parser.add_argument('--corpus', type=int, default=50, help='generated files for the differential check')
+    parser.add_argument('--files', nargs='*', default=[], help='real files for the differential check')
+    parser.add_argument('--no-budget', action='store_true', help='only run the differential check')
+    args = parser.parse_args(argv)
+
+    registry = Registry.load(args.registry)
+    names = [name for name in registry.stages if args.stage is None or name in args.stage]
+    failed = False
+
+    if not args.no_budget:
+        print("Rule budgets:")
+        with open(args.registry, encoding='utf-8') as f:
+            table = json.load(f)
+        flagged, slow = check_budgets(registry, table, names, args.length, args.budget, args.tolerance,
+                                      args.repeat, sys.stdout)
+        if not flagged and not slow:
+            print("  every rule is within budget")
+        if flagged and args.write:
+            write_windows(args.registry, table, flagged)
+            print(f"Updated max_window of {len(flagged)} rules in {args.registry}; run again to check them")
+        if slow:
+            print(f"  lower fuzz.WINDOW (now {WINDOW}) or raise the budget_ms of the {len(slow)} slow rules")
+        failed = bool(slow) or (bool(flagged) and not args.write)
+
+    print("Differential check against chained re.sub without time boxes:")
+    inputs = fuzz_inputs(registry, names, args.seed, args.lines, 256)
+    inputs += [(f'corpus {name}', content) for name, content in generate_corpus(args.corpus, seed=args.seed)]
+    for path in args.files:
+        with open(path, 'rb') as f:
+            inputs.append((path, f.read().decode('utf-8')))
+    for name in names:
+        stage = registry.stage(name)
+        if not isinstance(stage, RuleSet):
+            continue
+        texts = dict(inputs)
+        mismatches = []
+        boxed = []
+        for label, new, old in differential(stage.apply, chained_sub(stage.rules), inputs):
+            skipped = time_boxed(stage, texts[label], new, old)
+            (mismatches if skipped is None else boxed).append((label, new, old, skipped or []))
+        print(f"  {name}: {len(inputs) - len(mismatches) - len(boxed)} of {len(inputs)} inputs identical, "
+              f"{len(boxed)} differing only where the time box skipped a site")
+        for label, _, _, skipped in boxed[:5]:
+            for line, rule, message in skipped:
+                print(f"    {label}: time box: line {line}: {rule} {message}")
+        for label, new, old, skipped in mismatches[:5]:
+            _print_mismatch(label, new, old, skipped, sys.stdout)
+        failed = failed or bool(mismatches)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
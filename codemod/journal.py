@@ -0,0 +1,134 @@
+"""Undo journal for the codemod scripts (see codemod/undo.py for the command line).
+
+Each run appends (pre-image, post-image, path) records to its own log under
+DIR/.codemod-journal/runs. Pre-images are stored once per distinct content,
+zlib-compressed and named by their hash, so repeated runs over the same files
+cost nothing extra. undo restores every file of a run in one transaction;
+files edited since the run are left alone unless --force is given.
+"""
+import hashlib
+import os
+import sys
+import tempfile
+import time
+import zlib
+
+from codemod.cache import DIGEST_SIZE
+from codemod.transaction import Transaction
+
+JOURNAL_DIR = '.codemod-journal'
+
+_BLOCK = 1024 * 1024
+
+
+def new_run_id():
+    """Sortable by start time, and unique even for runs started together"""
+    return time.strftime('%Y%m%d-%H%M%S-') + os.urandom(4).hex()
+
+
+def _file_digest(path):
+    hasher = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_BLOCK), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+class Journal:
+    """Content-addressed store of pre-images plus one append-only log per run"""
+
+    def __init__(self, root='.', run_id=None):
+        self.root = os.path.abspath(root)
+        self.directory = os.path.join(self.root, JOURNAL_DIR)
+        self.run_id = run_id or new_run_id()
+
+    def _object_path(self, key):
+        return os.path.join(self.directory, 'objects', key[:2], key[2:])
+
+    def _log_path(self, run_id):
+        return os.path.join(self.directory, 'runs', run_id + '.log')
+
+    def store(self, path):
+        """Store the current contents of path (unless already stored) and return their key"""
+        key = _file_digest(path)
+        object_path = self._object_path(key)
+        if os.path.exists(object_path):
+            return key
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(object_path), suffix='.tmp')
+        try:
+            compressor = zlib.compressobj()
+            with open(path, 'rb') as src, open(fd, 'wb') as dst:
+                for block in iter(lambda: src.read(_BLOCK), b''):
+                    dst.write(compressor.compress(block))
+                dst.write(compressor.flush())
+            os.replace(temp_path, object_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return key
+
+    def load(self, key):
+        with open(self._object_path(key), 'rb') as f:
+            return zlib.decompress(f.read())
+
+    def record(self, entries):
+        """Append (pre-image key, post-image key, path) entries to this run's log, durably"""
+        log_path = self._log_path(self.run_id)
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        with open(log_path, 'a', encoding='utf-8') as f:
+            for before, after, path in entries:
+                f.write(f'{before}\t{after}\t{os.path.abspath(path)}\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def journal_files(self, targets):
+        """Store the pre-image of each (target, staged file) pair and log it with its post-image"""
+        self.record([(self.store(target), _file_digest(staged), target) for target, staged in targets])
+
+    def runs(self):
+        """(run id, number of files) of every recorded run, oldest first"""
+        directory = os.path.join(self.directory, 'runs')
+        try:
+            names = sorted(name for name in os.listdir(directory) if name.endswith('.log'))
+        except OSError:
+            return []
+        return [(name[:-len('.log')], len(self.entries(name[:-len('.log')]))) for name in names]
+
+    def entries(self, run_id):
+        """path -> (pre-image key, post-image key) of a run; a path logged twice keeps its first pre-image"""
+        entries = {}
+        with open(self._log_path(run_id), encoding='utf-8') as f:
+            for line in f:
+                before, after, path = line.rstrip('\n').split('\t', 2)
+                first = entries.get(path, (before, after))[0]
+                entries[path] = (first, after)
+        return entries
+
+    def undo(self, run_id, force=False, dry_run=False, log=sys.stdout):
+        """Restore every file of run_id in one transaction, itself journaled as this run; returns the paths"""
+        restore = []
+        for path, (before, after) in self.entries(run_id).items():
+            if not os.path.exists(path):
+                print(f"Skipping {path}: deleted since run {run_id}", file=log)
+                continue
+            current = _file_digest(path)
+            if current == before:
+                continue  # already as it was
+            if current != after and not force:
+                print(f"Skipping {path}: changed since run {run_id} (use --force to restore anyway)", file=log)
+                continue
+            restore.append((path, before))
+        if dry_run:
+            return [path for path, _ in restore]
+
+        transaction = Transaction(self.root, journal=self)
+        try:
+            for path, before in restore:
+                transaction.stage(path, self.load(before))
+        except BaseException:
+            transaction.rollback()
+            raise
+        return transaction.commit()
+
@@ -0,0 +1,228 @@
+import re
+import time
+from collections import OrderedDict
+
+from codemod.cache import digest
+from codemod.csharp import STRING, Tokens, block_end, hole_end
+from codemod.plan import apply_edits
+from codemod.stats import Profile
+
+# Lenient JSON as accepted by the XStateNet parser: either quote style, comments, bare words
+_JSON_TOKEN = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<string>"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')
+  | (?P<punct>[{}\[\]:,])
+  | (?P<word>[^\s{}\[\]:,"'/]+)
+''', re.S | re.X)
+
+_CLOSERS = {'{': '}', '[': ']'}
+
+# A literal is a state-machine script if its top-level object has one of these keys
+XSTATE_KEYS = frozenset(['states', 'initial', 'on'])
+
+# Most converted literals the converter remembers; the least recently used are forgotten first
+CACHE_SIZE = 4096
+
+# Interpolation holes stand in for these private-use characters while the JSON is tokenized
+_HOLE_BASE = 0xE000
+
+
+def _json_strings(text):
+    """Offsets of the string tokens of text, if text is one XState JSON object; otherwise None"""
+    stack = []
+    strings = []
+    keys = set()
+    opened = False
+    previous = None  # the string or word just before, for spotting keys
+    position = 0
+    length = len(text)
+    while position < length:
+        match = _JSON_TOKEN.match(text, position)
+        if match is None:
+            return None
+        kind = match.lastgroup
+        token = match.group()
+        position = match.end()
+        if kind in ('space', 'comment'):
+            continue
+        if not stack:
+            if opened or token != '{':
+                return None  # anything outside the one top-level object
+            opened = True
+        if kind == 'string':
+            strings.append((match.start(), match.end()))
+        elif token in _CLOSERS:
+            stack.append(_CLOSERS[token])
+        elif token in ('}', ']'):
+            if stack.pop() != token:
+                return None
+        elif token == ':' and len(stack) == 1 and previous is not None:
+            keys.add(previous.strip('"\''))
+        previous = token if kind in ('string', 'word') else None
+    if stack or not keys & XSTATE_KEYS:
+        return None
+    return strings
+
+
+def _single_quoted(token):
+    """The double-quoted JSON string token as a single-quoted one, or None if it contains a single quote"""
+    inner = token[1:-1]
+    if "'" in inner:
+        return None
+    return "'" + re.sub(r'\\(.)', lambda m: m.group(1) if m.group(1) == '"' else m.group(), inner) + "'"
+
+
+def convert_json(text):
+    """text with the double-quoted strings of its XState JSON object single-quoted, or None if it is not one"""
+    strings = _json_strings(text)
+    if strings is None:
+        return None
+    pieces = []
+    position = 0
+    for start, end in strings:
+        token = text[start:end]
+        if token[0] == '"':
+            converted = _single_quoted(token)
+            if converted is not None:
+                pieces.append(text[position:start])
+                pieces.append(converted)
+                position = end
+    pieces.append(text[position:])
+    return ''.join(pieces)
+
+
+def _split_literal(literal):
+    """(prefix, body, suffix, verbatim, interpolated) of a verbatim or raw string literal, or None"""
+    quote = literal.index('"')
+    prefix = literal[:quote]
+    if '@' in prefix:
+        if len(literal) < quote + 2 or not literal.endswith('"'):
+            return None
+        return literal[:quote + 1], literal[quote + 1:-1], '"', True, '$' in prefix
+    run = len(literal) - quote - len(literal[quote:].lstrip('"'))
+    # Raw string; interpolated raw strings ($$"""...""") are left alone
+    if run < 3 or '$' in prefix or len(literal) < quote + 2 * run or not literal.endswith('"' * run):
+        return None
+    return literal[:quote + run], literal[quote + run:-run], literal[-run:], False, False
+
+
+def _decode(body, interpolated):
+    """Text of a verbatim body with "" and {{ }} unescaped and holes replaced by placeholders, plus the holes"""
+    pieces = []
+    holes = []
+    position = 0
+    length = len(body)
+    while position < length:
+        char = body[position]
+        if char == '"':
+            pieces.append('"')
+            position += 2  # the body of a terminated literal only holds doubled quotes
+        elif interpolated and char in '{}' and body.startswith(char, position + 1):
+            pieces.append(char)
+            position += 2
+        elif interpolated and char == '{':
+            end = hole_end(body, position + 1)
+            holes.append(body[position:end])
+            pieces.append(chr(_HOLE_BASE + len(holes) - 1))
+            position = end
+        else:
+            pieces.append(char)
+            position += 1
+    return ''.join(pieces), holes
+
+
+def _encode(text, holes, interpolated):
+    text = text.replace('"', '""')
+    if interpolated:
+        text = text.replace('{', '{{').replace('}', '}}')
+        for number, hole in enumerate(holes):
+            text = text.replace(chr(_HOLE_BASE + number), hole)
+    return text
+
+
+def convert_literal(literal):
+    """A verbatim or raw C# string literal holding an XState script, with its JSON strings single-quoted.
+
+    Returns None if the literal is of another kind or does not hold a script.
+    """
+    parts = _split_literal(literal)
+    if parts is None:
+        return None
+    prefix, body, suffix, verbatim, interpolated = parts
+    if not verbatim:
+        converted = convert_json(body)
+        return None if converted is None else prefix + converted + suffix
+    if any(_HOLE_BASE <= ord(char) < _HOLE_BASE + 0x1000 for char in body):
+        return None
+    text, holes = _decode(body, interpolated)
+    if len(holes) > 0x1000:
+        return None
+    converted = convert_json(text)
+    if converted is None:
+        return None
+    return prefix + _encode(converted, holes, interpolated) + suffix
+
+
+class ScriptConverter:
+    """Single-quotes the JSON strings of the XState scripts embedded in C# verbatim and raw string literals.
+
+    Literals are found with the C# tokenizer and only those holding one JSON
+    object with state-machine keys are touched; everything else, including
+    other strings containing "", is left as is. Conversions are cached by
+    content hash, since the same machine definitions are pasted into many
+    files; the cache keeps the cache_size most recently used, so a
+    long-running watch session does not grow without bound.
+
+    Only whole literals are converted, so a large file can be streamed in
+    blocks cut at block_end (see rewrite_files).
+
+    In self.profile, 'script' counts the literals examined (invocations) and
+    converted (matches), 'cached' the literals answered from the cache.
+    """
+
+    block_end = staticmethod(block_end)
+
+    def __init__(self, cache_size=CACHE_SIZE):
+        self.cache = OrderedDict()  # content hash of a literal -> converted literal, or None if it is not a script
+        self.cache_size = cache_size
+        self.profile = Profile(('script', 'cached'), ('tokenize',))
+
+    def convert(self, literal):
+        key = digest(literal.encode('utf-8'))
+        script, cached = self.profile.rules['script'], self.profile.rules['cached']
+        script.invocations += 1
+        cached.invocations += 1
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            converted = self.cache[key]
+            cached.matches += 1
+        else:
+            converted = self.cache[key] = convert_literal(literal)
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        if converted is not None and converted != literal:
+            script.matches += 1
+        return converted
+
+    def apply(self, content):
+        edits = self.plan(content)
+        return apply_edits(content, edits) if edits else content
+
+    __call__ = apply
+
+    def plan(self, content):
+        """The edits apply() makes to content: one per converted literal, under the rule 'script'"""
+        if '""' not in content:
+            return []
+        started = time.perf_counter()
+        tokens = Tokens(content)
+        edits = []
+        for kind, start, end in zip(tokens.kinds, tokens.starts, tokens.ends):
+            if kind != STRING or '""' not in content[start:end]:
+                continue
+            converted = self.convert(content[start:end])
+            if converted is not None:
+                edits.append((start, end - start, converted, 'script'))
+        self.profile.passes['tokenize'].add((1, 0, len(content), time.perf_counter() - started))
+        return edits
@@ -0,0 +1,151 @@
+"""Read-ahead / write-behind file I/O for trees on slow or network-mounted storage.
+
+The walker's serial loop reads, transforms and stages one file after another,
+so on a network-backed checkout the CPU idles through every read and write.
+pipelined() overlaps them with asyncio:
+
+    reader --(depth)--> transformer --(depth)--> writer --(depth)--> caller
+
+Up to depth reads run ahead of the transform, transformed files are staged in
+batches while the next ones are read, and every hand-off is a bounded queue,
+so a slow stage holds the others back instead of letting files pile up in
+memory. Results come out in input order.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Reads in flight ahead of the transform, and the most files staged in one batch
+DEPTH = 8
+WRITE_BATCH = 16
+
+
+class FileSystem:
+    """The file operations of a rewrite; SlowFileSystem stands in for it to simulate a network mount"""
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def stage(self, sink, path, data):
+        sink.stage(path, data)
+
+
+class SlowFileSystem(FileSystem):
+    """FileSystem that adds latency and a bandwidth limit to every read and staged write.
+
+    Sleeping releases the GIL like real I/O does, so the overlap measured
+    against it is the overlap a slow volume would get.
+    """
+
+    def __init__(self, latency=0.005, bandwidth=20e6):
+        self.latency = latency
+        self.bandwidth = bandwidth
+
+    def _wait(self, size):
+        time.sleep(self.latency + size / self.bandwidth)
+
+    def read(self, path):
+        data = super().read(path)
+        self._wait(len(data))
+        return data
+
+    def stage(self, sink, path, data):
+        self._wait(len(data))
+        super().stage(sink, path, data)
+
+
+LOCAL = FileSystem()
+
+
+async def _pipeline(items, process, write, fs, depth, batch, output):
+    loop = asyncio.get_running_loop()
+    io = ThreadPoolExecutor(max_workers=depth, thread_name_prefix='codemod-io')
+    cpu = ThreadPoolExecutor(max_workers=1, thread_name_prefix='codemod-transform')
+    reads = asyncio.Queue(depth)  # (item, pending read), in input order
+    processed = asyncio.Queue(depth)
+
+    async def reader():
+        for item in items:
+            await reads.put((item, loop.run_in_executor(io, fs.read, item[0])))
+        await reads.put(None)
+
+    async def transformer():
+        while (entry := await reads.get()) is not None:
+            item, read = entry
+            try:
+                data = await read
+            except OSError as e:
+                result = (item[0], None, str(e), None, [])
+            else:
+                result = await loop.run_in_executor(cpu, process, item, data)
+            await processed.put(result)
+        await processed.put(None)
+
+    async def writer():
+        pending = []
+        while True:
+            result = await processed.get()
+            if result is not None:
+                pending.append(result)
+            # Stage whatever has piled up while the last batch was written
+            if pending and (result is None or len(pending) >= batch or processed.empty()):
+                if write is not None:
+                    await loop.run_in_executor(io, write, pending)
+                for done in pending:
+                    await output.put(done)
+                pending = []
+            if result is None:
+                break
+        await output.put(None)
+
+    stages = [asyncio.ensure_future(stage) for stage in (reader(), transformer(), writer())]
+    try:
+        await asyncio.gather(*stages)
+    finally:
+        for stage in stages:
+            stage.cancel()
+        # Reads queued when the pipeline stopped are dropped, failed ones included
+        while not reads.empty():
+            entry = reads.get_nowait()
+            if entry is not None:
+                read = entry[1]
+                if read.done() and not read.cancelled():
+                    read.exception()
+                read.cancel()
+        io.shutdown(wait=True, cancel_futures=True)
+        cpu.shutdown(wait=True, cancel_futures=True)
+
+
+def pipelined(items, process, write=None, fs=LOCAL, depth=DEPTH, batch=WRITE_BATCH):
+    """Yield process(item, data) for each item, in order, with the data read ahead of time.
+
+    items are tuples whose first element is the path to read (with fs).
+    process runs on one worker thread, so transforms never run concurrently.
+    write, if given, receives lists of results to persist; it runs on the
+    I/O threads while later files are read and transformed, and each result
+    is yielded once its batch has been written. Stopping the iteration
+    cancels the reads and writes still pending.
+    """
+    loop = asyncio.new_event_loop()
+    output = asyncio.Queue(depth)
+    task = loop.create_task(_pipeline(items, process, write, fs, depth, batch, output))
+    try:
+        while True:
+            get = loop.create_task(output.get())
+            loop.run_until_complete(asyncio.wait([get, task], return_when=asyncio.FIRST_COMPLETED))
+            if not get.done():
+                # The pipeline failed before producing another result
+                get.cancel()
+                loop.run_until_complete(asyncio.gather(get, return_exceptions=True))
+                task.result()
+            result = get.result()
+            if result is None:
+                break
+            yield result
+        loop.run_until_complete(task)
+    finally:
+        if not task.done():
+            task.cancel()
+            loop.run_until_complete(asyncio.gather(task, return_exceptions=True))
+        loop.close()
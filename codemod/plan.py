@@ -0,0 +1,327 @@
+"""Edit plans: the rewrites of a run as data, to review, merge and replay without running the rules again.
+
+An edit is (offset, length, replacement, rule): the rule replaces length
+characters of the decoded text at offset. A file's plan holds its edits,
+sorted and non-overlapping, together with the hash of the content they were
+computed against and the offsets of its newlines, so positions can be shown
+as line:column without the file. Transforms with a plan() method (RuleSet,
+ShouldRewriter, ScriptConverter, Pipeline) report every edit under the rule
+that made it; for other transforms the edits are recovered from a line diff.
+
+On disk each file's edits are stored column-wise (packed offset, length and
+rule-id arrays plus one joined replacement string), like the cache manifest,
+and the whole plan is marshalled and zlib-compressed. Plans are written by
+the scripts' --plan option and read by python -m codemod.replay.
+"""
+import bisect
+import difflib
+import hashlib
+import marshal
+import os
+import re
+import zlib
+from array import array
+from itertools import accumulate
+
+from codemod.cache import DIGEST_SIZE, digest
+from codemod.stream import CHUNK_SIZE, read_blocks
+
+# Bump when the on-disk layout changes; older plans are then refused
+FORMAT = 1
+
+_NEWLINE = re.compile('\n')
+
+
+def apply_edits(content, edits):
+    """content with sorted, non-overlapping edits made, in one pass"""
+    pieces = []
+    position = 0
+    for offset, length, replacement, _ in edits:
+        pieces.append(content[position:offset])
+        pieces.append(replacement)
+        position = offset + length
+    pieces.append(content[position:])
+    return ''.join(pieces)
+
+
+def compose(first, second, middle):
+    """Edits of the original text with the effect of first and then second.
+
+    second is made on middle, the text first produces. Where an edit of
+    second touches text an edit of first produced, they become one edit,
+    attributed to the rule of second since it produced the final text.
+    """
+    if not first or not second:
+        return list(first or second)
+    # Every edit as a span of middle: (start, end, from second, edit)
+    spans = []
+    shift = 0
+    for edit in first:
+        start = edit[0] + shift
+        spans.append((start, start + len(edit[2]), False, edit))
+        shift += len(edit[2]) - edit[1]
+    spans.extend((edit[0], edit[0] + edit[1], True, edit) for edit in second)
+    spans.sort(key=lambda span: (span[0], span[1]))
+
+    # Group spans that overlap, or touch where one of them is empty (an insertion)
+    groups = []
+    end = empty_at_end = None
+    for span in spans:
+        start, stop = span[0], span[1]
+        if groups and (start < end or start == end and (start == stop or empty_at_end)):
+            groups[-1].append(span)
+            if stop > end:
+                end, empty_at_end = stop, start == stop
+            elif stop == end:
+                empty_at_end = empty_at_end or start == stop
+        else:
+            groups.append([span])
+            end, empty_at_end = stop, start == stop
+
+    edits = []
+    shift = 0  # middle minus original offset, before the current group
+    for group in groups:
+        delta = sum(len(edit[2]) - edit[1] for _, _, later, edit in group if not later)
+        later = [edit for _, _, is_later, edit in group if is_later]
+        if not later:
+            edits.extend(edit for _, _, _, edit in group)
+        elif len(later) == len(group):
+            edits.extend((offset - shift, length, replacement, rule) for offset, length, replacement, rule in later)
+        else:
+            start = min(span[0] for span in group)
+            stop = max(span[1] for span in group)
+            replacement = apply_edits(middle[start:stop], [(offset - start, length, text, rule)
+                                                           for offset, length, text, rule in later])
+            edits.append((start - shift, stop - start - delta, replacement, later[-1][3]))
+        shift += delta
+    return edits
+
+
+def text_edits(old, new, rule=None):
+    """Edits turning old into new, one per changed block of lines, trimmed to the characters that differ"""
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    old_starts = list(accumulate(map(len, old_lines), initial=0))
+    new_starts = list(accumulate(map(len, new_lines), initial=0))
+    edits = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        before = old[old_starts[i1]:old_starts[i2]]
+        after = new[new_starts[j1]:new_starts[j2]]
+        prefix = len(os.path.commonprefix([before, after]))
+        suffix = len(os.path.commonprefix([before[prefix:][::-1], after[prefix:][::-1]]))
+        edits.append((old_starts[i1] + prefix, len(before) - prefix - suffix,
+                      after[prefix:len(after) - suffix], rule))
+    return edits
+
+
+def plan_edits(transform, content):
+    """The edits transform makes to content, each under the rule that made it if the transform can tell"""
+    plan = getattr(transform, 'plan', None)
+    if plan is not None:
+        return plan(content)
+    return text_edits(content, transform(content))
+
+
+def plan_windows(content, spans, transform):
+    """The edits of applying transform to the given [start, end) line spans of content only (see apply_windows)"""
+    lines = content.split('\n')
+    starts = list(accumulate((len(line) + 1 for line in lines), initial=0))
+    edits = []
+    warnings = getattr(transform, 'warnings', None)
+    for start, end in spans:
+        if start >= len(lines):
+            break
+        low, high = starts[start], min(starts[min(end, len(lines))], len(content))
+        mark = len(warnings) if warnings is not None else 0
+        edits.extend((offset + low, length, replacement, rule)
+                     for offset, length, replacement, rule in plan_edits(transform, content[low:high]))
+        if warnings:
+            warnings[mark:] = [(line + start, rule, message) for line, rule, message in warnings[mark:]]
+    return edits
+
+
+def newline_offsets(content):
+    return array('q', (match.start() for match in _NEWLINE.finditer(content)))
+
+
+class FilePlan:
+    """The edits of one file, against the content with the given hash"""
+
+    def __init__(self, path, content_hash, newlines, edits):
+        self.path = path
+        self.digest = content_hash
+        self.newlines = newlines
+        self.edits = edits
+
+    def position(self, offset):
+        """1-based (line, column) of a character offset"""
+        line = bisect.bisect_left(self.newlines, offset)
+        return line + 1, offset - (self.newlines[line - 1] + 1 if line else 0) + 1
+
+    def pack(self, rule_ids):
+        offsets, lengths, rules, sizes = array('q'), array('q'), array('q'), array('q')
+        for offset, length, replacement, rule in self.edits:
+            offsets.append(offset)
+            lengths.append(length)
+            rules.append(rule_ids[rule or ''])
+            sizes.append(len(replacement))
+        return (self.path, self.digest, self.newlines.tobytes(), offsets.tobytes(), lengths.tobytes(),
+                rules.tobytes(), sizes.tobytes(), ''.join(edit[2] for edit in self.edits))
+
+    @classmethod
+    def unpack(cls, packed, rule_names):
+        path, content_hash, newlines, offsets, lengths, rules, sizes, text = packed
+        bounds = list(accumulate(array('q', sizes), initial=0))
+        edits = [(offset, length, text[start:end], rule_names[rule])
+                 for offset, length, rule, start, end in zip(array('q', offsets), array('q', lengths),
+                                                             array('q', rules), bounds, bounds[1:])]
+        return cls(path, content_hash, array('q', newlines), edits)
+
+
+class Plan:
+    """Edit plans by path, as written by the scripts' --plan option; name is the file it was loaded from"""
+
+    def __init__(self, files=None, name=None):
+        self.files = files if files is not None else {}
+        self.name = name
+
+    def add(self, path, data, edits):
+        """Plan edits of the file whose original contents are data"""
+        self.files[path] = FilePlan(path, digest(data), newline_offsets(data.decode('utf-8')), list(edits))
+
+    def rules(self):
+        """Every rule name used, sorted; '' stands for edits no rule is known for"""
+        return sorted({edit[3] or '' for file in self.files.values() for edit in file.edits})
+
+    def save(self, path):
+        names = self.rules()
+        rule_ids = {name: index for index, name in enumerate(names)}
+        packed = marshal.dumps((FORMAT, names, [file.pack(rule_ids) for file in self.files.values()]))
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(zlib.compress(packed))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        try:
+            layout, names, files = marshal.loads(zlib.decompress(data))
+        except (zlib.error, EOFError, ValueError, TypeError) as e:
+            raise ValueError(f"{path}: not an edit plan") from e
+        if layout != FORMAT:
+            raise ValueError(f"{path}: edit plan format {layout}, expected {FORMAT}")
+        names = [name or None for name in names]
+        return cls({packed[0]: FilePlan.unpack(packed, names) for packed in files}, path)
+
+
+def _combine(kept, edits, name, file):
+    """kept (sorted (edit, plan name) pairs) with the edits of plan name, all against the same text.
+
+    Returns (pairs, None), or (None, message) if an edit overlaps a different one.
+    """
+    pairs = sorted(kept + [(edit, name) for edit in edits], key=lambda pair: pair[0][:3])
+    combined = []
+    reach = None  # (end, edit, plan name) of the kept edit reaching furthest
+    for edit, owner in pairs:
+        if combined and edit[:3] == combined[-1][0][:3]:
+            continue  # made by both plans
+        previous = combined[-1][0] if combined else None
+        if reach is not None and (edit[0] < reach[0] or edit[1] == 0 == previous[1] and edit[0] == previous[0]):
+            line, column = file.position(edit[0])
+            return None, (f"line {line}, column {column}: {edit[3] or 'an edit'} of {owner} "
+                          f"overlaps {reach[1][3] or 'an edit'} of {reach[2]}")
+        combined.append((edit, owner))
+        if reach is None or edit[0] + edit[1] >= reach[0]:
+            reach = (edit[0] + edit[1], edit, owner)
+    return combined, None
+
+
+def merge(plans, read=None):
+    """One plan with the edits of every plan, applied in order; returns (plan, conflicts).
+
+    A file's plans are taken in the order given, each rebased onto the
+    result of the ones before it. A plan computed against the same contents
+    as the first has its edits combined with theirs: edits made by more than
+    one plan are kept once, and other edits only conflict if their ranges
+    overlap. A plan computed against the result of the ones before (a script
+    run on the output of another) is composed with them (see compose); telling
+    so needs the file's planned contents, from read(path) -> bytes or None.
+    A file with a conflict, or with a plan computed against other contents,
+    is left out of the merged plan and reported in conflicts as (path, message).
+    """
+    by_path = {}
+    for index, plan in enumerate(plans):
+        for path, file in plan.files.items():
+            by_path.setdefault(path, []).append((plan.name or f'plan {index + 1}', file))
+
+    merged = Plan()
+    conflicts = []
+    for path, files in by_path.items():
+        first_name, first = files[0]
+        pairs = [(edit, first_name) for edit in first.edits]
+        content = None  # the planned contents, once read
+        for name, file in files[1:]:
+            message = None
+            if file.digest == first.digest:
+                pairs, message = _combine(pairs, file.edits, name, first)
+            else:
+                if content is None and read is not None:
+                    data = read(path)
+                    if data is not None and digest(data) == first.digest:
+                        content = data.decode('utf-8')
+                middle = apply_edits(content, [edit for edit, _ in pairs]) if content is not None else None
+                if middle is None or digest(middle.encode('utf-8')) != file.digest:
+                    message = f"{name} was planned against other contents of the file than {first_name}"
+                else:
+                    owners = {edit: owner for edit, owner in pairs}
+                    pairs = [(edit, owners.get(edit, name))
+                             for edit in compose([edit for edit, _ in pairs], file.edits, middle)]
+            if message is not None:
+                conflicts.append((path, message))
+                break
+        else:
+            merged.files[path] = FilePlan(path, first.digest, first.newlines, [edit for edit, _ in pairs])
+    return merged, conflicts
+
+
+class PlanWriter:
+    """Collects the edit plan of each would-be rewrite and saves it on commit, instead of touching the tree.
+
+    Stands in for a Transaction like DiffWriter does.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.plan = Plan()
+
+    def add(self, target, data, edits):
+        self.plan.add(target, data, edits)
+
+    def plan_blocks(self, target, transform, block_end, chunk_size=CHUNK_SIZE):
+        """Plan applying transform to target a block at a time (see stream.read_blocks); True if any block changes"""
+        hasher = hashlib.blake2b(digest_size=DIGEST_SIZE)
+        newlines = array('q')
+        edits = []
+        offset = 0
+        with open(target, 'rb', buffering=chunk_size) as f:
+            for text in read_blocks(f, block_end, chunk_size):
+                hasher.update(text.encode('utf-8'))
+                edits.extend((offset + start, length, replacement, rule)
+                             for start, length, replacement, rule in plan_edits(transform, text))
+                newlines.extend(offset + match.start() for match in _NEWLINE.finditer(text))
+                offset += len(text)
+        if edits:
+            self.plan.files[target] = FilePlan(target, hasher.digest(), newlines, edits)
+        return bool(edits)
+
+    def commit(self):
+        self.plan.save(self.path)
+        return []
+
+    def rollback(self):
+        pass
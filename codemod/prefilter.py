@@ -0,0 +1,226 @@
+import re
+
+# The regex parser is not public API (re._parser since 3.11, sre_parse before, deprecated since 3.11). If it is
+# missing or fails, nothing is prefiltered: every rule is matched against the whole text and none is time-boxed.
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:
+    try:
+        import sre_constants
+        import sre_parse
+    except ImportError:
+        sre_constants = sre_parse = None
+
+if sre_parse is not None:
+    CATEGORY = sre_constants.CATEGORY
+    IN = sre_constants.IN
+    LITERAL = sre_constants.LITERAL
+    MAX_REPEAT = sre_constants.MAX_REPEAT
+    MAXREPEAT = sre_constants.MAXREPEAT
+    MIN_REPEAT = sre_constants.MIN_REPEAT
+    NEGATE = sre_constants.NEGATE
+    NOT_LITERAL = sre_constants.NOT_LITERAL
+    RANGE = sre_constants.RANGE
+    SUBPATTERN = sre_constants.SUBPATTERN
+
+    _CATEGORIES = {getattr(sre_constants, name): re.compile(pattern) for name, pattern in [
+        ('CATEGORY_DIGIT', r'\d'), ('CATEGORY_NOT_DIGIT', r'\D'),
+        ('CATEGORY_SPACE', r'\s'), ('CATEGORY_NOT_SPACE', r'\S'),
+        ('CATEGORY_WORD', r'\w'), ('CATEGORY_NOT_WORD', r'\W'),
+    ]}
+
+ASCII = [chr(code) for code in range(128)]
+
+
+def _parse(pattern):
+    """The parsed items of pattern, or None if the regex parser is unavailable or fails on it"""
+    if sre_parse is None:
+        return None
+    try:
+        return list(sre_parse.parse(pattern))
+    except Exception:
+        return None
+
+
+def canonical(pattern):
+    """Key under which two patterns are equivalent: their parsed form, or the pattern itself without the parser"""
+    items = _parse(pattern)
+    return pattern if items is None else repr(items)
+
+
+def _class_matches(items, char):
+    code = ord(char)
+    negate = False
+    found = False
+    for op, arg in items:
+        if op is NEGATE:
+            negate = True
+        elif op is LITERAL:
+            found = found or arg == code
+        elif op is RANGE:
+            found = found or arg[0] <= code <= arg[1]
+        elif op is CATEGORY:
+            category = _CATEGORIES.get(arg)
+            found = found or category is None or category.match(char) is not None
+        else:
+            found = True
+    return found != negate
+
+
+def _can_consume(items, char):
+    """Conservative: True unless the parsed items certainly never consume char"""
+    code = ord(char)
+    for op, arg in items:
+        if op is LITERAL:
+            if arg == code:
+                return True
+        elif op is NOT_LITERAL:
+            if arg != code:
+                return True
+        elif op is IN:
+            if _class_matches(arg, char):
+                return True
+        elif op in (MAX_REPEAT, MIN_REPEAT):
+            if _can_consume(arg[2], char):
+                return True
+        elif op is SUBPATTERN:
+            if _can_consume(arg[-1], char):
+                return True
+        else:
+            return True
+    return False
+
+
+def analyze(pattern):
+    """Longest literal every match of pattern must contain, the ASCII
+    characters that can never appear between the start of a match and it, and
+    whether a match always ends at the first ')' at or after the literal.
+
+    Returns (literal, stops, bounded); literal is None if the pattern has no
+    top-level literal run (or the pattern cannot be parsed, see _parse). A
+    match therefore starts after the last stop character preceding its literal.
+    """
+    items = _parse(pattern)
+    if items is None:
+        return None, frozenset(), False
+    best = None
+    run_start = None
+    for index, (op, arg) in enumerate(items + [(None, None)]):
+        if op is LITERAL:
+            if run_start is None:
+                run_start = index
+            continue
+        if run_start is not None:
+            if best is None or index - run_start > best[1] - best[0]:
+                best = (run_start, index)
+            run_start = None
+
+    if best is None:
+        return None, frozenset(), False
+    literal = ''.join(chr(arg) for _, arg in items[best[0]:best[1]])
+    prefix = items[:best[0]]
+    stops = frozenset(char for char in ASCII if not _can_consume(prefix, char))
+
+    tail = items[best[1]:]
+    if tail:
+        bounded = tail[-1] == (LITERAL, ord(')')) and not _can_consume(tail[:-1], ')')
+    else:
+        bounded = literal.endswith(')')
+    return literal, stops, bounded
+
+
+def _first_unbounded(items):
+    for op, arg in items:
+        if op in (MAX_REPEAT, MIN_REPEAT) and arg[1] is MAXREPEAT:
+            return arg[2]
+        if op is SUBPATTERN:
+            found = _first_unbounded(arg[-1])
+            if found is not None:
+                return found
+    return None
+
+
+def run_stops(pattern):
+    """ASCII characters that end a run of the first unbounded repeat of pattern (e.g. the receiver).
+
+    Backtracking over such a repeat grows with the length of the run it can
+    span, so a rule's worst case is bounded by the longest run between two of
+    these characters. Falls back to the stops of analyze() if the pattern has
+    no unbounded repeat, and returns None if it cannot be parsed (see _parse).
+    """
+    items = _parse(pattern)
+    if items is None:
+        return None
+    repeated = _first_unbounded(items)
+    if repeated is None:
+        return analyze(pattern)[1]
+    return frozenset(char for char in ASCII if not _can_consume(repeated, char))
+
+
+class LiteralIndex:
+    """Finds every occurrence of a set of literals in one scan.
+
+    Occurrences may overlap (e.g. '.Assert.Contains(' inside
+    'pingHits.Assert.Contains('); literals that are prefixes of a longer
+    literal found at the same position are reported too.
+    """
+
+    def __init__(self, literals):
+        self.literals = sorted(set(literals), key=len, reverse=True)
+        self._regex = re.compile('|'.join(re.escape(literal) for literal in self.literals))
+        self._prefixes = {literal: [other for other in self.literals
+                                    if other != literal and literal.startswith(other)]
+                          for literal in self.literals}
+
+    def scan(self, content):
+        """Map of literal -> sorted positions; literals that do not occur are absent"""
+        found = {}
+        if not self.literals:
+            return found
+        search = self._regex.search
+        match = search(content)
+        while match is not None:
+            position = match.start()
+            literal = match.group()
+            found.setdefault(literal, []).append(position)
+            for prefix in self._prefixes[literal]:
+                found.setdefault(prefix, []).append(position)
+            match = search(content, position + 1)
+        return found
+
+
+def stop_pattern(stops):
+    """Pattern whose match(content, lo, position).end() is just past the last stop character"""
+    if not stops:
+        return None
+    return re.compile('(?s:.*)[' + ''.join(re.escape(char) for char in sorted(stops)) + ']')
+
+
+def window_start(content, low, position, stops):
+    """Earliest position at or after low where a match ending in the literal at position can start"""
+    if stops is None:
+        return low
+    last = stops.match(content, low, position)
+    return low if last is None else last.end()
+
+
+def line_windows(content, occurrences, stops):
+    """Merged (start, end) spans around literal occurrences.
+
+    occurrences is a sorted list of (position, literal). A window starts after
+    the last stop character before the literal (see stop_pattern) and ends at
+    the end of the line holding the first ')' at or after the literal, so
+    argument lists spanning lines are included.
+    """
+    windows = []
+    length = len(content)
+    for position, literal in occurrences:
+        start = window_start(content, windows[-1][1] if windows else 0, position, stops)
+        close = content.find(')', position + len(literal) - 1)
+        end = content.find('\n', close if close != -1 else position)
+        end = length if end == -1 else end + 1
+        if windows and start <= windows[-1][1]:
+            windows[-1] = (windows[-1][0], max(end, windows[-1][1]))
+        else:
+            windows.append((start, end))
+    return windows
@@ -0,0 +1,186 @@
+import json
+import os
+import re
+
+from codemod.csharp import ShouldRewriter
+from codemod.plan import apply_edits, compose, plan_edits
+from codemod.prefilter import canonical
+from codemod.rules import Rule, RuleSet
+from codemod.stats import Profile
+
+# The Should -> Assert rule table shared by the fix_*.py scripts
+SHOULD_RULES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'should_rules.json')
+
+# The FluentAssertions method a regex rule rewrites, from the escaped .Should().Method( in its pattern
+_SHOULD_METHOD = re.compile(r'\\\.Should\\\(\\\)\\\.(\w+)\\\(')
+
+
+def _canonical(rule):
+    """Key under which two rules are equivalent: same parsed pattern, replacement and anchor"""
+    return canonical(rule['pattern']), rule['replacement'], rule.get('anchor', '.Should()')
+
+
+def _should_method(rule):
+    match = _SHOULD_METHOD.search(rule['pattern'])
+    return match.group(1) if match else None
+
+
+def _regex_stage(stage):
+    """RuleSet for a stage: rules grouped by phase, each phase ordered by priority.
+
+    A rule equivalent to a higher-priority rule of the same phase can never
+    match, so it is dropped; the dropped names are returned alongside.
+    """
+    phases = {}
+    for rule in sorted(stage['rules'], key=lambda rule: (rule.get('phase', 0), rule['priority'])):
+        phases.setdefault(rule.get('phase', 0), []).append(rule)
+
+    built = []
+    dropped = []
+    for phase in sorted(phases):
+        seen = set()
+        rules = []
+        for rule in phases[phase]:
+            key = _canonical(rule)
+            if key in seen:
+                dropped.append(rule['name'])
+                continue
+            seen.add(key)
+            rules.append(Rule(rule['name'], rule['pattern'], rule['replacement'],
+                              anchor=rule.get('anchor', '.Should()'), max_window=rule.get('max_window')))
+        built.append(rules)
+
+    if 'separator' in stage:
+        return RuleSet(*built, separator=stage['separator']), dropped
+    return RuleSet(*built), dropped
+
+
+def _scanner_stage(stage):
+    templates = {}
+    dropped = []
+    for rule in sorted(stage['rules'], key=lambda rule: rule['priority']):
+        if rule['name'] in templates:
+            dropped.append(rule['name'])
+            continue
+        templates[rule['name']] = rule['replacement']
+    return ShouldRewriter(templates), dropped
+
+
+class Registry:
+    """Rule table loaded from a JSON file: named stages in priority order.
+
+    Each stage is either a regex stage (rules with name, pattern, replacement,
+    priority and optional phase/anchor/budget_ms/max_window; built into a
+    RuleSet, see codemod/fuzz.py for the last two, which gives the rules of
+    one receiver class the same max_window) or, with
+    "scanner": true, a ShouldRewriter whose rules map a FluentAssertions
+    method name to its Assert template. Equivalent rules within a phase are
+    deduplicated (see dropped).
+    """
+
+    def __init__(self, stages):
+        self.stages = {}
+        self.dropped = {}
+        self._specs = {}
+        for stage in sorted(stages, key=lambda stage: stage['priority']):
+            if stage['name'] in self.stages:
+                raise ValueError(f"Duplicate stage name: {stage['name']}")
+            build = _scanner_stage if stage.get('scanner') else _regex_stage
+            self.stages[stage['name']], self.dropped[stage['name']] = build(stage)
+            self._specs[stage['name']] = stage
+
+    @classmethod
+    def load(cls, path=SHOULD_RULES):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f)['stages'])
+
+    def stage(self, name):
+        return self.stages[name]
+
+    def pipeline(self, names=None):
+        """All stages (or the named ones) as one transform: scanner stages first, then regex stages.
+
+        Each group runs in priority order. A regex rule for a .Should() method
+        that a scanner stage in the pipeline has a template for is superseded:
+        the tokenizer has already rewritten every call it can, and the regex
+        would only reach the calls it leaves alone on purpose (chained,
+        or with arguments its template cannot carry). Superseded rule names
+        are listed by stage in the pipeline's superseded.
+        """
+        names = list(self.stages) if names is None else [name for name in self.stages if name in names]
+        scanners = [name for name in names if isinstance(self.stages[name], ShouldRewriter)]
+        covered = {rule.name for name in scanners for rule in self.stages[name].rules}
+        stages = [(name, self.stages[name]) for name in scanners]
+        superseded = {}
+        for name in names:
+            if name in scanners:
+                continue
+            rules = self._specs[name]['rules']
+            kept = [rule for rule in rules if _should_method(rule) not in covered]
+            superseded[name] = [rule['name'] for rule in rules if rule not in kept]
+            if len(kept) == len(rules):
+                stages.append((name, self.stages[name]))
+            elif kept:
+                stages.append((name, _regex_stage(dict(self._specs[name], rules=kept))[0]))
+        return Pipeline(stages, superseded)
+
+
+class Pipeline:
+    """Applies several stages in order to the same text, so a file is read and written once.
+
+    Rule names in the combined profile and in self.warnings (see
+    RuleSet.warnings) are prefixed with their stage name. superseded maps a
+    stage name to the rules left out of it (see Registry.pipeline).
+    """
+
+    def __init__(self, stages, superseded=None):
+        self.stages = stages
+        self.superseded = superseded or {}
+        self.rules = [rule for _, transform in stages for rule in transform.rules]
+        self.profile = Profile.combine((name, transform.profile) for name, transform in stages)
+        self.warnings = []
+
+    def _collect(self, name, transform):
+        warnings = getattr(transform, 'warnings', None)
+        if warnings:
+            self.warnings.extend((line, f'{name}.{rule}', message) for line, rule, message in warnings)
+            del warnings[:]
+
+    @property
+    def profiling(self):
+        return any(getattr(transform, 'profiling', False) for _, transform in self.stages)
+
+    @profiling.setter
+    def profiling(self, value):
+        for _, transform in self.stages:
+            if hasattr(transform, 'profiling'):
+                transform.profiling = value
+
+    @property
+    def hits(self):
+        return {name: stats.matches for name, stats in self.profile.rules.items()}
+
+    def apply(self, content):
+        for name, transform in self.stages:
+            content = transform.apply(content)
+            self._collect(name, transform)
+        return content
+
+    __call__ = apply
+
+    def plan(self, content):
+        """The edits apply() makes to content, with rule names prefixed by their stage name"""
+        edits = []
+        for name, transform in self.stages:
+            step = [(offset, length, replacement, f'{name}.{rule}' if rule else name)
+                    for offset, length, replacement, rule in plan_edits(transform, content)]
+            self._collect(name, transform)
+            if step:
+                edits = compose(edits, step, content)
+                content = apply_edits(content, step)
+        return edits
+
+    def report(self):
+        """Per-rule hit counts, most frequent first"""
+        return sorted(((name, stats.matches) for name, stats in self.profile.rules.items() if stats.matches),
+                      key=lambda item: -item[1])
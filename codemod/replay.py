@@ -0,0 +1,124 @@
+"""Review, merge and apply the edit plans saved by the scripts' --plan option (see codemod/plan.py).
+
+    python -m codemod.replay show PLAN [PLAN ...]
+    python -m codemod.replay apply PLAN [PLAN ...] [--dry-run] [--no-validate] [--root DIR]
+
+apply merges the plans in the order given, each on top of the ones before
+(see plan.merge), and makes each file's edits in one pass, without running
+any rule. A file whose edits overlap between plans, or that changed since it
+was planned, is reported and left alone, and the exit status is 1.
+Like the scripts, every result is validated before it is written, and the
+run is recorded in the undo journal under --root (default: the directory
+holding the planned files).
+"""
+import argparse
+import os
+import sys
+from collections import Counter
+
+from codemod.cache import digest
+from codemod.diff import DiffWriter
+from codemod.journal import Journal
+from codemod.plan import Plan, apply_edits, merge
+from codemod.structure import validate
+from codemod.transaction import Transaction
+
+
+def _read(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def show(plans, output=sys.stdout):
+    """Print every edit of plans at its line:column, with the text it replaces while the file is unchanged"""
+    rules = Counter()
+    for plan in plans:
+        for path, file in plan.files.items():
+            data = _read(path)
+            content = data.decode('utf-8') if data is not None and digest(data) == file.digest else None
+            for offset, length, replacement, rule in file.edits:
+                line, column = file.position(offset)
+                old = repr(content[offset:offset + length]) if content is not None else f'{length} chars'
+                print(f"{path}({line},{column}): {rule or 'edit'}: {old} -> {replacement!r}", file=output)
+                rules[rule or 'edit'] += 1
+    print(f"\n{sum(rules.values())} edits in {sum(len(plan.files) for plan in plans)} files", file=output)
+    for rule, count in rules.most_common():
+        print(f"  {rule}: {count}", file=output)
+
+
+def apply(plan, sink, validator=validate, log=sys.stdout):
+    """Make the edits of plan through sink (a Transaction or DiffWriter); returns the number of files skipped"""
+    skipped = 0
+    for path, file in plan.files.items():
+        data = _read(path)
+        if data is None or digest(data) != file.digest:
+            print(f"Skipping {path}: {'missing' if data is None else 'changed since it was planned'}", file=log)
+            skipped += 1
+            continue
+        content = data.decode('utf-8')
+        new_content = apply_edits(content, file.edits)
+        problems = validator(content, new_content) if validator is not None else []
+        if problems:
+            line, message = problems[0]
+            print(f"Skipping {path}({line}): {message}", file=log)
+            skipped += 1
+            continue
+        if isinstance(sink, DiffWriter):
+            sink.diff(path, content, new_content)
+        else:
+            sink.stage(path, new_content.encode('utf-8'))
+    return skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Review, merge and apply edit plans saved with --plan")
+    commands = parser.add_subparsers(dest='command', required=True)
+    show_command = commands.add_parser('show', help='list every planned edit')
+    show_command.add_argument('plans', nargs='+', metavar='PLAN')
+    apply_command = commands.add_parser('apply', help='merge the plans and make their edits')
+    apply_command.add_argument('plans', nargs='+', metavar='PLAN')
+    apply_command.add_argument('--dry-run', action='store_true',
+                               help='write a unified diff of the changes to stdout instead of modifying files')
+    apply_command.add_argument('--no-validate', action='store_true',
+                               help='write results even if they leave brackets, literals or Assert calls broken')
+    apply_command.add_argument('--root', help='directory holding the undo journal')
+    args = parser.parse_args(argv)
+
+    try:
+        plans = [Plan.load(path) for path in args.plans]
+    except (OSError, ValueError) as e:
+        print(f"Cannot read plan: {e}", file=sys.stderr)
+        return 1
+    if args.command == 'show':
+        show(plans)
+        return 0
+
+    log = sys.stderr if args.dry_run else sys.stdout
+    plan, conflicts = merge(plans, _read)
+    for path, message in conflicts:
+        print(f"Skipping {path}: {message}", file=log)
+    if not plan.files:
+        return 1 if conflicts else 0
+
+    root = args.root or os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in plan.files])
+    journal = Journal(root)
+    sink = DiffWriter(sys.stdout) if args.dry_run else Transaction(root, journal)
+    try:
+        skipped = apply(plan, sink, None if args.no_validate else validate, log)
+    except BaseException:
+        sink.rollback()
+        raise
+    changed = sink.commit()
+    if not args.dry_run:
+        for path in changed:
+            print(f"Applied: {path}", file=log)
+        if changed:
+            print(f"Undo with: python -m codemod.undo --root {journal.root} undo {journal.run_id}", file=log)
+    return 1 if conflicts or skipped else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
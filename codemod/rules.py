@@ -0,0 +1,414 @@
+import bisect
+import re
+import time
+
+from codemod.plan import apply_edits, compose
+from codemod.prefilter import LiteralIndex, analyze, line_windows, run_stops, stop_pattern, window_start
+from codemod.stats import Profile
+
+# \N group references in patterns and replacement templates (not preceded by an escaping backslash)
+_GROUP_REF = re.compile(r'(?<!\\)((?:\\\\)*)\\(\d+)')
+
+_WHITESPACE = frozenset(' \t\n\r\f\v')
+
+
+def _shift_groups(text, offset, named=False):
+    """Renumber \\N group references by offset so a rule can live inside a combined pattern"""
+    if named:
+        return _GROUP_REF.sub(lambda m: f'{m.group(1)}\\g<{int(m.group(2)) + offset}>', text)
+    return _GROUP_REF.sub(lambda m: f'{m.group(1)}(?:\\{int(m.group(2)) + offset})', text)
+
+
+def _run_pattern(stops, length):
+    """Pattern finding each whole run of more than length characters outside stops, tried only where a run starts"""
+    chars = ''.join(re.escape(char) for char in sorted(stops))
+    return re.compile(f'(?<![^{chars}])[^{chars}]{{{length + 1},}}')
+
+
+def _overlaps(span, spans):
+    """True if the (start, end) span overlaps any of the sorted spans"""
+    index = bisect.bisect_left(spans, (span[1],))
+    return index > 0 and spans[index - 1][1] > span[0]
+
+
+def _occurrences(content, literal):
+    position = content.find(literal)
+    while position != -1:
+        yield position
+        position = content.find(literal, position + 1)
+
+
+class Rule:
+    """A single named regex rewrite: pattern -> replacement template.
+
+    With max_window, the rule is time-boxed: its worst case grows with the
+    run of characters its first unbounded repeat (usually the receiver) can
+    span, so it is never tried inside a longer run, nor at a literal hit
+    whose site (see sites) holds one. The limit comes from the
+    fuzz harness (python -m codemod.fuzz); unlike a timer it gives the same
+    output on every machine.
+    """
+
+    def __init__(self, name, pattern, replacement, anchor='.Should()', max_window=None):
+        self.name = name
+        self.pattern = pattern
+        self.replacement = replacement
+        self.anchor = anchor  # literal that every match contains exactly once
+        self.regex = re.compile(pattern)
+        # Longest literal every match contains, characters a match never has before it,
+        # and whether the match always ends at the first ')' after the literal
+        self.literal, self.stops, self.bounded = analyze(pattern)
+        self.run_stops = run_stops(pattern) if max_window else None
+        # Without the regex parser runs cannot be told apart (see prefilter._parse): the rule is not time-boxed
+        self.max_window = max_window if self.run_stops is not None else None
+        self._runs = _run_pattern(self.run_stops, max_window) if self.run_stops else None
+        self._window_stops = stop_pattern(self.stops) if max_window else None
+
+    def long_runs(self, content):
+        """(start, end) of every run in content longer than max_window"""
+        if self.max_window is None or len(content) <= self.max_window:
+            return []
+        if self._runs is None:
+            return [(0, len(content))]  # nothing ends a run: the whole text is one
+        return [match.span() for match in self._runs.finditer(content)]
+
+    def sites(self, content):
+        """(position, start, end) of each literal hit: where a match holding it can start and end.
+
+        A match starts after the last stop character before the literal (see
+        stop_pattern) and, if the rule is bounded, ends at the first ')' at or
+        after it; otherwise the site runs to the end of that line. Unlike
+        line_windows, the sites of neighbouring hits are not merged.
+        """
+        if self.literal is None:
+            return [(0, 0, len(content))]
+        sites = []
+        start = previous = 0
+        length = len(content)
+        for position in _occurrences(content, self.literal):
+            # With no stop character since the previous hit, a match can start where one holding that hit could
+            if self._window_stops is not None:
+                last = self._window_stops.match(content, previous, position)
+                if last is not None:
+                    start = last.end()
+            close = content.find(')', position + len(self.literal) - 1)
+            if self.bounded and close != -1:
+                end = close + 1
+            else:
+                end = content.find('\n', close if close != -1 else position)
+                end = length if end == -1 else end + 1
+            sites.append((position, start, end))
+            previous = position
+        return sites
+
+    def edits(self, content, skip=()):
+        """The matches of re.sub as (offset, length, replacement, rule name) edits, skipping the (start, end) spans.
+
+        No match is tried inside a skipped span; a match that would run into
+        one is dropped. Returns (edits, offsets of the dropped matches).
+        """
+        edits = []
+        dropped = []
+        position = 0
+        for low, high in list(skip) + [(len(content), len(content))]:
+            for match in self.regex.finditer(content, position, low):
+                if high > low:
+                    # The segment ends at a skipped span: the match may have been cut short there
+                    full = self.regex.match(content, match.start())
+                    if full is None or full.end() != match.end():
+                        dropped.append(match.start())
+                        continue
+                edits.append((match.start(), match.end() - match.start(), match.expand(self.replacement), self.name))
+            position = max(position, high)
+        return edits, dropped
+
+    def apply(self, content):
+        return self.regex.subn(self.replacement, content)
+
+
+class RuleSet:
+    """Ordered rewrite rules compiled into one alternation per phase.
+
+    Rules inside a phase are matched in a single left-to-right scan; when several
+    rules can match at the same position the earlier rule wins, exactly as with
+    the ordered re.sub passes. Rules that repair the output of earlier rules
+    (e.g. the .Assert. fixups), or whose receiver pattern differs from their
+    neighbours' (so could start further left), go in a later phase.
+
+    The single scan only differs from the ordered passes when two candidate
+    matches run into each other, e.g. an argument spilling over into the next
+    line's .Should(). Such phases fall back to the ordered passes, so the output
+    is always identical to apply_sequential().
+
+    Before scanning, every rule literal (e.g. '.Should().HaveCount(') is located
+    in one pass. Only rules whose literal occurs take part in the alternation,
+    and they are only tried on the lines around those occurrences.
+
+    A rule time-boxed with a max_window is not tried inside a longer run or
+    at the literal hits whose sites (see Rule.sites) hold part of one, and
+    is applied as usual everywhere else, each hit decided on its own. Every
+    skipped hit (and match cut short by a run) is appended to self.warnings
+    as (line, rule name, message), for the caller to report and clear; the
+    'guard' pass counts the texts checked for long runs and the skipped hits
+    (as matches). A
+    phase whose input holds such a run runs as the ordered passes, which
+    decide it for each rule on the text the rule is applied to, so both
+    implementations agree.
+
+    Per-rule invocations, matches and bytes scanned are counted in self.profile;
+    the time of a combined scan is charged to its phase. With profiling set,
+    every phase runs as the ordered passes instead (same output, slower) so
+    each rule's own time is measured too.
+    """
+
+    def __init__(self, *phases, separator=r'[\s;{}]'):
+        self.phases = [list(rules) for rules in phases]
+        self.rules = [rule for rules in self.phases for rule in rules]
+        self.separator = re.compile(separator)
+        self.profile = Profile((rule.name for rule in self.rules),
+                               [f'phase {index}' for index in range(len(self.phases))] + ['guard'])
+        self.profiling = False
+        self.warnings = []
+        self._index = LiteralIndex(rule.literal for rule in self.rules if rule.literal is not None)
+        self._anchors = [sorted({rule.anchor for rule in rules}) for rules in self.phases]
+        self._compiled = {}
+
+    def _subset(self, phase, present):
+        """Combined pattern for the given rule indexes of a phase, compiled on first use"""
+        key = (phase, present)
+        if key not in self._compiled:
+            rules = [self.phases[phase][i] for i in present]
+            stops = frozenset.intersection(*(rule.stops for rule in rules))
+            self._compiled[key] = self._compile(rules) + (stop_pattern(stops),)
+        return self._compiled[key]
+
+    @staticmethod
+    def _compile(rules):
+        parts = []
+        templates = {}
+        group = 0
+        for index, rule in enumerate(rules):
+            key = f'r{index}'
+            group += 1  # the wrapping named group
+            parts.append(f'(?P<{key}>{_shift_groups(rule.pattern, group)})')
+            templates[key] = (rule, _shift_groups(rule.replacement, group, named=True))
+            group += rule.regex.groups
+        return re.compile('|'.join(parts)), templates
+
+    @property
+    def hits(self):
+        return {name: stats.matches for name, stats in self.profile.rules.items()}
+
+    @staticmethod
+    def _find(content, regex, stops, rules, found):
+        """All matches of the combined pattern, trying only the windows around rule literals.
+
+        Each windowed match is re-checked against the unbounded text. Unless every
+        rule's match provably ends inside its window, each literal occurrence left
+        uncovered is probed once too; on any disagreement the whole text is
+        scanned instead. Returns (matches, number of characters scanned).
+        """
+        if any(rule.literal is None for rule in rules):
+            return list(regex.finditer(content)), len(content)
+
+        literals = {rule.literal for rule in rules}
+        occurrences = sorted((position, literal) for literal in literals for position in found[literal])
+
+        matches = []
+        last_end = 0
+        scanned = 0
+        for start, end in line_windows(content, occurrences, stops):
+            scanned += end - start
+            for match in regex.finditer(content, max(start, last_end), end):
+                full = regex.match(content, match.start())
+                if full is None or full.end() != match.end() or full.lastgroup != match.lastgroup:
+                    return list(regex.finditer(content)), len(content)
+                matches.append(full)
+                last_end = full.end()
+
+        if all(rule.bounded for rule in rules):
+            return matches, scanned
+
+        spans = iter(matches)
+        match = next(spans, None)
+        previous_end = 0
+        for position, literal in occurrences:
+            while match is not None and match.end() <= position:
+                previous_end = match.end()
+                match = next(spans, None)
+            if match is not None and match.start() <= position:
+                continue
+            probe = regex.search(content, window_start(content, previous_end, position, stops))
+            if probe is not None and probe.start() <= position:
+                return list(regex.finditer(content)), len(content)
+        return matches, scanned
+
+    def _independent(self, content, matches, anchors):
+        """True if every anchor occurrence is rewritten (or left alone) on its own.
+
+        Each anchor occurrence extends to the end of the match covering it. The
+        next occurrence must start after that extent with a separator in between,
+        otherwise an earlier rule could have claimed a different span in the
+        ordered passes.
+        """
+        positions = sorted(position for anchor in anchors
+                           for position in _occurrences(content, anchor))
+        remaining = iter(matches)
+        match = next(remaining, None)
+        extent = None
+        for position in positions:
+            if extent is not None:
+                if position < extent or not self.separator.search(content, extent, position):
+                    return False
+            while match is not None and match.end() <= position:
+                match = next(remaining, None)
+            if match is not None and match.start() <= position:
+                extent = match.end()
+            else:
+                extent = position + 1
+        return True
+
+    def _time_box(self, rule, content, longest_word):
+        """(spans, skipped) of a time-boxed rule on content, both sorted (start, end) lists.
+
+        The rule must not be tried in spans: the runs longer than its
+        max_window, and the sites (see Rule.sites) of the literal hits it is
+        not applied at. skipped holds the positions of those hits: each hit
+        whose site holds part of a long run, or starts inside the site of a hit
+        skipped before it, where its match could start. Every other hit is
+        tried as usual. longest_word is a list caching the length of content's
+        longest word (empty until needed), shared by the rules checked on the
+        same content.
+        """
+        if rule.max_window is None or len(content) <= rule.max_window:
+            return [], []
+        # A run that whitespace ends is no longer than the longest word, which str.split finds much faster
+        if _WHITESPACE <= rule.run_stops:
+            if not longest_word:
+                longest_word.append(max(map(len, content.split()), default=0))
+            if longest_word[0] <= rule.max_window:
+                return [], []
+        started = time.perf_counter()
+        runs = rule.long_runs(content)
+        if not runs:
+            self.profile.passes['guard'].add((1, 0, len(content), time.perf_counter() - started))
+            return [], []
+        skipped = []
+        blocked = []
+        for position, start, end in rule.sites(content):
+            if _overlaps((start, end), runs) or (blocked and start < blocked[-1][1]):
+                skipped.append(position)
+                blocked.append((start, max(end, blocked[-1][1]) if blocked else end))
+        spans = []
+        for start, end in sorted(runs + blocked):
+            if spans and start <= spans[-1][1]:
+                spans[-1] = (spans[-1][0], max(end, spans[-1][1]))
+            else:
+                spans.append((start, end))
+        self.profile.passes['guard'].add((1, len(skipped), len(content), time.perf_counter() - started))
+        return spans, skipped
+
+    def _warn(self, rule, content, offsets, reason):
+        for offset in offsets:
+            self.warnings.append((content.count('\n', 0, offset) + 1, rule.name,
+                                  f"not applied: {reason} a run of more than {rule.max_window} characters "
+                                  f"(its max_window)"))
+
+    def _apply_phase_sequential(self, rules, content, steps=None):
+        longest_word = []
+        for rule in rules:
+            spans, skipped = self._time_box(rule, content, longest_word)
+            self._warn(rule, content, skipped, 'the text around its literal holds')
+            stats = self.profile.rules[rule.name]
+            start = time.perf_counter()
+            scanned = len(content)
+            if steps is None and not spans:
+                content, count = rule.apply(content)
+            else:
+                # Same matches and expansions as re.sub, kept as edits
+                edits, dropped = rule.edits(content, spans)
+                self._warn(rule, content, dropped, 'its match runs into')
+                if edits:
+                    if steps is not None:
+                        steps.append((content, edits))
+                    content = apply_edits(content, edits)
+                count = len(edits)
+            if count:
+                longest_word = []
+            stats.seconds += time.perf_counter() - start
+            stats.invocations += 1
+            stats.matches += count
+            stats.bytes_scanned += scanned
+        return content
+
+    def apply(self, content, steps=None):
+        """Rewrite content with one scan per phase, counting hits per rule.
+
+        With steps (a list), each pass's edits are appended to it together
+        with the text they were made on (see plan).
+        """
+        if self.profiling:
+            return self.apply_sequential(content, steps)
+
+        found = self._index.scan(content)
+        for phase, rules in enumerate(self.phases):
+            present = tuple(i for i, rule in enumerate(rules)
+                            if rule.literal is None or rule.literal in found)
+            if not present:
+                continue
+            longest_word = []
+            if any(self._time_box(rules[i], content, longest_word)[0] for i in present):
+                # The single scan could try a time-boxed rule on a long run: run the ordered passes, which skip it
+                content = self._apply_phase_sequential(rules, content, steps)
+                found = self._index.scan(content)
+                continue
+
+            started = time.perf_counter()
+            regex, templates, stops = self._subset(phase, present)
+            matches, scanned = self._find(content, regex, stops, [rules[i] for i in present], found)
+            for i in present:
+                stats = self.profile.rules[rules[i].name]
+                stats.invocations += 1
+                stats.bytes_scanned += scanned
+            if not matches:
+                self.profile.passes[f'phase {phase}'].add((1, 0, scanned, time.perf_counter() - started))
+                continue
+
+            if not self._independent(content, matches, self._anchors[phase]):
+                content = self._apply_phase_sequential(rules, content, steps)
+            else:
+                edits = []
+                for match in matches:
+                    rule, template = templates[match.lastgroup]
+                    self.profile.rules[rule.name].matches += 1
+                    edits.append((match.start(), match.end() - match.start(), match.expand(template), rule.name))
+                if steps is not None:
+                    steps.append((content, edits))
+                content = apply_edits(content, edits)
+            self.profile.passes[f'phase {phase}'].add((1, len(matches), scanned, time.perf_counter() - started))
+
+            # Later phases see the rewritten text
+            found = self._index.scan(content)
+        return content
+
+    __call__ = apply
+
+    def plan(self, content):
+        """The edits apply() makes to content, as (offset, length, replacement, rule name) of content itself"""
+        steps = []
+        self.apply(content, steps)
+        edits = []
+        for text, step in steps:
+            edits = compose(edits, step, text)
+        return edits
+
+    def apply_sequential(self, content, steps=None):
+        """Reference implementation: one re.sub pass per rule, in order"""
+        for rules in self.phases:
+            content = self._apply_phase_sequential(rules, content, steps)
+        return content
+
+    def report(self):
+        """Per-rule hit counts, most frequent first"""
+        return sorted(((name, stats.matches) for name, stats in self.profile.rules.items() if stats.matches),
+                      key=lambda item: -item[1])
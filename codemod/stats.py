@@ -0,0 +1,96 @@
+import json
+
+FIELDS = ('invocations', 'matches', 'bytes_scanned', 'seconds')
+
+
+class RuleStats:
+    """Counters for one rule (or one scan pass)"""
+
+    __slots__ = FIELDS
+
+    def __init__(self, invocations=0, matches=0, bytes_scanned=0, seconds=0.0):
+        self.invocations = invocations
+        self.matches = matches
+        self.bytes_scanned = bytes_scanned
+        self.seconds = seconds
+
+    def values(self):
+        return (self.invocations, self.matches, self.bytes_scanned, self.seconds)
+
+    def add(self, values):
+        self.invocations += values[0]
+        self.matches += values[1]
+        self.bytes_scanned += values[2]
+        self.seconds += values[3]
+
+
+class Profile:
+    """Registry of named counters for the rules of a transform and the scan passes that run them.
+
+    When rules share one combined scan, its time is charged to the pass
+    rather than split across the rules; profiling mode (see RuleSet.profile)
+    runs each rule on its own so its time is exact.
+    """
+
+    def __init__(self, rule_names, pass_names=()):
+        self.rules = {}
+        for name in rule_names:
+            if name in self.rules:
+                raise ValueError(f"Duplicate rule name: {name}")
+            self.rules[name] = RuleStats()
+        self.passes = {name: RuleStats() for name in pass_names}
+
+    @classmethod
+    def combine(cls, profiles):
+        """Profile over (prefix, profile) pairs sharing their counters, names prefixed 'prefix.'"""
+        combined = cls(())
+        for prefix, profile in profiles:
+            for name, stats in profile.rules.items():
+                combined.rules[f'{prefix}.{name}'] = stats
+            for name, stats in profile.passes.items():
+                combined.passes[f'{prefix}.{name}'] = stats
+        return combined
+
+    def _all(self):
+        yield from (('rule', name, stats) for name, stats in self.rules.items())
+        yield from (('pass', name, stats) for name, stats in self.passes.items())
+
+    def snapshot(self):
+        return {(kind, name): stats.values() for kind, name, stats in self._all()}
+
+    def delta(self, before):
+        """Counter increments since snapshot before, for merging into another process's profile"""
+        delta = {}
+        for kind, name, stats in self._all():
+            values = stats.values()
+            if values != before[kind, name]:
+                delta[kind, name] = tuple(now - then for now, then in zip(values, before[kind, name]))
+        return delta
+
+    def merge(self, delta):
+        for (kind, name), values in delta.items():
+            (self.rules if kind == 'rule' else self.passes)[name].add(values)
+
+    def as_dict(self):
+        return {
+            'rules': {name: dict(zip(FIELDS, stats.values())) for name, stats in self.rules.items()},
+            'passes': {name: dict(zip(FIELDS, stats.values())) for name, stats in self.passes.items()},
+        }
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+    def summary(self, limit=10):
+        """cProfile-style table of the most expensive rules and passes, plus rules that never matched"""
+        rows = sorted(self._all(), key=lambda row: (-row[2].seconds, -row[2].bytes_scanned))
+        lines = [f"{'calls':>8}{'matches':>9}{'MB':>9}{'tottime':>10}{'percall':>10}  rule"]
+        for kind, name, stats in rows[:limit]:
+            percall = stats.seconds / stats.invocations if stats.invocations else 0.0
+            label = name if kind == 'rule' else f'<{name}>'
+            lines.append(f"{stats.invocations:>8}{stats.matches:>9}{stats.bytes_scanned / 1e6:>9.2f}"
+                         f"{stats.seconds:>10.4f}{percall:>10.6f}  {label}")
+        dead = [name for name, stats in self.rules.items() if stats.invocations and not stats.matches]
+        if dead:
+            lines.append(f"never matched: {', '.join(dead)}")
+        return '\n'.join(lines)
@@ -0,0 +1,128 @@
+import hashlib
+import mmap
+import os
+import shutil
+import tempfile
+
+from codemod.cache import DIGEST_SIZE
+
+try:
+    import fcntl
+    FICLONE = 0x40049409  # Linux ioctl: share the source's extents (btrfs, XFS, ...)
+except ImportError:  # Windows
+    fcntl = None
+
+# Files at least this large are rewritten a block at a time instead of in memory
+STREAM_THRESHOLD = 8 * 1024 * 1024
+
+# Text read per block; peak memory is about this plus the longest span a block cannot end in (e.g. a literal)
+CHUNK_SIZE = 1024 * 1024
+
+
+def contains_any(file_path, literals):
+    """True if the file contains any of the literals, searched through mmap without reading it"""
+    with open(file_path, 'rb') as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            return False
+        with mapped:
+            return any(mapped.find(literal.encode('utf-8')) != -1 for literal in literals)
+
+
+def read_blocks(f, block_end, chunk_size=CHUNK_SIZE):
+    """The text of a file opened in binary mode, decoded from UTF-8 in blocks of whole lines.
+
+    A block ends once about chunk_size characters are read, at the last line
+    end block_end(text) allows (see csharp.block_end); it returns 0 where
+    none does yet, and the block grows. Lines are decoded without newline
+    translation, so the blocks joined are exactly the file's text.
+    """
+    pending = []
+    size = 0
+    limit = chunk_size
+    for line in f:
+        line = line.decode('utf-8')
+        pending.append(line)
+        size += len(line)
+        if size < limit:
+            continue
+        text = ''.join(pending)
+        cut = block_end(text)
+        if cut:
+            yield text[:cut]
+            text = text[cut:]
+        pending = [text] if text else []
+        size = len(text)
+        # Look again after another chunk, or once the text has doubled if it could not be cut
+        limit = size + max(chunk_size, size)
+    if pending:
+        yield ''.join(pending)
+
+
+def _reflink(source, target):
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+def clone_file(source, target):
+    """Make target share or copy source's contents: hard link, then reflink, then a streamed copy"""
+    temp_path = target + '.tmp'
+    if os.path.lexists(temp_path):
+        os.remove(temp_path)
+    try:
+        os.link(source, temp_path)
+    except OSError:
+        try:
+            if fcntl is None:
+                raise OSError('reflink not supported')
+            _reflink(source, temp_path)
+        except OSError:
+            shutil.copyfile(source, temp_path)
+    os.replace(temp_path, target)
+
+
+def rewrite_blocks(file_path, transform, block_end, chunk_size=CHUNK_SIZE, transaction=None):
+    """Rewrite a file a block at a time into a temp file, then rename it over the original.
+
+    transform receives each block of whole lines (see read_blocks) and
+    returns its new text; blocks it leaves alone are copied as they were.
+    Returns (changed, digest of the rewritten bytes); if no block changed
+    the file is left untouched.
+
+    With a transaction the new file is staged there instead, and replaces the
+    original when the transaction commits (and is journaled there, if it has a journal).
+    """
+    if transaction is not None:
+        fd, temp_path = transaction.reserve(file_path)
+    else:
+        directory, name = os.path.split(file_path)
+        fd, temp_path = tempfile.mkstemp(dir=directory or '.', prefix=f'.{name}.', suffix='.tmp')
+    hasher = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    changed = False
+    try:
+        with open(file_path, 'rb', buffering=chunk_size) as src, open(fd, 'wb', buffering=chunk_size) as dst:
+            for text in read_blocks(src, block_end, chunk_size):
+                new_text = transform(text)
+                changed = changed or new_text != text
+                data = new_text.encode('utf-8')
+                dst.write(data)
+                hasher.update(data)
+
+        if not changed:
+            if transaction is not None:
+                transaction.discard(file_path)
+            else:
+                os.remove(temp_path)
+            return False, hasher.digest()
+
+        if transaction is None:
+            shutil.copymode(file_path, temp_path)
+            os.replace(temp_path, file_path)
+        return True, hasher.digest()
+    except BaseException:
+        if transaction is not None:
+            transaction.discard(file_path)
+        elif os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
@@ -0,0 +1,291 @@
+"""Structural checks on rewritten C#, run before a rewrite is written to disk.
+
+Catches the ways a bad rule breaks a test file (unbalanced brackets,
+unterminated literals, half-converted .Should() chains, doubled .Assert.
+receivers, xUnit Assert calls with the wrong number of arguments, member
+access on the void result of an Assert call, comparisons in Assert.True/False
+that a '?:' or '??' in their operand takes apart) in
+milliseconds instead of a dotnet build. Only the lines a rewrite changed are
+tokenized, and only problems the rewrite introduced are reported, so files
+that were already broken are not blamed on it.
+"""
+import difflib
+from collections import Counter
+
+from codemod.csharp import CHAR, IDENT, PUNCT, STRING, Tokens
+from codemod.plan import apply_edits, plan_edits
+
+_BRACKETS = frozenset('()[]{}')
+_OPENERS = frozenset('([{')
+
+# Operators (one token each) that cannot start, or end, an argument ('?' may end a nullable type)
+_NO_LEFT_OPERAND = frozenset(['>', '<', '=', '*', '/', '%', '&', '|', '^', '?', '??', ':', '=>', '.', '?.'])
+_NO_RIGHT_OPERAND = frozenset(['<', '=', '+', '-', '*', '/', '%', '&', '|', '^', '??', ':', '=>', '.', '?.'])
+
+# Argument counts accepted by the xUnit Assert methods the rules produce (None: params)
+ASSERT_ARITY = {
+    'All': (2, 2), 'Collection': (1, None), 'Contains': (2, 3), 'DoesNotContain': (2, 3),
+    'DoesNotMatch': (2, 2), 'Empty': (1, 1), 'EndsWith': (2, 3), 'Equal': (2, 3), 'Equivalent': (2, 3),
+    'Fail': (1, 1), 'False': (1, 2), 'InRange': (3, 4), 'IsAssignableFrom': (1, 2), 'IsNotType': (1, 2),
+    'IsType': (1, 2), 'Matches': (2, 2), 'NotEmpty': (1, 1), 'NotEqual': (2, 3), 'NotInRange': (3, 4),
+    'NotNull': (1, 1), 'NotSame': (2, 2), 'Null': (1, 1), 'ProperSubset': (2, 2), 'ProperSuperset': (2, 2),
+    'Same': (2, 2), 'Single': (1, 2), 'StartsWith': (2, 3), 'StrictEqual': (2, 2), 'Subset': (2, 2),
+    'Superset': (2, 2), 'Throws': (1, 2), 'ThrowsAny': (1, 1), 'ThrowsAnyAsync': (1, 1), 'ThrowsAsync': (1, 2),
+    'True': (1, 2),
+}
+
+
+def changed_spans(old_lines, new_lines):
+    """(old start, old end, new start, new end) of every run of lines that differs"""
+    # Common leading and trailing lines are not handed to difflib
+    head = 0
+    limit = min(len(old_lines), len(new_lines))
+    while head < limit and old_lines[head] == new_lines[head]:
+        head += 1
+    tail = 0
+    while tail < limit - head and old_lines[-1 - tail] == new_lines[-1 - tail]:
+        tail += 1
+    old_middle = old_lines[head:len(old_lines) - tail]
+    new_middle = new_lines[head:len(new_lines) - tail]
+
+    if len(old_middle) == len(new_middle):
+        # Line-for-line rewrite (the common case): group the lines that differ
+        spans = []
+        start = None
+        for index, (old, new) in enumerate(zip(old_middle + [None], new_middle + [None])):
+            if old != new and old is not None:
+                if start is None:
+                    start = index
+            elif start is not None:
+                spans.append((head + start, head + index, head + start, head + index))
+                start = None
+        return spans
+    matcher = difflib.SequenceMatcher(None, old_middle, new_middle, autojunk=False)
+    return [(head + i1, head + i2, head + j1, head + j2)
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != 'equal']
+
+
+def _terminated(kind, text):
+    if kind == CHAR:
+        return len(text) >= 2 and text.endswith("'")
+    quote = text.index('"')
+    run = len(text) - quote - len(text[quote:].lstrip('"'))
+    if run >= 3 and '@' not in text[:quote]:
+        return len(text) >= quote + 2 * run and text.endswith('"' * run)
+    return len(text) >= quote + 2 and text.endswith('"')
+
+
+def _assert_calls(tokens):
+    """(index of 'Assert', method name, index of '(') of every Assert.Method(...) call"""
+    texts, kinds = tokens.texts, tokens.kinds
+    count = len(texts)
+    for index in range(count - 3):
+        if texts[index] != 'Assert' or texts[index + 1] != '.' or kinds[index + 2] != IDENT:
+            continue
+        open_ = index + 3
+        if texts[open_] == '<':
+            close = tokens._generic_close(open_)
+            if close is None:
+                continue
+            open_ = close + 1
+        if open_ < count and texts[open_] == '(':
+            yield index, texts[index + 2], open_
+
+
+def _top_level(tokens, start, end):
+    """Indices of the tokens in [start, end) outside any bracket group or generic argument list"""
+    texts, kinds = tokens.texts, tokens.kinds
+    index = start
+    while index < end:
+        yield index
+        text = texts[index]
+        if text in _OPENERS and index in tokens.match:
+            index = tokens.match[index]
+        elif text == '<' and index > 0 and kinds[index - 1] == IDENT:
+            close = tokens._generic_close(index)
+            if close is not None and close < end:
+                index = close
+        index += 1
+
+
+def _split_comparison(tokens, start, end):
+    """True if the argument in [start, end) compares with an operand holding an unparenthesized '?:' or '??'.
+
+    Such a comparison binds tighter than the conditional, as in x < ok ? 1 : 2.
+    """
+    texts = tokens.texts
+    compares = question = conditional = False
+    for index in _top_level(tokens, start, end):
+        text = texts[index]
+        if text in ('<', '>') or (text == '=' and index > start and texts[index - 1] in ('=', '!')):
+            compares = True
+        elif text == '??':
+            conditional = True
+        elif text == '?' and index + 1 < end and texts[index + 1] != '[':
+            question = True  # a conditional, unless no ':' follows (a nullable type)
+        elif text == ':' and question:
+            conditional = True
+    return compares and conditional
+
+
+def issues(text):
+    """(issue, offset) for everything in text the checks object to, in source order.
+
+    Bracket balance is reported as one ('brackets', unmatched brackets)
+    issue, so an unchanged residue of a span cut mid-statement is not a problem.
+    """
+    tokens = Tokens(text)
+    texts, kinds, starts = tokens.texts, tokens.kinds, tokens.starts
+    count = len(texts)
+    found = []
+
+    unmatched = [index for index in range(count)
+                 if kinds[index] == PUNCT and texts[index] in _BRACKETS and index not in tokens.match]
+    found.append((('brackets', ''.join(texts[index] for index in unmatched)),
+                  starts[unmatched[0]] if unmatched else 0))
+
+    for index in range(count):
+        kind, token = kinds[index], texts[index]
+        if kind in (STRING, CHAR) and not _terminated(kind, token):
+            found.append((('unterminated', 'string' if kind == STRING else 'char'), starts[index]))
+        elif token == 'Should' and index > 0 and texts[index - 1] in ('.', '?.'):
+            if (index + 2 < count and texts[index + 1] == '(' and texts[index + 2] == ')'
+                    and not (index + 4 < count and texts[index + 3] == '.' and kinds[index + 4] == IDENT)):
+                found.append((('dangling', 'Should'), starts[index - 1]))
+        elif (token == 'Assert' and 0 < index < count - 1 and texts[index - 1] in ('.', '?.')
+              and texts[index + 1] == '.' and not (index > 1 and texts[index - 2] == 'Xunit')):
+            found.append((('receiver', 'Assert'), starts[index - 1]))
+
+    for index, method, open_ in _assert_calls(tokens):
+        if index > 0 and texts[index - 1] in ('.', '?.') and not (index > 1 and texts[index - 2] == 'Xunit'):
+            continue  # already reported as a doubled receiver
+        close = tokens.match.get(open_)
+        if close is None:
+            continue
+        if close + 1 < count and texts[close + 1] in ('.', '?.'):
+            found.append((('chained', method), starts[close + 1]))
+        arguments = tokens.arguments(open_) or []
+        if method in ('True', 'False') and arguments and _split_comparison(tokens, *arguments[0]):
+            found.append((('precedence', method), starts[index]))
+        if any(start == end for start, end in arguments):
+            found.append((('empty argument', method), starts[index]))
+        elif any(texts[start] in _NO_LEFT_OPERAND or texts[end - 1] in _NO_RIGHT_OPERAND
+                 for start, end in arguments):
+            found.append((('operand', method), starts[index]))
+        if any(texts[inner] == 'Should' and texts[inner - 1] in ('.', '?.') for inner in range(open_ + 1, close)):
+            found.append((('nested', method), starts[index]))
+        arity = ASSERT_ARITY.get(method)
+        if arity is not None:
+            low, high = arity
+            if len(arguments) < low or (high is not None and len(arguments) > high):
+                found.append((('arity', method, len(arguments)), starts[index]))
+    return found
+
+
+def describe(issue):
+    kind = issue[0]
+    if kind == 'brackets':
+        return f"unbalanced brackets ({issue[1] or 'none'} left unmatched)"
+    if kind == 'unterminated':
+        return f"unterminated {issue[1]} literal"
+    if kind == 'dangling':
+        return "'.Should()' left without an assertion"
+    if kind == 'receiver':
+        return "doubled '.Assert.' receiver"
+    if kind == 'empty argument':
+        return f"empty argument to Assert.{issue[1]}"
+    if kind == 'operand':
+        return f"missing operand in an argument to Assert.{issue[1]}"
+    if kind == 'nested':
+        return f"'.Should()' inside Assert.{issue[1]}"
+    if kind == 'chained':
+        return f"member access on the void result of Assert.{issue[1]}"
+    if kind == 'precedence':
+        return f"comparison in Assert.{issue[1]} is split by a '?:' or '??' in its operand"
+    method, count = issue[1], issue[2]
+    low, high = ASSERT_ARITY[method]
+    expected = f'{low}' if low == high else f'{low}+' if high is None else f'{low}-{high}'
+    return f"Assert.{method} takes {expected} arguments, not {count}"
+
+
+def _introduced(old_text, new_text):
+    """(issue, offset in new_text) for the issues of new_text that old_text did not have"""
+    old_issues = issues(old_text)
+    old_brackets = old_issues[0][0]
+    remaining = Counter(issue for issue, _ in old_issues[1:])
+    new_issues = issues(new_text)
+    introduced = []
+    if new_issues[0][0] != old_brackets:
+        introduced.append(new_issues[0])
+    for issue, offset in new_issues[1:]:
+        if remaining[issue]:
+            remaining[issue] -= 1
+        else:
+            introduced.append((issue, offset))
+    return introduced
+
+
+def _key(issue):
+    # The unmatched brackets of a span and of the whole file differ; only whether there are any matters
+    return 'brackets' if issue[0] == 'brackets' else issue
+
+
+def _confirmed(old, new):
+    """Keys of the problems the whole of new has and old had not (brackets only if new is unbalanced)"""
+    return {_key(issue) for issue, _ in _introduced(old, new) if issue != ('brackets', '')}
+
+
+def validate(old, new):
+    """(line, message) for every structural problem the rewrite of old into new introduces; [] if none.
+
+    Only the changed lines are checked. A span cut through a multi-line
+    literal or statement can look broken on its own, so bracket and literal
+    problems are confirmed against the whole file before they are reported.
+    """
+    if old == new:
+        return []
+    old_lines = old.split('\n')
+    new_lines = new.split('\n')
+    problems = []
+    confirm = False  # a bracket or literal problem was found
+    for old_start, old_end, new_start, new_end in changed_spans(old_lines, new_lines):
+        new_text = '\n'.join(new_lines[new_start:new_end])
+        for issue, offset in _introduced('\n'.join(old_lines[old_start:old_end]), new_text):
+            problems.append((new_start + new_text.count('\n', 0, offset) + 1, issue))
+            confirm = confirm or issue[0] in ('brackets', 'unterminated')
+    if confirm:
+        confirmed = _confirmed(old, new)
+        problems = [(line, issue) for line, issue in problems
+                    if issue[0] not in ('brackets', 'unterminated') or _key(issue) in confirmed]
+    return [(line, describe(issue)) for line, issue in problems]
+
+
+class RewriteRejected(ValueError):
+    """A rewrite failed validation; str() lists the problems"""
+
+    def __init__(self, problems):
+        super().__init__('rewrite rejected: ' + '; '.join(f'line {line}: {message}' for line, message in problems))
+        self.problems = problems
+
+
+class Validated:
+    """Wraps transform, raising RewriteRejected for a text whose rewrite fails validation; plan() is checked too"""
+
+    def __init__(self, transform, validator=validate):
+        self.transform = transform
+        self.validator = validator
+
+    def _check(self, text, new_text):
+        problems = self.validator(text, new_text)
+        if problems:
+            raise RewriteRejected(problems)
+
+    def __call__(self, text):
+        new_text = self.transform(text)
+        self._check(text, new_text)
+        return new_text
+
+    def plan(self, text):
+        edits = plan_edits(self.transform, text)
+        self._check(text, apply_edits(text, edits))
+        return edits
@@ -0,0 +1,145 @@
+import marshal
+import os
+import sys
+from array import array
+
+from codemod.csharp import Tokens
+from codemod.diagnostics import WINDOW, line_windows
+from codemod.walker import find_files
+
+# Bump when the on-disk layout or the symbol syntax changes; older indexes are then rebuilt
+FORMAT = 2
+
+INDEX_FILE = '.codemod-symbols'
+
+
+def _scan(content):
+    """symbol -> packed array of (offset, line) pairs, in source order"""
+    occurrences = {}
+    line = 1
+    last = 0
+    for symbol, offset in Tokens(content).symbols():
+        line += content.count('\n', last, offset)
+        last = offset
+        occurrences.setdefault(symbol, array('I')).extend((offset, line))
+    return {symbol: pairs.tobytes() for symbol, pairs in occurrences.items()}
+
+
+def _comparable(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+class SymbolIndex:
+    """Persistent map of the member calls, accesses and indexers in a tree of C# files to where they occur.
+
+    Symbols are those of Tokens.symbols ('.Tell(', '.Should(', 'ContextMap['),
+    found by the tokenizer so text in strings and comments never counts.
+    Offsets are character offsets into the decoded text, line endings as in the file.
+    update() only re-tokenizes files whose size or mtime changed, so once
+    built the index costs a stat per file. Files it cannot read or decode
+    are left out and listed in self.errors as (path, error) until they can.
+    """
+
+    def __init__(self, path, entries=None):
+        self.path = path
+        self.entries = entries if entries is not None else {}  # path -> (size, mtime_ns, {symbol: packed pairs})
+        self._by_symbol = None
+        self.dirty = False  # changed since loaded
+        self.errors = []  # (path, error) of the files the last update() could not index
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, 'rb') as f:
+                layout, entries = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return cls(path)
+        if layout != FORMAT:
+            return cls(path)
+        return cls(path, entries)
+
+    def save(self):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            marshal.dump((FORMAT, self.entries), f)
+        os.replace(temp_path, self.path)
+        self.dirty = False
+
+    def update(self, paths):
+        """Make the index cover exactly paths; returns the paths that were (re)indexed"""
+        entries = {}
+        changed = []
+        self.errors = []
+        for file_path in paths:
+            try:
+                stat = os.stat(file_path)
+            except OSError as e:
+                self.errors.append((file_path, e))
+                continue
+            entry = self.entries.get(file_path)
+            if entry is None or entry[0] != stat.st_size or entry[1] != stat.st_mtime_ns:
+                try:
+                    with open(file_path, 'rb') as f:
+                        entry = (stat.st_size, stat.st_mtime_ns, _scan(f.read().decode('utf-8')))
+                except (OSError, UnicodeDecodeError) as e:
+                    self.errors.append((file_path, e))
+                    continue
+                changed.append(file_path)
+            entries[file_path] = entry
+        if changed or len(entries) != len(self.entries):
+            self._by_symbol = None
+            self.dirty = True
+        self.entries = entries
+        return changed
+
+    def _symbols(self):
+        if self._by_symbol is None:
+            self._by_symbol = {}
+            for file_path, (_, _, symbols) in self.entries.items():
+                for symbol in symbols:
+                    self._by_symbol.setdefault(symbol, []).append(file_path)
+        return self._by_symbol
+
+    def files(self, symbols, under=None):
+        """Sorted paths containing any of symbols (optionally only those under the directory under).
+
+        As in diagnostic_windows, paths are compared as
+        os.path.normcase(os.path.abspath(...)), so case, separators and '..'
+        do not matter.
+        """
+        by_symbol = self._symbols()
+        found = {file_path for symbol in symbols for file_path in by_symbol.get(symbol, ())}
+        if under is not None:
+            prefix = os.path.join(_comparable(under), '')
+            found = {file_path for file_path in found if _comparable(file_path).startswith(prefix)}
+        return sorted(found)
+
+    def occurrences(self, symbol, file_path):
+        """(offset, line) of each occurrence of symbol in file_path"""
+        packed = self.entries[file_path][2].get(symbol)
+        if packed is None:
+            return []
+        pairs = array('I', packed)
+        return list(zip(pairs[::2], pairs[1::2]))
+
+    def windows(self, symbols, under=None, context=WINDOW):
+        """path -> line spans around each occurrence of symbols (see line_windows), for rewrite_files"""
+        windows = {}
+        for file_path in self.files(symbols, under):
+            lines = sorted({line for symbol in symbols for _, line in self.occurrences(symbol, file_path)})
+            windows[file_path] = line_windows(lines, context)
+        return windows
+
+
+def symbol_index(root, log=sys.stderr):
+    """The index stored in root, brought up to date with the .cs files under it and saved.
+
+    Files that could not be indexed, and so are never selected, are reported to log.
+    """
+    index = SymbolIndex.load(os.path.join(root, INDEX_FILE))
+    index.update(find_files(root))
+    for file_path, error in index.errors:
+        print(f"Warning: {file_path}: not indexed: {error}", file=log)
+    if index.dirty or not os.path.exists(index.path):
+        index.save()
+    return index
@@ -0,0 +1,97 @@
+import os
+import shutil
+import tempfile
+
+from codemod.stream import clone_file
+
+
+class Transaction:
+    """Stages rewritten files in a temp directory and replaces the originals in one batch.
+
+    Nothing in the tree changes until commit(). Commit keeps a link (or copy)
+    of every original in the staging directory while it os.replace()s the
+    staged files into place; if any replacement fails, those already made are
+    undone, so the tree is either fully converted or untouched.
+
+    With a journal (see codemod.journal), the pre-image of every target is
+    stored and the run's log entries written before anything is replaced, so
+    the run can be undone later.
+
+    The staging directory is created under root, which should be on the same
+    filesystem as the targets so os.replace() stays a rename.
+    """
+
+    def __init__(self, root='.', journal=None):
+        self.root = root
+        self.journal = journal
+        self._directory = None
+        self._staged = {}  # target path -> staged path, in staging order
+
+    def _staging(self):
+        if self._directory is None:
+            self._directory = tempfile.mkdtemp(prefix='.codemod-staging-', dir=self.root)
+        return self._directory
+
+    def reserve(self, target):
+        """(fd, path) of a new staging file for target, opened for writing"""
+        self.discard(target)
+        fd, path = tempfile.mkstemp(dir=self._staging(), suffix='-' + os.path.basename(target))
+        self._staged[target] = path
+        return fd, path
+
+    def stage(self, target, data):
+        """Stage new contents (bytes) for target"""
+        fd, _ = self.reserve(target)
+        with open(fd, 'wb') as f:
+            f.write(data)
+
+    def discard(self, target):
+        path = self._staged.pop(target, None)
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+
+    def commit(self):
+        """Replace every target with its staged contents; returns the committed paths"""
+        if not self._staged:
+            self._cleanup()
+            return []
+
+        if self.journal is not None:
+            self.journal.journal_files(self._staged.items())
+
+        replaced = []
+        try:
+            for index, (target, path) in enumerate(self._staged.items()):
+                original = os.path.join(self._directory, f'original-{index}')
+                clone_file(target, original)
+                shutil.copymode(target, path)
+                os.replace(path, target)
+                replaced.append((target, original))
+        except BaseException:
+            for target, original in reversed(replaced):
+                os.replace(original, target)
+            self._cleanup()
+            raise
+
+        committed = list(self._staged)
+        self._cleanup()
+        return committed
+
+    def rollback(self):
+        """Drop every staged file; the tree is left as it was"""
+        self._cleanup()
+
+    def _cleanup(self):
+        self._staged = {}
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
@@ -0,0 +1,43 @@
+"""List or undo the runs recorded in a codemod undo journal.
+
+    python -m codemod.undo [--root DIR] list
+    python -m codemod.undo [--root DIR] undo RUN_ID [--force] [--dry-run]
+"""
+import argparse
+import sys
+
+from codemod.journal import Journal
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List or undo the runs recorded in a codemod undo journal")
+    parser.add_argument('--root', default='.', help='directory holding the .codemod-journal (default: .)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='list recorded runs')
+    undo = commands.add_parser('undo', help='restore the files changed by a run')
+    undo.add_argument('run_id')
+    undo.add_argument('--force', action='store_true', help='also restore files edited since the run')
+    undo.add_argument('--dry-run', action='store_true', help='only list the files that would be restored')
+    args = parser.parse_args(argv)
+
+    journal = Journal(args.root)
+    if args.command == 'list':
+        for run_id, count in journal.runs():
+            print(f"{run_id}  {count} files")
+        return 0
+
+    try:
+        restored = journal.undo(args.run_id, force=args.force, dry_run=args.dry_run)
+    except FileNotFoundError as e:
+        print(f"Cannot undo {args.run_id}: {e}", file=sys.stderr)
+        return 1
+    for path in restored:
+        print(f"{'Would restore' if args.dry_run else 'Restored'}: {path}")
+    if restored and not args.dry_run:
+        print(f"\nRestored {len(restored)} files; undo this with: "
+              f"python -m codemod.undo --root {args.root} undo {journal.run_id}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,31 @@
+"""Check C# files with the structural checks applied to every rewrite (see codemod/structure.py).
+
+    python -m codemod.validate FILE [FILE ...]
+
+Prints one line per problem in the form of a compiler diagnostic and exits
+with status 1 if there were any.
+"""
+import sys
+
+from codemod.structure import validate
+
+
+def main(argv=None):
+    paths = sys.argv[1:] if argv is None else argv
+    failed = 0
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                content = f.read().decode('utf-8')
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"{path}: cannot check: {e}", file=sys.stderr)
+            continue
+        # Everything counts as introduced when compared with an empty file
+        for line, message in validate('', content):
+            print(f"{path}({line}): {message}")
+            failed += 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
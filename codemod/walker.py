@@ -0,0 +1,304 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from codemod.cache import digest
+from codemod.diagnostics import apply_windows
+from codemod.diff import DiffWriter
+from codemod.pipeline import LOCAL, pipelined
+from codemod.plan import PlanWriter, apply_edits, plan_edits, plan_windows
+from codemod.stream import STREAM_THRESHOLD, contains_any, rewrite_blocks
+from codemod.structure import RewriteRejected, Validated
+from codemod.transaction import Transaction
+
+# Per-worker transform, installed once by the pool initializer instead of pickled per chunk
+_transform = None
+_required = ()
+_validator = None
+_fs = LOCAL
+_planning = False
+
+
+def find_files(root, suffix='.cs'):
+    """All files under root ending in suffix, in a deterministic (sorted) order"""
+    found = []
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                pending.append(entry.path)
+            elif entry.name.endswith(suffix):
+                found.append(entry.path)
+    return sorted(found)
+
+
+def _init_worker(transform, required, validator, fs, planning):
+    global _transform, _required, _validator, _fs, _planning
+    _transform = transform
+    _required = required
+    _validator = validator
+    _fs = fs
+    _planning = planning
+
+
+def _transform_file(file_path, transform, required, known_digest=None, spans=None, validator=None, fs=LOCAL,
+                    planning=False):
+    """Read one file with fs and transform it (see _transform_data)"""
+    try:
+        data = fs.read(file_path)
+    except OSError as e:
+        return file_path, None, str(e), None, []
+    return _transform_data(file_path, data, transform, required, known_digest, spans, validator, planning)
+
+
+def _transform_data(file_path, data, transform, required, known_digest=None, spans=None, validator=None,
+                    planning=False):
+    """Transform the contents of one file (only its spans of lines, if given).
+
+    required holds UTF-8 encoded literals: they are looked for in the raw
+    bytes, so a file without any is never decoded. Text is decoded without
+    newline translation and re-encoded only if it changed, so BOMs and line
+    endings are kept exactly. A rewrite the validator finds problems in is
+    rejected (reported as the error) and the file left as it was.
+
+    Returns (path, (original, new) bytes or None, error or None, digest of the
+    content left on disk, warnings). Files whose hash matches known_digest are
+    not transformed again. With planning, the transform's edits are computed
+    (see codemod/plan.py) and made, and come as a third element of the
+    change. warnings are the (line, rule, message) entries the transform
+    recorded for the file, such as the sites a time-boxed rule skipped (see
+    RuleSet.warnings).
+    """
+    warnings = []
+    try:
+        content_hash = digest(data)
+        if content_hash == known_digest:
+            return file_path, None, None, content_hash, warnings
+
+        # Skip files without any of the literals the transform needs
+        if required and not any(literal in data for literal in required):
+            return file_path, None, None, content_hash, warnings
+
+        content = data.decode('utf-8')
+        _take_warnings(transform)
+        if planning:
+            edits = plan_edits(transform, content) if spans is None else plan_windows(content, spans, transform)
+            new_content = apply_edits(content, edits)
+        else:
+            new_content = transform(content) if spans is None else apply_windows(content, spans, transform)
+        warnings = _take_warnings(transform)
+        if new_content == content:
+            return file_path, None, None, content_hash, warnings
+        if validator is not None:
+            problems = validator(content, new_content)
+            if problems:
+                raise RewriteRejected(problems)
+
+        new_data = new_content.encode('utf-8')
+        change = (data, new_data, edits) if planning else (data, new_data)
+        return file_path, change, None, digest(new_data), warnings
+    except Exception as e:
+        return file_path, None, str(e), None, warnings + _take_warnings(transform)
+
+
+def _take_warnings(transform):
+    """The warnings transform recorded since the last call, if it records any (see RuleSet.warnings)"""
+    warnings = getattr(transform, 'warnings', None)
+    if not warnings:
+        return []
+    taken = list(warnings)
+    del warnings[:]
+    return taken
+
+
+def _transform_chunk(items):
+    profile = getattr(_transform, 'profile', None)
+    before = profile.snapshot() if profile is not None else None
+    results = [_transform_file(path, _transform, _required, known, spans, _validator, _fs, _planning)
+               for path, known, spans in items]
+    return results, profile.delta(before) if profile is not None else None
+
+
+def rewrite_files(paths, transform, required=(), workers=None, chunk_size=32, journal=None, cache=None,
+                  block_end=None, stream_threshold=STREAM_THRESHOLD, dry_run=False, diff_output=None,
+                  windows=None, validator=None, prefetch=None, fs=LOCAL, plan=None):
+    """Apply transform to every file in paths, yielding each modified path.
+
+    Reading and transforming is fanned out to a process pool in chunks of
+    chunk_size files; results are handled in this process in input order, so
+    runs are deterministic regardless of the worker count. transform must be
+    picklable (a module-level function or a RuleSet); the counters in a
+    RuleSet's profile are merged back from the workers.
+
+    Rewritten files are staged in a Transaction and only replace the originals
+    once every file has been processed; if the run fails or is interrupted
+    (or the caller stops iterating), the tree is left untouched. With a
+    journal, the pre-images of the rewritten files are recorded in it so the
+    run can be undone (python -m codemod.undo). With dry_run,
+    nothing is written: a unified diff of each change goes to diff_output
+    (default stdout) as soon as the file is processed, and errors go to stderr.
+    With plan (a path), nothing is written either: the edits of every changed
+    file are saved there as an edit plan at the end (see codemod/plan.py), to
+    be reviewed and applied with python -m codemod.replay.
+
+    With a cache (a ManifestSection), files whose size and mtime are unchanged
+    since the last run are skipped without being opened, and files whose
+    content hash is unchanged are skipped without being transformed.
+
+    With a block_end (e.g. ScriptConverter.block_end, for transforms that
+    give the same result on a file cut into blocks there), files of at least
+    stream_threshold bytes are streamed through transform a block at a time
+    in this process after the others, so memory stays bounded by the block
+    size (see rewrite_blocks).
+
+    With windows (path -> [start, end) line spans, see
+    DiagnosticIndex.windows), only those lines of a file are transformed;
+    streamed files are always transformed whole.
+
+    With a validator (such as codemod.structure.validate), every rewrite is
+    checked before it is staged or diffed; a file whose rewrite has problems
+    is reported as an error and left untouched (streamed files block by block).
+
+    Warnings a transform records for a file, such as the sites where a
+    time-boxed rule was not tried (see RuleSet.warnings), are printed with
+    the file's path and line.
+
+    With prefetch (a number of files, e.g. pipeline.DEPTH), the process pool
+    is replaced by an I/O pipeline in this process that reads up to that many
+    files ahead of the transform and stages rewrites in batches behind it
+    (see codemod/pipeline.py), for trees on slow or network-mounted storage.
+    Files are read and staged through fs; streamed files bypass it.
+    """
+    windows = windows or {}
+    if cache is not None:
+        items = [(path, cache.known_digest(path), windows.get(path)) for path in paths if not cache.is_fresh(path)]
+    else:
+        items = [(path, None, windows.get(path)) for path in paths]
+    large = []
+    streamed = Validated(transform, validator) if block_end is not None and validator is not None else transform
+    if block_end is not None:
+        sizes = [_size(path) for path, _, _ in items]
+        large = [path for (path, _, _), size in zip(items, sizes) if size >= stream_threshold]
+        items = [item for item, size in zip(items, sizes) if size < stream_threshold]
+
+    if dry_run:
+        sink = DiffWriter(diff_output or sys.stdout)
+        log = sys.stderr
+        cache = None
+    elif plan is not None:
+        sink = PlanWriter(plan)
+        log = sys.stdout
+        cache = None
+    else:
+        sink = Transaction(_staging_root([path for path, _, _ in items] + large), journal)
+        log = sys.stdout
+    recorded = []  # (path, content hash) of rewritten files, recorded once committed
+
+    try:
+        yield from _rewrite(items, large, transform, streamed, block_end, tuple(required), workers, chunk_size,
+                            sink, cache, recorded, log, validator, prefetch, fs)
+    except BaseException:
+        sink.rollback()
+        raise
+    sink.commit()
+    if cache is not None:
+        for file_path, content_hash in recorded:
+            cache.record(file_path, content_hash)
+
+
+def _staging_root(paths):
+    """Directory shared by every path, so staged files are on the same filesystem"""
+    directories = {os.path.dirname(os.path.abspath(path)) for path in paths}
+    return os.path.commonpath(directories) if directories else '.'
+
+
+def _rewrite(items, large, transform, streamed, block_end, required, workers, chunk_size, sink, cache, recorded,
+             log, validator, prefetch, fs):
+    workers = workers or os.cpu_count() or 1
+    needles = tuple(literal.encode('utf-8') for literal in required)
+    planning = isinstance(sink, PlanWriter)
+    if prefetch:
+        def process(item, data):
+            path, known, spans = item
+            return _transform_data(path, data, transform, needles, known, spans, validator, planning)
+
+        def write(results):
+            for file_path, change, _, _, _ in results:
+                if change is not None:
+                    fs.stage(sink, file_path, change[1])
+
+        staged = isinstance(sink, Transaction)
+        results = pipelined(items, process, write if staged else None, fs, depth=prefetch)
+        yield from _write_results(results, sink, cache, recorded, log, fs, staged)
+    elif workers == 1 or len(items) <= chunk_size:
+        results = (_transform_file(path, transform, needles, known, spans, validator, fs, planning)
+                   for path, known, spans in items)
+        yield from _write_results(results, sink, cache, recorded, log, fs)
+    else:
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+        profile = getattr(transform, 'profile', None)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(transform, needles, validator, fs, planning)) as pool:
+            for results, delta in pool.map(_transform_chunk, chunks):
+                if delta:
+                    profile.merge(delta)
+                yield from _write_results(results, sink, cache, recorded, log, fs)
+    yield from _stream_files(large, streamed, block_end, required, sink, cache, recorded, log)
+
+
+def _size(file_path):
+    try:
+        return os.path.getsize(file_path)
+    except OSError:
+        return 0
+
+
+def _stream_files(paths, transform, block_end, required, sink, cache, recorded, log):
+    for file_path in paths:
+        try:
+            # Skip files without any of the literals the transform needs
+            if required and not contains_any(file_path, required):
+                changed, content_hash = False, None
+            elif isinstance(sink, DiffWriter):
+                changed, content_hash = sink.diff_blocks(file_path, transform, block_end), None
+            elif isinstance(sink, PlanWriter):
+                changed, content_hash = sink.plan_blocks(file_path, transform, block_end), None
+            else:
+                changed, content_hash = rewrite_blocks(file_path, transform, block_end, transaction=sink)
+        except Exception as e:
+            print(f"Error processing {file_path}: {e}", file=log)
+            continue
+        if cache is not None and content_hash is not None:
+            if changed:
+                recorded.append((file_path, content_hash))
+            else:
+                cache.record(file_path, content_hash)
+        if changed:
+            yield file_path
+
+
+def _write_results(results, sink, cache, recorded, log, fs, staged=False):
+    """Diff, plan or stage (unless already staged) each change, yielding the changed paths"""
+    for file_path, change, error, content_hash, warnings in results:
+        for line, rule, message in warnings:
+            print(f"Warning: {file_path}({line}): {rule} {message}", file=log)
+        if error is not None:
+            print(f"Error processing {file_path}: {error}", file=log)
+            continue
+        if change is not None:
+            if isinstance(sink, DiffWriter):
+                sink.diff(file_path, *(data.decode('utf-8') for data in change))
+            elif isinstance(sink, PlanWriter):
+                sink.add(file_path, change[0], change[2])
+            else:
+                if not staged:
+                    fs.stage(sink, file_path, change[1])
+                recorded.append((file_path, content_hash))
+            yield file_path
+        elif cache is not None:
+            cache.record(file_path, content_hash)
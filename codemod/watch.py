@@ -0,0 +1,261 @@
+"""Keep the Should -> Assert rules loaded and rewrite test files as they are saved.
+
+    python -m codemod.watch DIR [DIR ...] [--stage NAME] [--dry-run]
+
+The rule pipeline is compiled once. Change notifications come from inotify on
+Linux; elsewhere the trees are polled. Events are coalesced until the trees
+have been quiet for --debounce milliseconds (so a git checkout becomes one
+batch), and only the changed files are rewritten.
+"""
+import argparse
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+from codemod.cache import ManifestSection, ruleset_version
+from codemod.journal import Journal
+from codemod.registry import Registry
+from codemod.structure import validate
+from codemod.walker import rewrite_files
+
+# Quiet period that ends a batch of events, and the longest a batch may be held back
+DEBOUNCE = 0.01
+MAX_DELAY = 2.0
+
+# Interval between scans when inotify is not available
+POLL_INTERVAL = 0.1
+
+# Directories never watched: build output, tool state and our own staging directories
+IGNORED_DIRS = frozenset(['.git', '.vs', 'bin', 'obj', 'node_modules'])
+
+_IN_CLOSE_WRITE = 0x8
+_IN_MOVED_TO = 0x80
+_IN_CREATE = 0x100
+_IN_Q_OVERFLOW = 0x4000
+_IN_IGNORED = 0x8000
+_IN_ISDIR = 0x40000000
+_EVENT = struct.Struct('iIII')
+
+
+def _ignored(name):
+    return name in IGNORED_DIRS or name.startswith('.codemod-')
+
+
+def _directories(root):
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        yield directory
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        pending.extend(entry.path for entry in entries
+                       if entry.is_dir(follow_symlinks=False) and not _ignored(entry.name))
+
+
+class InotifyWatcher:
+    """Recursive inotify watch on Linux; read() returns the paths written or moved in since the last call"""
+
+    def __init__(self, roots):
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.roots = roots
+        self._directories = {}  # watch descriptor -> directory
+        for root in roots:
+            self._add_tree(root)
+
+    def _add_tree(self, root):
+        for directory in _directories(root):
+            mask = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), mask)
+            if wd >= 0:
+                self._directories[wd] = directory
+
+    def fileno(self):
+        return self._fd
+
+    def read(self):
+        """Changed paths, or None if the kernel queue overflowed and every file must be rechecked"""
+        changed = set()
+        overflow = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                name = os.fsdecode(data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b'\0'))
+                offset += _EVENT.size + length
+                if mask & _IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+                directory = self._directories.get(wd)
+                if mask & _IN_IGNORED:
+                    self._directories.pop(wd, None)
+                    continue
+                if directory is None or not name:
+                    continue
+                path = os.path.join(directory, name)
+                if mask & _IN_ISDIR:
+                    if not _ignored(name):
+                        # A new directory (e.g. from a checkout): watch it and take the files already in it
+                        self._add_tree(path)
+                        changed.update(_files(path))
+                elif not mask & _IN_CREATE:
+                    changed.add(path)
+        return None if overflow else changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """Stat-based stand-in for InotifyWatcher where inotify is not available"""
+
+    def __init__(self, roots):
+        self.roots = roots
+        self._seen = self._scan()
+
+    def _scan(self):
+        seen = {}
+        for root in self.roots:
+            for path in _files(root):
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                seen[path] = (stat.st_size, stat.st_mtime_ns)
+        return seen
+
+    def fileno(self):
+        return None
+
+    def read(self):
+        seen = self._scan()
+        changed = {path for path, state in seen.items() if self._seen.get(path) != state}
+        self._seen = seen
+        return changed
+
+    def close(self):
+        pass
+
+
+def _files(root):
+    for directory in _directories(root):
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        yield from (entry.path for entry in entries if entry.is_file(follow_symlinks=False))
+
+
+def open_watcher(roots, poll=False):
+    if not poll and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(roots)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(roots)
+
+
+def batches(watcher, debounce=DEBOUNCE, max_delay=MAX_DELAY):
+    """Sets of changed paths, each yielded once the trees have been quiet for debounce seconds.
+
+    A set is also yielded once max_delay has passed since its first event, so
+    a long-running checkout cannot hold changes back indefinitely. None
+    stands for "anything may have changed" (the event queue overflowed).
+    """
+    pending = set()
+    first = None
+    fd = watcher.fileno()
+    while True:
+        if first is None:
+            timeout = None if fd is not None else POLL_INTERVAL
+        else:
+            timeout = debounce if fd is not None else max(debounce, POLL_INTERVAL)
+        if fd is not None:
+            ready, _, _ = select.select([fd], [], [], timeout)
+        else:
+            time.sleep(timeout)
+            ready = True
+        changed = watcher.read() if ready else set()
+        if changed is None:
+            yield None
+            pending, first = set(), None
+            continue
+        now = time.monotonic()
+        if changed:
+            pending |= changed
+            if first is None:
+                first = now
+            if now - first < max_delay:
+                continue
+        if pending:
+            yield pending
+            pending, first = set(), None
+
+
+def watch(roots, transform, required=(), suffix='.cs', debounce=DEBOUNCE, poll=False, dry_run=False,
+          validator=validate, log=sys.stdout):
+    """Rewrite each file under roots with transform whenever it changes, until interrupted.
+
+    Files written by a rewrite are recorded in an in-memory manifest, so the
+    events they cause do not trigger another pass. The whole session is one
+    run of the undo journal kept in the roots' common directory. Rewrites the
+    validator rejects are reported and not written.
+    """
+    roots = [os.path.abspath(root) for root in roots]
+    cache = None if dry_run else ManifestSection(ruleset_version(transform))
+    journal = None if dry_run else Journal(os.path.commonpath(roots))
+    fixed_count = 0
+    watcher = open_watcher(roots, poll)
+    print(f"Watching {', '.join(roots)} ({type(watcher).__name__})", file=log, flush=True)
+    try:
+        for batch in batches(watcher, debounce):
+            if batch is None:
+                batch = {path for root in roots for path in _files(root)}
+            started = time.perf_counter()
+            paths = sorted(path for path in batch if path.endswith(suffix) and os.path.isfile(path))
+            for file_path in rewrite_files(paths, transform, required=required, cache=cache, journal=journal,
+                                           validator=validator, dry_run=dry_run):
+                print(f"Fixed: {file_path} ({(time.perf_counter() - started) * 1000:.0f} ms)", file=log, flush=True)
+                fixed_count += 1
+    finally:
+        watcher.close()
+        if journal is not None and fixed_count:
+            print(f"Undo with: python -m codemod.undo --root {journal.root} undo {journal.run_id}", file=log)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rewrite .Should() calls in test files as they are saved")
+    parser.add_argument('roots', nargs='+', metavar='DIR', help='test directories to watch')
+    parser.add_argument('--stage', action='append', help='rule stage to apply (repeatable; default: all)')
+    parser.add_argument('--debounce', type=float, default=DEBOUNCE * 1000,
+                        help='quiet milliseconds that end a batch of changes')
+    parser.add_argument('--poll', action='store_true', help='poll the trees instead of using inotify')
+    parser.add_argument('--dry-run', action='store_true', help='write a unified diff of each change to stdout')
+    parser.add_argument('--no-validate', action='store_true',
+                        help='write rewrites even if they leave brackets, literals or Assert calls broken')
+    args = parser.parse_args(argv)
+
+    pipeline = Registry.load().pipeline(args.stage)
+    log = sys.stderr if args.dry_run else sys.stdout
+    try:
+        watch(args.roots, pipeline, required=('.Should()', '.Assert.'), debounce=args.debounce / 1000,
+              poll=args.poll, dry_run=args.dry_run, validator=None if args.no_validate else validate, log=log)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
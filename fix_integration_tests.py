@@ -1,32 +1,43 @@
-import re
-
-# Read the file
-with open(r'C:\Develop25\XStateNet\SemiStandard.Tests\StateMachineIntegrationTests.cs', 'r', encoding='utf-8') as f:
-    content = f.read()
-
-# Fix FluentAssertions patterns
-replacements = [
-    (r'carrier\.Should\(\)\.BeTrue\(\)', 'Assert.True(carrier)'),
-    (r'(\w+)\.Should\(\)\.BeTrue\(\)', r'Assert.True(\1)'),
-    (r'(\w+)\.Should\(\)\.BeFalse\(\)', r'Assert.False(\1)'),
-    (r'(\w+)\.Should\(\)\.NotBeNull\(\)', r'Assert.NotNull(\1)'),
-    (r'(\w+)\.Should\(\)\.BeNull\(\)', r'Assert.Null(\1)'),
-    (r'(\w+)\.Should\(\)\.NotBeEmpty\(\)', r'Assert.NotEmpty(\1)'),
-    (r'(\w+)\.GetCurrentState\(\)\.Should\(\)\.Contain\("([^"]+)"\)', r'Assert.Contains("\2", \1.GetCurrentState())'),
-    (r'(\w+)\.GetCurrentState\(\)\.Should\(\)\.NotContain\("([^"]+)"\)', r'Assert.DoesNotContain("\2", \1.GetCurrentState())'),
-    (r'(\w+)\.Should\(\)\.HaveCount\((\d+)\)', r'Assert.Equal(\2, \1.Count)'),
-    (r'(\w+)\.Should\(\)\.Be\((\d+)\)', r'Assert.Equal(\2, \1)'),
-    (r'(\w+)\.EventLog\.Should\(\)\.Contain\("([^"]+)"\)', r'Assert.Contains("\2", \1.EventLog)'),
-    (r'(\w+)\.GetAllJobs\(\)\.Should\(\)\.HaveCount\((\d+)\)', r'Assert.Equal(\2, \1.GetAllJobs().Count)'),
-    (r'(\w+)\.Should\(\)\.Contain\("([^"]+)"\)', r'Assert.Contains("\2", \1)'),
-    (r'(\w+)\.HasMapping\("([^"]+)", "([^"]+)"\)\.Should\(\)\.BeTrue\(\)', r'Assert.True(\1.HasMapping("\2", "\3"))'),
-]
-
-for pattern, replacement in replacements:
-    content = re.sub(pattern, replacement, content)
-
-# Write the file back
-with open(r'C:\Develop25\XStateNet\SemiStandard.Tests\StateMachineIntegrationTests.cs', 'w', encoding='utf-8') as f:
-    f.write(content)
-
-print("Fixed all FluentAssertions patterns in StateMachineIntegrationTests.cs")
\ No newline at end of file
+import os
+import sys
+
+from codemod import Journal, Registry, diagnostic_windows, find_files, parse_args, print_undo, rewrite_files
+
+test_dir = r'C:\Develop25\XStateNet\SemiStandard.Tests'
+
+# Build logs whose errors pick the files and lines to fix
+build_logs = [os.path.join(os.path.dirname(test_dir), 'build_output.txt')]
+
+# Fix FluentAssertions patterns (rules in codemod/should_rules.json)
+RULES = Registry.load().stage('fix_integration_tests')
+
+def fix_integration_patterns(content):
+    """Fix FluentAssertions patterns in the integration tests"""
+    return RULES.apply(content)
+
+def main():
+    args = parse_args("Fix FluentAssertions patterns on the SemiStandard.Tests lines flagged by the build",
+                      diagnostics=build_logs)
+    windows = diagnostic_windows(args, test_dir)
+    if windows is None:
+        # --all: every test file, whole
+        file_paths = find_files(test_dir)
+    elif not windows:
+        # Nothing flagged (diagnostic_windows said so): rewrite nothing rather than the whole tree
+        return 1
+    else:
+        file_paths = [path for path in windows if os.path.exists(path)]
+
+    journal = Journal(test_dir)
+
+    fixed_count = 0
+    for file_path in rewrite_files(file_paths, RULES, required=('.Should()',), windows=windows, journal=journal,
+                                   validator=args.validator, prefetch=args.prefetch, dry_run=args.dry_run,
+                                   plan=args.plan):
+        print(f"Fixed FluentAssertions patterns in {os.path.basename(file_path)}", file=args.log)
+        fixed_count += 1
+
+    print_undo(args, journal, fixed_count)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,55 +1,46 @@
 import os
-import re
+import sys
+
+from codemod import Journal, Registry, diagnostic_windows, find_files, parse_args, print_undo, rewrite_files
 
 test_dir = r"C:\Develop25\XStateNet\Test"
 
+# Specific leftover receivers (rules in codemod/should_rules.json). Parenthesized JValue conversions such as
+# (counterVal is Newtonsoft.Json.Linq.JValue jv ? jv.ToObject<int>() : (int)(counterVal ?? 0)).Should().Be(2)
+# are handled by fix_final_should.py, whose receivers are whole C# expressions
+RULES = Registry.load().stage('fix_remaining_should')
+
 def fix_remaining_patterns(content):
     """Fix all remaining .Should() patterns including complex ones"""
-
-    # Fix simple object.Should().Be(value) patterns
-    content = re.sub(r'_contextValues\["counter"\]\.Should\(\)\.Be\((\d+)\)',
-                     r'Assert.Equal(\1, _contextValues["counter"])', content)
-
-    content = re.sub(r'_stateMachine\.ContextMap!\["value"\]\.Should\(\)\.Be\("([^"]+)"\)',
-                     r'Assert.Equal("\1", _stateMachine.ContextMap!["value"])', content)
-
-    content = re.sub(r'_stateMachine\.ContextMap\["value"\]\.Should\(\)\.Be\("([^"]+)"\)',
-                     r'Assert.Equal("\1", _stateMachine.ContextMap["value"])', content)
-
-    # Fix complex JValue conversion patterns
-    # (counterVal is Newtonsoft.Json.Linq.JValue jv ? jv.ToObject<int>() : (int)(counterVal ?? 0)).Should().Be(2)
-    content = re.sub(r'\(([a-zA-Z_][a-zA-Z0-9_]*) is Newtonsoft\.Json\.Linq\.JValue ([a-zA-Z_][a-zA-Z0-9_]*) \? \2\.ToObject<int>\(\) : \(int\)\(\1 \?\? 0\)\)\.Should\(\)\.Be\((\d+)\)',
-                     r'Assert.Equal(\3, \1 is Newtonsoft.Json.Linq.JValue \2 ? \2.ToObject<int>() : (int)(\1 ?? 0))', content)
-
-    # Fix UnitTest_InvokeServices pattern
-    content = re.sub(r'_stateMachine\.ContextMap!\["data"\]\.Should\(\)\.Be\("([^"]+)"\)',
-                     r'Assert.Equal("\1", _stateMachine.ContextMap!["data"])', content)
-
-    return content
-
-# Process specific files with errors
-files_to_fix = [
-    "UnitTest_InternalTransitions.cs",
-    "UnitTest_InvokeServices.cs"
-]
-
-fixed_count = 0
-for file_name in files_to_fix:
-    file_path = os.path.join(test_dir, file_name)
-
-    if not os.path.exists(file_path):
-        continue
-
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    original = content
-    content = fix_remaining_patterns(content)
-
-    if content != original:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-        print(f"Fixed: {file_path}")
+    return RULES.apply(content)
+
+# Build logs whose errors pick the files and lines to fix
+build_logs = [os.path.join(os.path.dirname(test_dir), 'build_output.txt')]
+
+def main():
+    args = parse_args("Fix the remaining .Should() patterns on the test lines flagged by the build",
+                      diagnostics=build_logs)
+    windows = diagnostic_windows(args, test_dir)
+    if windows is None:
+        # --all: every test file, whole
+        file_paths = find_files(test_dir)
+    elif not windows:
+        # Nothing flagged (diagnostic_windows said so): rewrite nothing rather than the whole tree
+        return 1
+    else:
+        file_paths = [path for path in windows if os.path.exists(path)]
+
+    journal = Journal(test_dir)
+
+    fixed_count = 0
+    for file_path in rewrite_files(file_paths, RULES, required=('.Should()',), windows=windows, journal=journal,
+                                   validator=args.validator, prefetch=args.prefetch, dry_run=args.dry_run,
+                                   plan=args.plan):
+        print(f"Fixed: {file_path}", file=args.log)
         fixed_count += 1
 
-print(f"\nTotal files fixed: {fixed_count}")
\ No newline at end of file
+    print(f"\nTotal files fixed: {fixed_count}", file=args.log)
+    print_undo(args, journal, fixed_count)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+import os
+
+from codemod import (Journal, Manifest, Registry, parse_args, print_undo, rewrite_files, ruleset_version,
+                     symbol_index, write_profile)
+
+test_dir = r"C:\Develop25\XStateNet\Test"
+
+# Every stage of codemod/should_rules.json, the tokenizer first and the regex rules it supersedes left out (see
+# Registry.pipeline), applied in memory so each file is read and written once
+PIPELINE = Registry.load().pipeline()
+
+def migrate_should_patterns(content):
+    """Run all the .Should() -> Assert stages over content"""
+    return PIPELINE.apply(content)
+
+def main():
+    args = parse_args("Convert FluentAssertions .Should() calls to xUnit Assert calls with every rule stage",
+                      profile=True)
+    PIPELINE.profiling = args.profile
+
+    # Files unchanged since the last run with the same rules are skipped
+    manifest = Manifest.load(os.path.join(test_dir, '.codemod-cache'))
+    cache = manifest.section('migrate_should', ruleset_version(PIPELINE))
+
+    # Only files that call .Should() or hold .Assert. receivers to repair, from the solution-wide symbol index
+    file_paths = symbol_index(os.path.dirname(test_dir)).files(('.Should(', '.Assert.'), under=test_dir)
+
+    # Pre-images go to the undo journal in the test directory
+    journal = Journal(test_dir)
+
+    fixed_count = 0
+    for file_path in rewrite_files(file_paths, PIPELINE, required=('.Should()', '.Assert.'), cache=cache,
+                                   journal=journal, validator=args.validator, prefetch=args.prefetch,
+                                   dry_run=args.dry_run, plan=args.plan):
+        print(f"Fixed: {file_path}", file=args.log)
+        fixed_count += 1
+
+    manifest.save()
+    print(f"\nTotal files fixed: {fixed_count}", file=args.log)
+    for name, count in PIPELINE.report():
+        print(f"  {name}: {count}", file=args.log)
+    print_undo(args, journal, fixed_count)
+    write_profile(args, PIPELINE)
+
+if __name__ == "__main__":
+    main()
@@ -1,76 +1,40 @@
 import os
-import re
 
-def replace_double_quotes_comprehensive(content):
-    """Replace double quotes with single quotes in JSON strings more comprehensively"""
-
-    lines = content.split('\n')
-    modified_lines = []
-
-    for line in lines:
-        # Check if this line looks like it contains JSON content
-        # Look for patterns that indicate JSON in C# code
-        if any(pattern in line for pattern in ['""', '@"', 'json', 'script', 'Script', 'stateMachine']):
-            # Replace "" with ' but be careful about C# string escaping
-
-            # First handle escaped quotes in C# verbatim strings
-            line = line.replace('\\""', '__TEMP_ESCAPED__')
-
-            # Replace double-double quotes pattern
-            line = line.replace('""', "'")
-
-            # Restore escaped quotes
-            line = line.replace('__TEMP_ESCAPED__', '\\"')
-
-        modified_lines.append(line)
+from codemod import Journal, ScriptConverter, find_files, parse_args, print_undo, rewrite_files
 
-    return '\n'.join(modified_lines)
+# Same conversion as replace_quotes.py (see codemod/jsonscript.py)
+CONVERTER = ScriptConverter()
 
-def process_file(filepath):
-    """Process a single file"""
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        # Check if file contains patterns we want to replace
-        if '""' in content:
-            new_content = replace_double_quotes_comprehensive(content)
-
-            if new_content != content:
-                # Create backup
-                backup_path = filepath + '.bak'
-                with open(backup_path, 'w', encoding='utf-8') as f:
-                    f.write(content)
-
-                # Write modified content
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    f.write(new_content)
-
-                print(f"Modified: {os.path.basename(filepath)}")
-                return True
-        return False
-    except Exception as e:
-        print(f"Error processing {filepath}: {e}")
-        return False
+def replace_double_quotes_comprehensive(content):
+    """Replace double quotes with single quotes in the JSON of embedded XState scripts"""
+    return CONVERTER.apply(content)
 
 def main():
+    args = parse_args("Replace doubled quotes with single quotes in embedded JSON, over the whole test tree")
     test_dir = r"C:\Develop25\XStateNet\test"
 
     # Get all .cs files
-    cs_files = []
-    for root, dirs, files in os.walk(test_dir):
-        for file in files:
-            if file.endswith('.cs'):
-                cs_files.append(os.path.join(root, file))
+    cs_files = find_files(test_dir)
 
-    print(f"Found {len(cs_files)} C# files in test directory")
+    print(f"Found {len(cs_files)} C# files in test directory", file=args.log)
 
-    modified_count = 0
-    for filepath in cs_files:
-        if process_file(filepath):
-            modified_count += 1
+    # Only files containing "" are candidates; modified files are written in walk order.
+    # Very large (generated) files are streamed in blocks cut between literals instead of loaded whole.
+    # Pre-images go to the undo journal in the test directory
+    journal = Journal(test_dir)
 
-    print(f"\nModified {modified_count} files")
+    modified_count = 0
+    for filepath in rewrite_files(cs_files, CONVERTER, required=('""',), journal=journal,
+                                 block_end=CONVERTER.block_end, validator=args.validator, prefetch=args.prefetch,
+                                 dry_run=args.dry_run, plan=args.plan):
+        modified_count += 1
+        print(f"Modified: {os.path.basename(filepath)}", file=args.log)
+
+    print(f"\nModified {modified_count} files", file=args.log)
+    scripts, cached = CONVERTER.profile.rules['script'], CONVERTER.profile.rules['cached']
+    print(f"Converted {scripts.matches} scripts; {cached.matches} of {cached.invocations} literals were cached",
+          file=args.log)
+    print_undo(args, journal, modified_count)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,58 +1,41 @@
 import os
-import re
 
-def replace_double_quotes_in_json(content):
-    """Replace double quotes with single quotes in JSON strings"""
-
-    # Replace "" patterns with ' in JSON-like content
-    # This handles patterns like ""id"", ""initial"", etc.
-
-    # Pattern 1: Replace "" around JSON keys/values
-    content = re.sub(r'""([^"]+)""', r"'\1'", content)
-
-    # Pattern 2: Also handle cases where we have ""word"": value
-    content = re.sub(r'"([^"]+)":\s*"([^"]+)"', r"'\1': '\2'", content)
-
-    return content
+from codemod import Journal, ScriptConverter, find_files, parse_args, print_undo, rewrite_files
 
-def process_file(filepath):
-    """Process a single file"""
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
+# Only the XState scripts in verbatim and raw string literals are converted; scripts pasted into
+# several files are converted once (see codemod/jsonscript.py)
+CONVERTER = ScriptConverter()
 
-        # Check if file contains JSON-like patterns with double quotes
-        if '""' in content:
-            new_content = replace_double_quotes_in_json(content)
-
-            if new_content != content:
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    f.write(new_content)
-                return True
-        return False
-    except Exception as e:
-        print(f"Error processing {filepath}: {e}")
-        return False
+def replace_double_quotes_in_json(content):
+    """Replace double quotes with single quotes in the JSON of embedded XState scripts"""
+    return CONVERTER.apply(content)
 
 def main():
+    args = parse_args("Replace doubled quotes with single quotes in embedded JSON")
     test_dir = r"C:\Develop25\XStateNet\test"
 
     # Get all .cs files
-    cs_files = []
-    for root, dirs, files in os.walk(test_dir):
-        for file in files:
-            if file.endswith('.cs'):
-                cs_files.append(os.path.join(root, file))
+    cs_files = find_files(test_dir)
 
-    print(f"Found {len(cs_files)} C# files in test directory")
+    print(f"Found {len(cs_files)} C# files in test directory", file=args.log)
 
-    modified_count = 0
-    for filepath in cs_files:
-        if process_file(filepath):
-            modified_count += 1
-            print(f"Modified: {os.path.basename(filepath)}")
+    # Only files containing "" are candidates; modified files are written in walk order.
+    # Very large (generated) files are streamed in blocks cut between literals instead of loaded whole.
+    # Pre-images go to the undo journal in the test directory
+    journal = Journal(test_dir)
 
-    print(f"\nModified {modified_count} files")
+    modified_count = 0
+    for filepath in rewrite_files(cs_files, CONVERTER, required=('""',), journal=journal,
+                                 block_end=CONVERTER.block_end, validator=args.validator, prefetch=args.prefetch,
+                                 dry_run=args.dry_run, plan=args.plan):
+        modified_count += 1
+        print(f"Modified: {os.path.basename(filepath)}", file=args.log)
+
+    print(f"\nModified {modified_count} files", file=args.log)
+    scripts, cached = CONVERTER.profile.rules['script'], CONVERTER.profile.rules['cached']
+    print(f"Converted {scripts.matches} scripts; {cached.matches} of {cached.invocations} literals were cached",
+          file=args.log)
+    print_undo(args, journal, modified_count)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,105 @@
+"""Tests for the incremental-run manifest and ruleset versions (codemod/cache.py)"""
+import marshal
+import os
+
+from codemod import Manifest, Registry, Rule, RuleSet, rewrite_files, ruleset_version
+from codemod import cache
+from codemod.cache import FORMAT, digest
+
+STAGE = Registry.load().stage('fix_all_should')
+
+
+def _record(section, path, data):
+    path.write_bytes(data)
+    section.record(str(path), digest(data))
+
+
+def test_manifest_round_trip(tmp_path):
+    a = tmp_path / 'A.cs'
+    manifest = Manifest(str(tmp_path / '.codemod-cache'))
+    _record(manifest.section('fix_all_should', 'v1'), a, b'class A {}\n')
+    manifest.save()
+
+    section = Manifest.load(str(tmp_path / '.codemod-cache')).section('fix_all_should', 'v1')
+    assert section.is_fresh(str(a))
+    assert section.known_digest(str(a)) == digest(b'class A {}\n')
+    assert section.known_digest(str(tmp_path / 'B.cs')) is None
+
+
+def test_changed_file_is_not_fresh(tmp_path):
+    a = tmp_path / 'A.cs'
+    section = Manifest(str(tmp_path / '.codemod-cache')).section('fix_all_should', 'v1')
+    _record(section, a, b'class A {}\n')
+    a.write_bytes(b'class A { }\n')
+    assert not section.is_fresh(str(a))
+    a.unlink()
+    assert not section.is_fresh(str(a))
+
+
+def test_new_version_only_invalidates_its_own_section(tmp_path):
+    a = tmp_path / 'A.cs'
+    manifest = Manifest(str(tmp_path / '.codemod-cache'))
+    _record(manifest.section('fix_all_should', 'v1'), a, b'class A {}\n')
+    _record(manifest.section('fix_final_should', 'v1'), a, b'class A {}\n')
+    manifest.save()
+
+    manifest = Manifest.load(str(tmp_path / '.codemod-cache'))
+    assert not manifest.section('fix_all_should', 'v2').is_fresh(str(a))
+    assert manifest.section('fix_final_should', 'v1').is_fresh(str(a))
+    manifest.save()
+    assert not Manifest.load(str(tmp_path / '.codemod-cache')).section('fix_all_should', 'v1').is_fresh(str(a))
+
+
+def test_unreadable_or_old_manifest_starts_empty(tmp_path):
+    a = tmp_path / 'A.cs'
+    path = str(tmp_path / '.codemod-cache')
+    manifest = Manifest(path)
+    _record(manifest.section('fix_all_should', 'v1'), a, b'class A {}\n')
+    manifest.save()
+    with open(path, 'rb') as f:
+        layout, sections = marshal.load(f)
+    assert layout == FORMAT
+
+    with open(path, 'wb') as f:
+        marshal.dump((FORMAT - 1, sections), f)
+    assert not Manifest.load(path).section('fix_all_should', 'v1').is_fresh(str(a))
+    with open(path, 'wb') as f:
+        f.write(b'not a manifest')
+    assert not Manifest.load(path).section('fix_all_should', 'v1').is_fresh(str(a))
+    assert not Manifest.load(str(tmp_path / 'missing')).section('fix_all_should', 'v1').is_fresh(str(a))
+
+
+def test_ruleset_version_follows_rules_limits_and_engine(monkeypatch):
+    def build(replacement=r'Assert.Equal(\2, \1)', max_window=None):
+        return RuleSet([Rule('Be', r'(\w+)\.Should\(\)\.Be\(([^)]+)\)', replacement, max_window=max_window)])
+
+    version = ruleset_version(build())
+    assert ruleset_version(build()) == version
+    assert ruleset_version(build(r'Assert.Equal(\1, \2)')) != version
+    assert ruleset_version(build(max_window=1024)) != version
+    assert ruleset_version(build(max_window=1024)) != ruleset_version(build(max_window=2048))
+
+    monkeypatch.setattr(cache, '_engine', b'\0' * 8)
+    assert ruleset_version(build()) != version
+
+
+def test_rewrite_files_skips_files_the_manifest_knows(tmp_path):
+    a, b = tmp_path / 'A.cs', tmp_path / 'B.cs'
+    a.write_bytes(b'class A {\n    void M() { count.Should().Be(5); }\n}\n')
+    b.write_bytes(b'class B {}\n')
+    paths = [str(a), str(b)]
+    seen = []
+
+    def transform(content):
+        seen.append(content)
+        return STAGE(content)
+
+    manifest = Manifest(str(tmp_path / '.codemod-cache'))
+    section = manifest.section('fix_all_should', ruleset_version(STAGE))
+    assert list(rewrite_files(paths, transform, workers=1, cache=section)) == [str(a)]
+    assert len(seen) == 2 and all(section.is_fresh(path) for path in paths)
+
+    # Untouched files are not opened again; a touched one with the same content is not transformed again
+    os.utime(a, ns=(0, 0))
+    assert list(rewrite_files(paths, transform, workers=1, cache=section)) == []
+    assert len(seen) == 2 and section.is_fresh(str(a))
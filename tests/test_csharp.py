@@ -0,0 +1,82 @@
+"""Tests for the tokenizer-based Should -> Assert rewriter (codemod/csharp.py)"""
+import pytest
+
+from codemod import Registry
+
+REWRITER = Registry.load().stage('fix_final_should')
+
+# What the original fix_final_should.py re.sub chain produced for simple receivers
+SHOULD_REWRITES = [
+    ('result.Should().NotBeNull();', 'Assert.NotNull(result);'),
+    ('machine.State.Should().BeNull();', 'Assert.Null(machine.State);'),
+    ('count.Should().Be(5);', 'Assert.Equal(5, count);'),
+    ('name.Should().NotBe("x");', 'Assert.NotEqual("x", name);'),
+    ('items.Should().Contain(x);', 'Assert.Contains(x, items);'),
+    ('value.Should().BeGreaterThan(3);', 'Assert.True(value > 3);'),
+    ('list.Count.Should().BeLessThanOrEqualTo(10);', 'Assert.True(list.Count <= 10);'),
+    ('flag.Should().BeTrue();', 'Assert.True(flag);'),
+    ('flag.Should().BeFalse();', 'Assert.False(flag);'),
+]
+
+
+@pytest.mark.parametrize('line, expected', SHOULD_REWRITES)
+def test_should_rewriter_matches_old_output(line, expected):
+    assert REWRITER.apply(line) == expected
+
+
+# Assert methods return void, so a call whose result is used stays as it is
+CHAINED = [
+    'a.Should().Be(1).And.NotBeNull();',
+    'x.Should().NotBeNull().And.Subject.Should().Be(2);',
+    'x?.Should().Be(1)?.And.Be(2);',
+]
+
+
+@pytest.mark.parametrize('line', CHAINED)
+def test_chained_calls_are_left_alone(line):
+    assert REWRITER.apply(line) == line
+
+
+def test_call_inside_chained_call_is_rewritten():
+    line = 'a.Should().Contain(b.Should().BeTrue()).And.HaveCount(1);'
+    assert REWRITER.apply(line) == 'a.Should().Contain(Assert.True(b)).And.HaveCount(1);'
+
+
+COMPARISONS = [
+    ('x.Should().BeLessThan(ok ? 1 : 2);', 'Assert.True(x < (ok ? 1 : 2));'),
+    ('x.Should().BeGreaterThan(a ?? b);', 'Assert.True(x > (a ?? b));'),
+    ('x.Should().BeGreaterThanOrEqualTo(a || b);', 'Assert.True(x >= (a || b));'),
+    ('x.Should().BeLessThanOrEqualTo(y = 3);', 'Assert.True(x <= (y = 3));'),
+    ('x.Should().BeGreaterThan(a + b);', 'Assert.True(x > a + b);'),
+    ('x.Should().BeLessThan(Pick(ok ? 1 : 2));', 'Assert.True(x < Pick(ok ? 1 : 2));'),
+    ('a.Should().Be(ok ? 1 : 2);', 'Assert.Equal(ok ? 1 : 2, a);'),
+]
+
+
+@pytest.mark.parametrize('line, expected', COMPARISONS)
+def test_comparison_operands_keep_their_precedence(line, expected):
+    assert REWRITER.apply(line) == expected
+
+
+BECAUSE = [
+    ('flag.Should().BeTrue("because {0}", y);', 'Assert.True(flag, string.Format("because {0}", y));'),
+    ('x.Should().BeGreaterThan(3, "{0} of {1}", a, b);', 'Assert.True(x > 3, string.Format("{0} of {1}", a, b));'),
+    ('flag.Should().BeFalse("because");', 'Assert.False(flag, "because");'),
+    # Assert.Equal has no message argument
+    ('a.Should().Be(1, "because {0}", y);', 'a.Should().Be(1, "because {0}", y);'),
+]
+
+
+@pytest.mark.parametrize('line, expected', BECAUSE)
+def test_because_arguments_are_never_dropped(line, expected):
+    assert REWRITER.apply(line) == expected
+
+
+def test_profiling_charges_rendering_to_each_rule():
+    rewriter = Registry.load().stage('fix_final_should')
+    rewriter.profiling = True
+    rewriter.apply('a.Should().Be(1);\nb.Should().BeTrue();\n')
+    rules = rewriter.profile.rules
+    assert (rules['Be'].matches, rules['BeTrue'].matches) == (1, 1)
+    assert rules['Be'].bytes_scanned == len('a.Should().Be(1)')
+    assert rules['Be'].seconds > 0
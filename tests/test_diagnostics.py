@@ -0,0 +1,72 @@
+"""Tests for the build log index that picks the lines to rewrite (codemod/diagnostics.py, cli.diagnostic_windows)"""
+import os
+
+from codemod import DiagnosticIndex, diagnostic_windows, parse_args
+from codemod.diagnostics import apply_windows, line_windows
+
+LOG = '''\
+  Restoring packages...
+  XStateNet -> C:\\Develop25\\XStateNet\\bin\\XStateNet.dll
+3>C:\\Develop25\\XStateNet\\Test\\A.cs(12,5): error CS1061: 'X' does not contain 'Should' [C:\\Test\\Test.csproj]
+C:\\Develop25\\XStateNet\\Test\\A.cs(12,5,12,9): error CS1061: again, in the summary [C:\\Test\\Test.csproj]
+C:\\Program Files (x86)\\Tests\\B.cs(3,1): error CS0103: 이름이 없습니다 [C:\\Test\\Test.csproj]
+C:\\Develop25\\XStateNet\\Test\\A.cs(40,1): warning CS8618: nullable [C:\\Test\\Test.csproj]
+C:\\Develop25\\XStateNet\\Test\\A.cs(30,9): error CS1061: 'Y' does not contain 'Should' [C:\\Test\\Test.csproj]
+'''
+
+
+def _log(tmp_path, text=LOG, encoding='cp949'):
+    path = tmp_path / 'build_output.txt'
+    path.write_bytes(text.encode(encoding))
+    return str(path)
+
+
+def test_errors_are_indexed_once_by_code_and_file(tmp_path):
+    index = DiagnosticIndex.scan([_log(tmp_path)])
+    a = os.path.normpath('C:\\Develop25\\XStateNet\\Test\\A.cs')
+    b = os.path.normpath('C:\\Program Files (x86)\\Tests\\B.cs')
+    assert index.files() == sorted([a, b])
+    assert index.files(['CS0103']) == [b]
+    assert index.lines(a) == [12, 30]
+    assert len(index) == 3
+    assert index.summary() == [('CS1061', 1, 2), ('CS0103', 1, 1)]
+
+
+def test_warnings_only_when_asked(tmp_path):
+    index = DiagnosticIndex.scan([_log(tmp_path)], severities=('warning',))
+    assert [code for code, _, _ in index.summary()] == ['CS8618']
+
+
+def test_windows_merge_nearby_lines():
+    assert line_windows([12, 14, 30], context=2) == [(9, 16), (27, 32)]
+
+
+def test_apply_windows_leaves_other_lines_alone():
+    content = 'a\nb\nc\nd\n'
+    assert apply_windows(content, [(1, 2), (3, 4)], str.upper) == 'a\nB\nc\nD\n'
+
+
+def test_flagged_lines_under_root_are_selected(tmp_path):
+    root = tmp_path / 'Test'
+    root.mkdir()
+    path = root / 'A.cs'
+    log = _log(tmp_path, f'{str(path).upper() if os.name == "nt" else path}(5,1): error CS1061: x\n'
+                         f'{tmp_path / "Other.cs"}(1,1): error CS1061: x\n', 'utf-8')
+    args = parse_args('test', ['--diagnostics', log, '--window', '1'], diagnostics=[])
+    windows = diagnostic_windows(args, str(root))
+    assert list(windows.values()) == [[(3, 6)]]
+
+
+def test_nothing_flagged_selects_nothing(tmp_path, capsys):
+    log = _log(tmp_path, '  Build succeeded.\n')
+    args = parse_args('test', ['--code', 'CS1061'], diagnostics=[log, str(tmp_path / 'missing.txt')])
+    assert diagnostic_windows(args, str(tmp_path)) == {}
+    err = capsys.readouterr().err
+    assert 'missing.txt not found' in err
+    assert 'no CS1061 errors' in err and 'nothing rewritten' in err and '--all' in err
+
+
+def test_all_selects_every_file_without_reading_the_logs(tmp_path, capsys):
+    args = parse_args('test', ['--all'], diagnostics=[str(tmp_path / 'missing.txt')])
+    assert diagnostic_windows(args, str(tmp_path)) is None
+    assert capsys.readouterr().err == ''
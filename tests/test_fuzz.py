@@ -0,0 +1,126 @@
+"""Tests for the time-boxed regex rules and the fuzz harness that sizes their windows (codemod/fuzz.py)"""
+import io
+import json
+
+import pytest
+
+from codemod import Registry, Rule, RuleSet
+from codemod.fuzz import chained_sub, check_budgets, differential, main, time_boxed, window_for, write_windows
+from codemod.prefilter import run_stops
+from codemod.registry import SHOULD_RULES
+
+REGISTRY = Registry.load()
+REGEX_STAGES = [name for name in REGISTRY.stages if isinstance(REGISTRY.stage(name), RuleSet)]
+
+with open(SHOULD_RULES, encoding='utf-8') as f:
+    TABLE = json.load(f)
+
+SHOULD_LINES = '''    void M() {
+        result.Should().NotBeNull();
+        count.Should().Be(5);
+        items.Should().HaveCount(3);
+        flag.Should().BeTrue();
+    }
+'''
+
+
+def _payload_fixture(stage, gap):
+    """A test class holding a hex constant longer than any max_window of stage, gap lines above the assertions"""
+    longest = max(rule.max_window or 0 for rule in stage.rules)
+    payload = ('0123456789abcdef' * (longest // 16 + 8))[:longest + 64]
+    return (f'public class T {{\n    const string Payload = "{payload}";\n' + '    // filler\n' * gap
+            + SHOULD_LINES + '}\n')
+
+
+@pytest.mark.parametrize('name', REGEX_STAGES)
+def test_time_box_matches_chained_sub(name):
+    """Runs longer than every max_window away from the assertions change nothing (see Rule.max_window)"""
+    stage = REGISTRY.stage(name)
+    inputs = [(f'gap {gap}', _payload_fixture(stage, gap)) for gap in (0, 30)]
+    assert differential(stage.apply, chained_sub(stage.rules), inputs) == []
+    assert stage.warnings == []
+
+
+@pytest.mark.parametrize('name', REGEX_STAGES)
+def test_long_literal_does_not_disable_rules(name):
+    """A long literal elsewhere in the file leaves the assertions near it rewritten"""
+    stage = REGISTRY.stage(name)
+    if not any(rule.max_window for rule in stage.rules):
+        pytest.skip('no time-boxed rules')
+    content = _payload_fixture(stage, 0)
+    assert stage.apply(content) != content
+
+
+def test_rules_of_a_receiver_class_share_one_window():
+    """max_window follows the receiver class and its tightest budget, not the timings of one machine"""
+    classes = {}
+    for stage in TABLE['stages']:
+        for rule in stage['rules']:
+            assert 'max_window_derivation' not in rule, rule['name']
+            if 'budget_ms' in rule or 'max_window' in rule:
+                classes.setdefault(run_stops(rule['pattern']), []).append(rule)
+    for rules in classes.values():
+        budget = min(rule.get('budget_ms', 10.0) for rule in rules)
+        assert {rule.get('max_window') for rule in rules} == {window_for(budget)}, [rule['name'] for rule in rules]
+
+
+def test_nested_brackets_are_time_boxed():
+    """NullConditional.Be backtracks quadratically in the '(' before its literal"""
+    stage = REGISTRY.stage('fix_complex_should')
+    line = '(' * 10000 + 'x' + ')' * 10000 + ').Should().Be(1);\n'
+    assert stage.apply(line) == line
+    assert [rule for _, rule, _ in stage.warnings] == ['Be', 'NullConditional.Be']
+    del stage.warnings[:]
+
+
+def test_budgeted_rule_without_window_gets_its_class_window(tmp_path):
+    table = {'stages': [{'name': 'stage', 'priority': 1, 'rules': [
+        {'name': 'Slow', 'priority': 1, 'pattern': r'(\w+)\.Should\(\)\.BeTrue\(\)',
+         'replacement': r'Assert.True(\1)', 'budget_ms': 1000},
+        {'name': 'Tight', 'priority': 2, 'pattern': r'(\w+)\.Should\(\)\.BeFalse\(\)',
+         'replacement': r'Assert.False(\1)', 'budget_ms': 40},
+    ]}]}
+    registry = Registry(table['stages'])
+    flagged, slow = check_budgets(registry, table, ['stage'], 256, 10.0, 0.5, 1, io.StringIO())
+    assert flagged == {('stage', 'Slow'): window_for(40), ('stage', 'Tight'): window_for(40)} and slow == []
+    assert window_for(40) == 2 * window_for(10)
+
+    path = tmp_path / 'rules.json'
+    write_windows(str(path), table, flagged)
+    rules = json.loads(path.read_text(encoding='utf-8'))['stages'][0]['rules']
+    assert [rule['max_window'] for rule in rules] == [window_for(40)] * 2
+    assert Registry.load(str(path)).stage('stage').rules[0].max_window == window_for(40)
+
+
+def test_windowed_rule_skips_long_runs_only():
+    rule = Rule('BeTrue', r'(\w+)\.Should\(\)\.BeTrue\(\)', r'Assert.True(\1)', max_window=64)
+    stage = RuleSet([rule])
+    content = 'a' * 100 + '.Should().BeTrue();\nflag.Should().BeTrue();\n'
+    assert stage.apply(content) == 'a' * 100 + '.Should().BeTrue();\nAssert.True(flag);\n'
+    assert [(line, name) for line, name, _ in stage.warnings] == [(1, 'BeTrue')]
+
+
+def test_each_skipped_site_is_warned_on_its_own_line():
+    """A site next to a long run is still tried; one whose match could start inside a skipped site is warned"""
+    rule = Rule('BeTrue', r'([\w ()]+)\.Should\(\)\.BeTrue\(\)', r'Assert.True(\1)', max_window=64)
+    stage = RuleSet([rule])
+    long_line = 'a ' * 50 + 'x.Should().BeTrue()'
+    content = f'{long_line};\ny.Should().BeTrue();\n{long_line} z.Should().BeTrue();\nw.Should().BeTrue();\n'
+    expected = f'{long_line};\nAssert.True(y);\n{long_line} z.Should().BeTrue();\nAssert.True(w);\n'
+    assert stage.apply(content) == expected
+    assert [(line, name) for line, name, _ in stage.warnings] == [(1, 'BeTrue'), (3, 'BeTrue'), (3, 'BeTrue')]
+
+
+def test_time_box_differences_are_told_apart():
+    rule = Rule('BeTrue', r'([\w ()]+)\.Should\(\)\.BeTrue\(\)', r'Assert.True(\1)', max_window=64)
+    stage = RuleSet([rule])
+    text = 'y.Should().BeTrue();\n' + 'a ' * 50 + 'x.Should().BeTrue();\n'
+    new, old = stage.apply(text), chained_sub([rule])(text)
+    assert new != old and stage.warnings
+    assert [line for line, _, _ in time_boxed(stage, text, new, old)] == [2]
+    assert time_boxed(stage, text, text, old) is None  # differs above the skipped site
+    assert stage.warnings == []
+
+
+def test_default_differential_passes():
+    assert main(['--no-budget', '--lines', '200', '--corpus', '5']) == 0
@@ -0,0 +1,55 @@
+"""Tests for the undo journal (codemod/journal.py)"""
+import io
+import os
+
+from codemod import Journal, Registry, rewrite_files
+from codemod.journal import JOURNAL_DIR
+
+STAGE = Registry.load().stage('fix_all_should')
+
+
+def test_journal_undo_restores_files(tmp_path):
+    first = b'class A {\n    void M() { count.Should().Be(5); }\n}\n'
+    second = b'class B {\r\n    void M() { flag.Should().BeTrue(); }\r\n}\r\n'
+    a, b = tmp_path / 'A.cs', tmp_path / 'B.cs'
+    a.write_bytes(first)
+    b.write_bytes(second)
+
+    journal = Journal(str(tmp_path))
+    assert sorted(rewrite_files([str(a), str(b)], STAGE, workers=1, journal=journal)) == [str(a), str(b)]
+    assert a.read_bytes() != first and b.read_bytes() != second
+    assert [run_id for run_id, _ in Journal(str(tmp_path)).runs()] == [journal.run_id]
+
+    restored = Journal(str(tmp_path)).undo(journal.run_id, log=io.StringIO())
+    assert sorted(restored) == [str(a), str(b)]
+    assert a.read_bytes() == first and b.read_bytes() == second
+
+
+def test_journal_undo_skips_files_edited_since(tmp_path):
+    original = b'class A {\n    void M() { count.Should().Be(5); }\n}\n'
+    path = tmp_path / 'A.cs'
+    path.write_bytes(original)
+    journal = Journal(str(tmp_path))
+    list(rewrite_files([str(path)], STAGE, workers=1, journal=journal))
+    edited = b'// edited by hand\n'
+    path.write_bytes(edited)
+
+    log = io.StringIO()
+    assert Journal(str(tmp_path)).undo(journal.run_id, log=log) == []
+    assert path.read_bytes() == edited
+    assert 'changed since run' in log.getvalue()
+
+    assert Journal(str(tmp_path)).undo(journal.run_id, force=True, log=io.StringIO()) == [str(path)]
+    assert path.read_bytes() == original
+
+
+def test_identical_pre_images_are_stored_once(tmp_path):
+    original = b'class A {\n    void M() { count.Should().Be(5); }\n}\n'
+    paths = []
+    for name in ('A.cs', 'B.cs', 'C.cs'):
+        (tmp_path / name).write_bytes(original)
+        paths.append(str(tmp_path / name))
+
+    list(rewrite_files(paths, STAGE, workers=1, journal=Journal(str(tmp_path))))
+    objects = [name for _, _, names in os.walk(tmp_path / JOURNAL_DIR / 'objects') for name in names]
+    assert len(objects) == 1
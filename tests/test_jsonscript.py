@@ -0,0 +1,69 @@
+"""Tests for the embedded XState script converter and its block-wise streaming (codemod/jsonscript.py)"""
+from codemod import ScriptConverter, rewrite_files
+from codemod.stream import read_blocks, rewrite_blocks
+
+BOM = b'\xef\xbb\xbf'
+
+LITERAL = (b'    string json = @"{\r\n        ""id"": ""m"",\r\n        ""initial"": ""idle""\r\n    }";\r\n')
+
+
+def test_only_state_machine_scripts_are_converted():
+    converter = ScriptConverter()
+    script = '''var s = @"{""id"": ""m"", ""states"": {""idle"": {}}}";'''
+    other = '''var s = @"{""x"": 1}"; var t = @"say ""hi""";'''
+    assert converter.apply(script) == "var s = @\"{'id': 'm', 'states': {'idle': {}}}\";"
+    assert converter.apply(other) == other
+
+
+def test_interpolation_holes_are_kept():
+    converter = ScriptConverter()
+    assert converter.apply('var s = $@"{{""initial"": ""{name}""}}";') == "var s = $@\"{{'initial': '{name}'}}\";"
+
+
+def test_repeated_literal_is_converted_once():
+    converter = ScriptConverter()
+    content = (LITERAL * 3).decode('utf-8')
+    converter.apply(content)
+    assert converter.profile.rules['script'].matches == 3
+    assert converter.profile.rules['cached'].matches == 2
+
+
+def test_cache_forgets_least_recently_used_literals():
+    converter = ScriptConverter(cache_size=2)
+    first, second, third = (f'var s{index} = @"{{""initial"": ""s{index}""}}";' for index in range(3))
+    for content in (first, second, first, third, first, second):
+        converter.apply(content)
+    assert len(converter.cache) == 2
+    # second was the least recently used when third came in, so it was converted again
+    assert converter.profile.rules['cached'].matches == 2
+
+
+def test_streamed_rewrite_keeps_bom_and_crlf(tmp_path):
+    """Large files are rewritten a block at a time (see stream.read_blocks) with the same bytes"""
+    converter = ScriptConverter()
+    source = BOM + b'class T {\r\n' + LITERAL * 200 + b'}\r\n'
+    streamed = tmp_path / 'streamed.cs'
+    whole = tmp_path / 'whole.cs'
+    streamed.write_bytes(source)
+    whole.write_bytes(source)
+
+    assert list(rewrite_files([str(streamed)], converter, workers=1, block_end=converter.block_end,
+                              stream_threshold=1)) == [str(streamed)]
+    assert list(rewrite_files([str(whole)], converter, workers=1)) == [str(whole)]
+    assert streamed.read_bytes() == whole.read_bytes()
+    assert streamed.read_bytes().startswith(BOM)
+    assert streamed.read_bytes().count(b'\r\n') == source.count(b'\r\n')
+    assert b"'initial': 'idle'" in streamed.read_bytes()
+
+
+def test_small_blocks_never_split_a_literal(tmp_path):
+    converter = ScriptConverter()
+    source = BOM + b'class T {\r\n' + LITERAL * 50 + b'}\r\n'
+    path = tmp_path / 'T.cs'
+    path.write_bytes(source)
+    with open(path, 'rb') as f:
+        blocks = list(read_blocks(f, converter.block_end, chunk_size=64))
+    assert len(blocks) > 10 and ''.join(blocks).encode('utf-8') == source
+
+    changed, _ = rewrite_blocks(str(path), converter, converter.block_end, chunk_size=64)
+    assert changed and path.read_bytes() == converter.apply(source.decode('utf-8')).encode('utf-8')
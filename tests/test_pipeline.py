@@ -0,0 +1,126 @@
+"""Tests for the read-ahead / write-behind I/O pipeline (codemod/pipeline.py)"""
+import threading
+import time
+
+import pytest
+
+from codemod import Registry, rewrite_files
+from codemod.pipeline import FileSystem, SlowFileSystem, pipelined
+
+STAGE = Registry.load().stage('fix_all_should')
+
+
+class RecordingFileSystem(FileSystem):
+    """Serves paths as their own data, recording how many reads were started and ran at once"""
+
+    def __init__(self, delay=lambda path: 0.001):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.started = 0
+        self.running = 0
+        self.most_running = 0
+
+    def read(self, path):
+        with self.lock:
+            self.started += 1
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        time.sleep(self.delay(path))
+        with self.lock:
+            self.running -= 1
+        if path.startswith('missing'):
+            raise OSError(f'{path} not found')
+        return path.encode('utf-8')
+
+
+def _process(item, data):
+    return item[0], data.decode('utf-8').upper(), None, None, []
+
+
+def test_results_come_out_in_input_order():
+    items = [(f'f{index}',) for index in range(20)]
+    # Later files are read faster, so reads finish in reverse order
+    fs = RecordingFileSystem(delay=lambda path: 0.002 * (20 - int(path[1:])))
+    results = list(pipelined(items, _process, fs=fs, depth=4))
+    assert [path for path, *_ in results] == [path for path, in items]
+    assert [change for _, change, *_ in results] == [path.upper() for path, in items]
+
+
+def test_reads_run_ahead_up_to_depth():
+    items = [(f'f{index}',) for index in range(40)]
+    fs = RecordingFileSystem()
+    ahead = []
+
+    def process(item, data):
+        ahead.append(fs.started - (int(item[0][1:]) + 1))
+        time.sleep(0.002)
+        return _process(item, data)
+
+    assert len(list(pipelined(items, process, fs=fs, depth=4))) == 40
+    assert 1 < fs.most_running <= 4
+    # depth reads queued, plus the one the reader holds until there is room
+    assert 0 < max(ahead) <= 5
+
+
+def test_read_errors_are_reported_in_place():
+    items = [('f0',), ('missing1',), ('f2',)]
+    processed = []
+
+    def process(item, data):
+        processed.append(item[0])
+        return _process(item, data)
+
+    results = list(pipelined(items, process, fs=RecordingFileSystem(), depth=2))
+    assert [(path, error) for path, _, error, _, _ in results] == [
+        ('f0', None), ('missing1', 'missing1 not found'), ('f2', None)]
+    assert processed == ['f0', 'f2']
+
+
+def test_results_are_written_before_they_are_yielded():
+    items = [(f'f{index}',) for index in range(30)]
+    written = []
+    batches = []
+
+    def write(results):
+        batches.append(len(results))
+        written.extend(path for path, *_ in results)
+
+    for path, *_ in pipelined(items, _process, write, fs=RecordingFileSystem(), depth=4, batch=8):
+        assert path in written
+    assert written == [path for path, in items]
+    assert max(batches) <= 8
+
+
+def test_transform_errors_reach_the_caller():
+    def process(item, data):
+        if item[0] == 'f3':
+            raise ValueError('bad transform')
+        return _process(item, data)
+
+    with pytest.raises(ValueError, match='bad transform'):
+        list(pipelined([(f'f{index}',) for index in range(10)], process, fs=RecordingFileSystem(), depth=2))
+
+
+def test_stopping_early_cancels_pending_reads():
+    fs = RecordingFileSystem()
+    results = pipelined([(f'f{index}',) for index in range(100)], _process, fs=fs, depth=4)
+    assert next(results)[0] == 'f0'
+    results.close()
+    started = fs.started
+    time.sleep(0.02)
+    assert fs.started == started < 100 and fs.running == 0
+
+
+def test_prefetched_rewrite_matches_serial(tmp_path):
+    contents = [f'class C{index} {{\n    void M() {{ value{index}.Should().Be({index}); }}\n}}\n'.encode('utf-8')
+                if index % 3 else b'class Plain {}\n' for index in range(12)]
+    paths = []
+    for index, data in enumerate(contents):
+        path = tmp_path / f'C{index}.cs'
+        path.write_bytes(data)
+        paths.append(str(path))
+
+    expected = [STAGE(data.decode('utf-8')).encode('utf-8') for data in contents]
+    changed = list(rewrite_files(paths, STAGE, prefetch=4, fs=SlowFileSystem(latency=0.001)))
+    assert changed == [path for path, data in zip(paths, contents) if data != b'class Plain {}\n']
+    assert [(tmp_path / f'C{index}.cs').read_bytes() for index in range(12)] == expected
@@ -0,0 +1,137 @@
+"""Tests for edit plans: compose, merge, save/load and replay (codemod/plan.py, codemod/replay.py)"""
+import io
+
+import pytest
+
+from codemod import Plan, Registry, Transaction, rewrite_files
+from codemod.diff import DiffWriter
+from codemod.plan import apply_edits, compose, merge, plan_edits
+from codemod.replay import apply
+
+REGISTRY = Registry.load()
+
+SOURCE = '''class T {
+    void M() {
+        count.Should().Be(5);
+        items.Should().HaveCount(3);
+        flag.Should().BeTrue();
+        (a ?? b).Should().NotBeNull();
+    }
+}
+'''
+
+
+def _plan(name, path, text, edits):
+    plan = Plan(name=name)
+    plan.add(path, text.encode('utf-8'), edits)
+    return plan
+
+
+def _replace(text, old, new, rule):
+    offset = text.index(old)
+    return offset, len(old), new, rule
+
+
+def test_compose_equals_applying_in_turn():
+    first = [_replace(SOURCE, 'count.Should().Be(5)', 'Assert.Equal(5, count)', 'Be'),
+             _replace(SOURCE, 'flag', 'enabled', 'Rename')]
+    middle = apply_edits(SOURCE, first)
+    second = [_replace(middle, 'Assert.Equal(5, count)', 'Assert.Equal(5, total)', 'Rename'),
+              _replace(middle, 'enabled.Should().BeTrue()', 'Assert.True(enabled)', 'BeTrue')]
+    composed = compose(first, second, middle)
+    assert apply_edits(SOURCE, composed) == apply_edits(middle, second)
+    assert [rule for _, _, _, rule in composed] == ['Rename', 'BeTrue']
+
+
+def test_pipeline_plan_composes_its_stages():
+    pipeline = REGISTRY.pipeline(['fix_all_should', 'fix_final_should'])
+    # A receiver split by an earlier regex run, for the .Assert. fixups left in fix_all_should
+    source = SOURCE.replace('flag.Should().BeTrue();',
+                            'flag.Should().BeTrue();\n        pingHits.Assert.Contains("ping");')
+    edits = plan_edits(pipeline, source)
+    assert apply_edits(source, edits) == pipeline.apply(source)
+    assert {rule.split('.')[0] for _, _, _, rule in edits} == {'fix_all_should', 'fix_final_should'}
+
+
+def test_save_and_load_keep_every_edit(tmp_path):
+    path = str(tmp_path / 'T.cs')
+    plan = _plan('a', path, SOURCE, plan_edits(REGISTRY.stage('fix_all_should'), SOURCE))
+    plan.save(str(tmp_path / 'a.plan'))
+    loaded = Plan.load(str(tmp_path / 'a.plan'))
+    assert loaded.files[path].edits == plan.files[path].edits
+    assert loaded.files[path].digest == plan.files[path].digest
+    assert loaded.files[path].position(SOURCE.index('flag')) == (5, 9)
+
+
+def test_load_refuses_other_files(tmp_path):
+    (tmp_path / 'junk').write_bytes(b'not a plan')
+    with pytest.raises(ValueError, match='not an edit plan'):
+        Plan.load(str(tmp_path / 'junk'))
+
+
+def test_merge_combines_plans_of_the_same_contents():
+    path = 'T.cs'
+    first = [_replace(SOURCE, 'count.Should().Be(5)', 'Assert.Equal(5, count)', 'Be')]
+    second = [_replace(SOURCE, 'count.Should().Be(5)', 'Assert.Equal(5, count)', 'Be'),
+              _replace(SOURCE, 'flag.Should().BeTrue()', 'Assert.True(flag)', 'BeTrue')]
+    merged, conflicts = merge([_plan('a', path, SOURCE, first), _plan('b', path, SOURCE, second)])
+    assert conflicts == []
+    assert apply_edits(SOURCE, merged.files[path].edits) == apply_edits(SOURCE, second)
+
+
+def test_merge_reports_overlapping_edits():
+    path = 'T.cs'
+    first = [_replace(SOURCE, 'count.Should().Be(5)', 'Assert.Equal(5, count)', 'Be')]
+    second = [_replace(SOURCE, 'count', 'total', 'Rename')]
+    merged, conflicts = merge([_plan('a', path, SOURCE, first), _plan('b', path, SOURCE, second)])
+    assert merged.files == {}
+    assert conflicts == [(path, 'line 3, column 9: Be of a overlaps Rename of b')]
+
+
+def test_merge_composes_a_plan_of_the_previous_result(tmp_path):
+    """Per-script plans, each computed on the output of the script before, merge into one"""
+    path = tmp_path / 'T.cs'
+    path.write_bytes(SOURCE.encode('utf-8'))
+    final = REGISTRY.stage('fix_final_should').plan
+    simple = REGISTRY.stage('fix_all_should').plan
+
+    def rename(text):
+        return [_replace(text, 'Assert.Equal(5, count)', 'Assert.Equal(5, total)', 'Rename')]
+
+    plans = []
+    text = SOURCE
+    for index, steps in enumerate([final, simple, rename]):
+        edits = steps(text)
+        plans.append(_plan(f'plan {index}', str(path), text, edits))
+        text = apply_edits(text, edits)
+    assert 'Assert.Equal(5, total)' in text and 'Assert.Equal(3, items.Count)' in text
+
+    merged, conflicts = merge(plans, lambda _: path.read_bytes())
+    assert conflicts == []
+    assert apply_edits(SOURCE, merged.files[str(path)].edits) == text
+
+    # Without the file, the plans cannot be told apart from plans of other contents
+    merged, conflicts = merge(plans)
+    assert merged.files == {}
+    assert 'planned against other contents' in conflicts[0][1]
+
+
+def test_replay_applies_plans_written_with_plan(tmp_path):
+    path = tmp_path / 'T.cs'
+    path.write_bytes(SOURCE.encode('utf-8'))
+    plan_path = str(tmp_path / 'fix.plan')
+    stage = REGISTRY.stage('fix_final_should')
+    assert list(rewrite_files([str(path)], stage, workers=1, plan=plan_path)) == [str(path)]
+    assert path.read_bytes() == SOURCE.encode('utf-8')
+
+    output = io.StringIO()
+    assert apply(Plan.load(plan_path), DiffWriter(output)) == 0
+    assert '+        Assert.Equal(5, count);' in output.getvalue()
+
+    with Transaction(str(tmp_path)) as transaction:
+        assert apply(Plan.load(plan_path), transaction) == 0
+    assert path.read_bytes() == stage.apply(SOURCE).encode('utf-8')
+
+    log = io.StringIO()
+    assert apply(Plan.load(plan_path), DiffWriter(io.StringIO()), log=log) == 1
+    assert 'changed since it was planned' in log.getvalue()
@@ -0,0 +1,78 @@
+"""Tests for the literal prefilter and its fallback without the regex parser (codemod/prefilter.py)
+
+    python -m pytest tests
+"""
+import pytest
+
+from codemod import Registry, RuleSet, prefilter
+from codemod.corpus import generate_corpus
+from codemod.fuzz import chained_sub
+from codemod.prefilter import LiteralIndex, analyze, canonical, line_windows, stop_pattern
+
+CORPUS = [content for _, content in generate_corpus(4, 4096, seed=2)]
+
+
+@pytest.fixture(params=['prefilter', 'no prefilter'])
+def registry(request, monkeypatch):
+    """The rule table built with the regex parser, and again with it patched out"""
+    if request.param == 'no prefilter':
+        monkeypatch.setattr(prefilter, 'sre_parse', None)
+    return Registry.load()
+
+
+def test_supported_python_has_the_parser():
+    """Fails, rather than silently falling back, on a CPython whose private parser moved or changed"""
+    assert prefilter.sre_parse is not None
+    for stage in Registry.load().stages.values():
+        if isinstance(stage, RuleSet):
+            assert all(rule.literal is not None for rule in stage.rules)
+
+
+def test_regex_stages_match_plain_re_sub(registry):
+    for stage in registry.stages.values():
+        if isinstance(stage, RuleSet):
+            reference = chained_sub(stage.rules)
+            assert [stage.apply(content) for content in CORPUS] == [reference(content) for content in CORPUS]
+
+
+def test_analyze_finds_the_literal_stops_and_bound():
+    literal, stops, bounded = analyze(r'(\w+)\.Should\(\)\.Be\(([^)]+)\)')
+    assert literal == '.Should().Be('
+    assert {' ', ';', '('} <= stops and 'a' not in stops and '_' not in stops
+    assert bounded
+
+
+def test_analyze_without_a_literal():
+    assert analyze(r'\w+') == (None, frozenset(), False)
+
+
+def test_canonical_ignores_how_the_pattern_is_spelled():
+    assert canonical('a[b]') == canonical('ab')
+    assert canonical('ab') != canonical('a[bc]')
+
+
+def test_literal_index_reports_prefixes_at_the_same_position():
+    index = LiteralIndex(['.Contains(', '.Assert.Contains('])
+    assert index.scan('x.Assert.Contains(y); z.Contains(w)') == {'.Assert.Contains(': [1], '.Contains(': [8, 23]}
+
+
+def test_line_window_runs_to_the_line_of_the_closing_parenthesis():
+    content = 'a;\nb.Should().Be(\n1);\nc;\n'
+    windows = line_windows(content, [(4, '.Should().Be(')], stop_pattern(frozenset(';\n')))
+    assert [content[start:end] for start, end in windows] == ['b.Should().Be(\n1);\n']
+
+
+def test_without_the_parser_nothing_is_prefiltered(monkeypatch):
+    parsed = Registry.load()
+    expected = {name: [stage.apply(content) for content in CORPUS] for name, stage in parsed.stages.items()}
+    monkeypatch.setattr(prefilter, 'sre_parse', None)
+    registry = Registry.load()
+    for name, stage in registry.stages.items():
+        if isinstance(stage, RuleSet):
+            assert all(rule.literal is None and rule.max_window is None for rule in stage.rules)
+        assert [stage.apply(content) for content in CORPUS] == expected[name]
+    assert registry.dropped == parsed.dropped
+
+
+def test_literal_index_without_literals_finds_nothing():
+    assert LiteralIndex([]).scan('a.Should().Be(1);') == {}
@@ -0,0 +1,55 @@
+"""Tests for the rule table and the merged pipeline of every stage (codemod/registry.py)"""
+import os
+
+from codemod import Registry, RuleSet, ShouldRewriter, find_files
+from codemod.structure import validate
+
+REGISTRY = Registry.load()
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _repo_sources():
+    """Text of every .cs file in the repository that calls .Should()"""
+    sources = []
+    for path in find_files(ROOT):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if b'.Should()' in data:
+            sources.append((path, data.decode('utf-8')))
+    return sources
+
+
+def test_pipeline_runs_the_tokenizer_first_and_supersedes_its_methods():
+    pipeline = REGISTRY.pipeline()
+    assert isinstance(pipeline.stages[0][1], ShouldRewriter)
+    covered = {rule.name for rule in pipeline.stages[0][1].rules}
+    for name, stage in pipeline.stages[1:]:
+        assert isinstance(stage, RuleSet)
+        assert all('.Should()' not in rule.pattern.replace('\\', '') for rule in stage.rules)
+    assert 'HaveCount' in covered and 'HaveCount' in pipeline.superseded['fix_all_should']
+    assert 'Fixup.Equal' not in pipeline.superseded['fix_all_should']
+
+
+def test_regex_stages_alone_keep_their_rules():
+    pipeline = REGISTRY.pipeline(['fix_all_should', 'fix_integration_tests'])
+    assert [name for name, _ in pipeline.stages] == ['fix_all_should', 'fix_integration_tests']
+    assert pipeline.superseded == {'fix_all_should': [], 'fix_integration_tests': []}
+
+
+def test_pipeline_leaves_calls_the_tokenizer_skips_alone():
+    content = 'x.Should().Be(5).And.NotBe(6);\n(a ?? b).Should().HaveCount(3);\n'
+    assert REGISTRY.pipeline()(content) == 'x.Should().Be(5).And.NotBe(6);\nAssert.Equal(3, (a ?? b).Count);\n'
+
+
+def test_pipeline_is_at_least_as_good_as_fix_final_on_the_repo():
+    """Every file the tokenizer stage converts cleanly, the pipeline converts cleanly and at least as far"""
+    final = REGISTRY.stage('fix_final_should')
+    pipeline = REGISTRY.pipeline()
+    sources = _repo_sources()
+    assert sources
+    for path, content in sources:
+        expected, rewritten = final(content), pipeline(content)
+        if not validate(content, expected):
+            assert validate(content, rewritten) == [], path
+        assert rewritten.count('.Should()') <= expected.count('.Should()'), path
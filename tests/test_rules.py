@@ -0,0 +1,58 @@
+"""Tests for the compiled rule engine: one scan per phase gives what chained re.sub did (codemod/rules.py)
+
+    python -m pytest tests
+"""
+import pytest
+
+from codemod import Registry, Rule, RuleSet
+from codemod.corpus import generate_corpus
+from codemod.fuzz import chained_sub
+from codemod.plan import apply_edits
+
+REGISTRY = Registry.load()
+REGEX_STAGES = [name for name in REGISTRY.stages if isinstance(REGISTRY.stage(name), RuleSet)]
+
+CORPUS = [content for _, content in generate_corpus(8, 4096, seed=1)]
+
+
+@pytest.mark.parametrize('name', REGEX_STAGES)
+def test_stage_matches_chained_sub(name):
+    """Each regex stage gives what its rules did as plain re.sub passes in order"""
+    stage = REGISTRY.stage(name)
+    reference = chained_sub(stage.rules)
+    for content in CORPUS:
+        assert stage.apply(content) == reference(content)
+    assert stage.warnings == []
+
+
+@pytest.mark.parametrize('name', REGEX_STAGES)
+def test_plan_makes_the_same_edits(name):
+    stage = REGISTRY.stage(name)
+    for content in CORPUS:
+        assert apply_edits(content, stage.plan(content)) == stage.apply(content)
+
+
+def test_earlier_rule_wins_at_the_same_position():
+    stage = RuleSet([
+        Rule('Specific', r'(\w+)\.Should\(\)\.Be\(0\)', r'Assert.Equal(0, \1)'),
+        Rule('General', r'(\w+)\.Should\(\)\.Be\(([^)]+)\)', r'Assert.Equal(\2, \1)'),
+        Rule('Never', r'(\w+)\.Should\(\)\.Be\((\d)\)', r'Assert.Never(\1)'),
+    ])
+    content = 'a.Should().Be(0); b.Should().Be(1); c.Should().Be(x);'
+    assert stage.apply(content) == 'Assert.Equal(0, a); Assert.Equal(1, b); Assert.Equal(x, c);'
+    assert stage.hits == {'Specific': 1, 'General': 2, 'Never': 0}
+    assert stage.apply_sequential(content) == stage.apply(content)
+
+
+def test_later_phase_sees_the_output_of_earlier_ones():
+    stage = RuleSet(
+        [Rule('Be', r'([\w.]+)\.Should\(\)\.Be\(([^)]+)\)', r'\1.Assert.Equal(\2)')],
+        [Rule('Fixup', r'(\w+)\.Assert\.Equal\(([^)]+)\)', r'Assert.Equal(\2, \1)', anchor='.Assert.')],
+    )
+    assert stage.apply('count.Should().Be(5);') == 'Assert.Equal(5, count);'
+
+
+def test_file_without_literals_is_returned_as_is():
+    stage = REGISTRY.stage('fix_all_should')
+    content = 'class T { void M() { Assert.Equal(1, x); } }\n'
+    assert stage.apply(content) is content
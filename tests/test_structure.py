@@ -0,0 +1,61 @@
+"""Tests for the structural checks run on every rewrite (codemod/structure.py)"""
+import pytest
+
+from codemod import RewriteRejected
+from codemod.structure import Validated, validate
+
+# What the rewriter produced for chained calls, comparisons and format arguments before they were handled
+BROKEN = [
+    ('a.Should().Be(1).And.NotBeNull();', 'Assert.Equal(1, a).And.NotBeNull();', 'void result of Assert.Equal'),
+    ('x.Should().NotBeNull().And.Subject.Should().Be(2);', 'Assert.NotNull(x)?.And.Subject.Should().Be(2);',
+     'void result of Assert.NotNull'),
+    ('x.Should().BeLessThan(ok ? 1 : 2);', 'Assert.True(x < ok ? 1 : 2);', 'comparison in Assert.True'),
+    ('x.Should().BeGreaterThan(a ?? b);', 'Assert.True(x > a ?? b);', 'comparison in Assert.True'),
+    ('x.Should().NotBe(a ?? b);', 'Assert.False(x == a ?? b);', 'comparison in Assert.False'),
+    ('count.Should().Be(5);', 'Assert.Equal(5);', 'Assert.Equal takes 2-3 arguments, not 1'),
+    ('count.Should().Be(5);', 'Assert.Equal(5, count;', 'unbalanced brackets'),
+    ('count.Should().Be(5);', 'count.Should();', "'.Should()' left without an assertion"),
+    ('count.Should().Be(5);', 'x.Assert.Equal(5, count);', "doubled '.Assert.' receiver"),
+]
+
+
+@pytest.mark.parametrize('old, new, message', BROKEN)
+def test_broken_rewrite_is_reported(old, new, message):
+    problems = validate(old, new)
+    assert [line for line, _ in problems] == [1]
+    assert message in problems[0][1]
+
+
+GOOD = [
+    ('x.Should().BeLessThan(ok ? 1 : 2);', 'Assert.True(x < (ok ? 1 : 2));'),
+    ('x.Should().BeGreaterThan(a ?? b);', 'Assert.True(x > (a ?? b));'),
+    ('x.Should().Be(a?[0]);', 'Assert.True(x == a?[0]);'),
+    ('x.Should().BeTrue();', 'Assert.True(x is int?);'),
+    ('x.Should().BeTrue();', 'Assert.True(ok ? a : b);'),
+    ('n.Should().BeGreaterThan(0);', 'Assert.True(Cache<int>.Count > 0);'),
+    ('flag.Should().BeTrue("because {0}", y);', 'Assert.True(flag, string.Format("because {0}", y));'),
+]
+
+
+@pytest.mark.parametrize('old, new', GOOD)
+def test_valid_rewrite_passes(old, new):
+    assert validate(old, new) == []
+
+
+def test_problems_already_there_are_not_blamed_on_the_rewrite():
+    old = 'Assert.Equal(1, a).And.NotBeNull();\nflag.Should().BeTrue();\n'
+    new = 'Assert.Equal(1, a).And.NotBeNull();\nAssert.True(flag);\n'
+    assert validate(old, new) == []
+
+
+def test_problem_is_reported_on_its_line():
+    old = 'class T {\n    void M() {\n        a.Should().Be(1).And.NotBeNull();\n    }\n}\n'
+    new = old.replace('a.Should().Be(1)', 'Assert.Equal(1, a)')
+    assert [line for line, _ in validate(old, new)] == [3]
+
+
+def test_validated_transform_rejects_broken_output():
+    transform = Validated(lambda text: text.replace('a.Should().Be(1)', 'Assert.Equal(1, a)'))
+    with pytest.raises(RewriteRejected, match='line 1: member access'):
+        transform('a.Should().Be(1).And.NotBeNull();')
+    assert transform('b.Should().Be(1);') == 'b.Should().Be(1);'
@@ -0,0 +1,81 @@
+"""Tests for the persistent symbol occurrence index (codemod/symbols.py)"""
+import io
+import os
+
+from codemod import SymbolIndex, symbol_index
+from codemod.symbols import INDEX_FILE
+
+CODE = '''class T {
+    void M() {
+        // x.Tell(y) in a comment does not count
+        var s = "a.Should() in a string";
+        result.Should().NotBeNull();
+        machine.ContextMap!["value"].Should().Be(1);
+        actor?.Tell(message);
+    }
+}
+'''
+
+
+def _tree(tmp_path):
+    tests = tmp_path / 'Tests'
+    tests.mkdir()
+    (tests / 'A.cs').write_text(CODE, encoding='utf-8')
+    (tmp_path / 'B.cs').write_text('class B { void M() { actor.Tell(1); } }\n', encoding='utf-8')
+    return tests
+
+
+def test_symbols_are_found_in_code_only(tmp_path):
+    tests = _tree(tmp_path)
+    index = symbol_index(str(tmp_path), log=io.StringIO())
+    a = str(tests / 'A.cs')
+    assert index.files(['.Should(']) == [a]
+    assert index.files(['.Tell(']) == sorted([a, str(tmp_path / 'B.cs')])
+    assert [line for _, line in index.occurrences('.Should(', a)] == [5, 6]
+    assert index.files(['ContextMap[']) == [a]
+    assert index.windows(['.Tell('], under=str(tests), context=1) == {a: [(5, 8)]}
+
+
+def test_update_reindexes_changed_files_only(tmp_path):
+    tests = _tree(tmp_path)
+    symbol_index(str(tmp_path), log=io.StringIO())
+
+    index = SymbolIndex.load(str(tmp_path / INDEX_FILE))
+    paths = sorted([str(tests / 'A.cs'), str(tmp_path / 'B.cs')])
+    assert index.update(paths) == [] and not index.dirty
+
+    (tmp_path / 'B.cs').write_text('class B { void M() { b.Should().BeTrue(); } }\n', encoding='utf-8')
+    os.utime(tmp_path / 'B.cs', ns=(1, 1))
+    assert index.update(paths) == [str(tmp_path / 'B.cs')] and index.dirty
+    assert index.files(['.Tell(']) == [str(tests / 'A.cs')]
+    assert index.files(['.Should(']) == paths
+
+    assert index.update(paths[:1]) == []
+    assert index.files(['.Should(']) == paths[:1]
+
+
+def test_unreadable_files_are_reported_and_left_out(tmp_path):
+    tests = _tree(tmp_path)
+    (tests / 'Latin1.cs').write_bytes(b'// caf\xe9\nclass C { void M() { c.Should().BeTrue(); } }\n')
+    log = io.StringIO()
+    index = symbol_index(str(tmp_path), log=log)
+    assert index.files(['.Should(']) == [str(tests / 'A.cs')]
+    assert [path for path, _ in index.errors] == [str(tests / 'Latin1.cs')]
+    assert f'Warning: {tests / "Latin1.cs"}: not indexed' in log.getvalue()
+
+    (tests / 'Latin1.cs').write_text('class C { void M() { c.Should().BeTrue(); } }\n', encoding='utf-8')
+    index = symbol_index(str(tmp_path), log=io.StringIO())
+    assert index.errors == [] and str(tests / 'Latin1.cs') in index.files(['.Should('])
+
+
+def test_under_ignores_case_and_separators(tmp_path, monkeypatch):
+    tests = _tree(tmp_path)
+    index = symbol_index(str(tmp_path), log=io.StringIO())
+    a = str(tests / 'A.cs')
+    assert index.files(['.Should('], under=str(tests) + os.sep) == [a]
+    assert index.files(['.Should('], under=os.path.join(str(tmp_path), 'Tests', '..', 'Tests')) == [a]
+    assert index.files(['.Tell('], under=str(tests)) == [a]
+
+    # As on Windows, where the script's directory and the walked paths may differ in case
+    monkeypatch.setattr(os.path, 'normcase', str.lower)
+    assert index.files(['.Should('], under=str(tests).upper()) == [a]
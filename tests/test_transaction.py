@@ -0,0 +1,115 @@
+"""Tests for staged rewrites and dry-run diffs (codemod/transaction.py, codemod/diff.py)"""
+import io
+import os
+
+import pytest
+
+from codemod import Registry, rewrite_files
+from codemod.csharp import block_end
+from codemod.diff import DiffWriter
+from codemod.transaction import Transaction
+
+STAGE = Registry.load().stage('fix_all_should')
+
+ORIGINAL = b'class A {\n    void M() { count.Should().Be(5); }\n}\n'
+REWRITTEN = b'class A {\n    void M() { Assert.Equal(5, count); }\n}\n'
+
+
+def _tree(tmp_path, count=3):
+    paths = [tmp_path / f'F{index}.cs' for index in range(count)]
+    for index, path in enumerate(paths):
+        path.write_bytes(b'// %d\n' % index)
+    return paths
+
+
+def _staging(tmp_path):
+    return [name for name in os.listdir(tmp_path) if name.startswith('.codemod-staging-')]
+
+
+def test_commit_replaces_every_file(tmp_path):
+    paths = _tree(tmp_path)
+    transaction = Transaction(str(tmp_path))
+    for path in paths:
+        transaction.stage(str(path), b'new ' + path.read_bytes())
+    assert paths[0].read_bytes() == b'// 0\n'
+
+    assert transaction.commit() == [str(path) for path in paths]
+    assert [path.read_bytes() for path in paths] == [b'new // %d\n' % index for index in range(3)]
+    assert _staging(tmp_path) == []
+
+
+def test_rollback_leaves_the_tree_untouched(tmp_path):
+    paths = _tree(tmp_path)
+    with pytest.raises(RuntimeError):
+        with Transaction(str(tmp_path)) as transaction:
+            for path in paths:
+                transaction.stage(str(path), b'new')
+            raise RuntimeError('interrupted')
+    assert [path.read_bytes() for path in paths] == [b'// %d\n' % index for index in range(3)]
+    assert _staging(tmp_path) == []
+
+
+def test_failure_during_commit_restores_the_replaced_files(tmp_path, monkeypatch):
+    paths = _tree(tmp_path)
+    transaction = Transaction(str(tmp_path))
+    for path in paths:
+        transaction.stage(str(path), b'new')
+
+    replace = os.replace
+
+    def failing(source, target):
+        if target == str(paths[2]):
+            raise OSError('disk full')
+        replace(source, target)
+
+    monkeypatch.setattr(os, 'replace', failing)
+    with pytest.raises(OSError):
+        transaction.commit()
+    assert [path.read_bytes() for path in paths] == [b'// %d\n' % index for index in range(3)]
+    assert _staging(tmp_path) == []
+
+
+def test_stopping_a_run_early_writes_nothing(tmp_path):
+    a, b = tmp_path / 'A.cs', tmp_path / 'B.cs'
+    a.write_bytes(ORIGINAL)
+    b.write_bytes(ORIGINAL)
+    run = rewrite_files([str(a), str(b)], STAGE, workers=1)
+    assert next(run) == str(a)
+    run.close()
+    assert a.read_bytes() == ORIGINAL and b.read_bytes() == ORIGINAL
+    assert _staging(tmp_path) == []
+
+
+def test_diff_keeps_missing_final_newline():
+    output = io.StringIO()
+    DiffWriter(output).diff('A.cs', 'a\nb', 'a\nc')
+    assert output.getvalue() == ('--- a/A.cs\n+++ b/A.cs\n@@ -1,2 +1,2 @@\n a\n'
+                                 '-b\n\\ No newline at end of file\n+c\n\\ No newline at end of file\n')
+
+
+def test_streamed_diff_matches_whole_file_diff(tmp_path):
+    statements = [f'value{index}.Should().Be({index});' if index % 10 == 0 else f'value{index} = {index};'
+                  for index in range(200)]
+    methods = ''.join(f'    void M{index}() {{\n        {statement}\n    }}\n'
+                      for index, statement in enumerate(statements))
+    text = 'class A {\n' + methods + '}\n'
+    path = tmp_path / 'A.cs'
+    path.write_bytes(text.encode('utf-8'))
+
+    whole, streamed = io.StringIO(), io.StringIO()
+    DiffWriter(whole).diff(str(path), text, STAGE(text))
+    assert DiffWriter(streamed).diff_blocks(str(path), STAGE, block_end, chunk_size=256)
+    assert streamed.getvalue() == whole.getvalue()
+    assert whole.getvalue().count('@@ -') == 20
+    assert not DiffWriter(io.StringIO()).diff_blocks(str(path), lambda block: block, block_end, chunk_size=256)
+
+
+def test_dry_run_diffs_instead_of_writing(tmp_path):
+    path = tmp_path / 'A.cs'
+    path.write_bytes(ORIGINAL)
+    output = io.StringIO()
+    assert list(rewrite_files([str(path)], STAGE, workers=1, dry_run=True, diff_output=output)) == [str(path)]
+    assert path.read_bytes() == ORIGINAL
+    expected = io.StringIO()
+    DiffWriter(expected).diff(str(path), ORIGINAL.decode('utf-8'), REWRITTEN.decode('utf-8'))
+    assert output.getvalue() == expected.getvalue()
@@ -0,0 +1,59 @@
+"""Tests for rewrite_files on raw bytes: BOMs, line endings and undecoded files (codemod/walker.py)"""
+import os
+
+from codemod import Registry, rewrite_files
+
+BOM = b'\xef\xbb\xbf'
+
+STAGE = Registry.load().stage('fix_all_should')
+
+
+def test_rewrite_keeps_bom_and_crlf(tmp_path):
+    source = BOM + b'class T {\r\n    void M() {\r\n        count.Should().Be(5);\r\n    }\r\n}\r\n'
+    untouched = BOM + b'class U {\r\n}\n'
+    changed = tmp_path / 'T.cs'
+    unchanged = tmp_path / 'U.cs'
+    changed.write_bytes(source)
+    unchanged.write_bytes(untouched)
+
+    assert list(rewrite_files([str(changed), str(unchanged)], STAGE, workers=1)) == [str(changed)]
+    expected = BOM + b'class T {\r\n    void M() {\r\n        Assert.Equal(5, count);\r\n    }\r\n}\r\n'
+    assert changed.read_bytes() == expected
+    assert unchanged.read_bytes() == untouched
+
+
+def test_file_without_required_literal_is_not_decoded(tmp_path, capsys):
+    # Not UTF-8: decoding it would fail and report an error
+    latin1 = tmp_path / 'Latin1.cs'
+    latin1.write_bytes(b'// caf\xe9\nclass T { }\n')
+
+    assert list(rewrite_files([str(latin1)], STAGE, required=('.Should()',), workers=1)) == []
+    assert 'Error' not in capsys.readouterr().out
+    assert list(rewrite_files([str(latin1)], STAGE, workers=1)) == []
+    assert f'Error processing {latin1}' in capsys.readouterr().out
+
+
+def test_process_pool_matches_serial_run(tmp_path, capsys):
+    """Chunks fanned out to workers give the serial run's files, order, errors and merged rule counts"""
+    sources = {f'F{index:02}.cs': (f'class F{index} {{\n    void M() {{ value{index}.Should().Be({index}); }}\n}}\n'
+                                   .encode('utf-8') if index % 3 else b'class Plain { }\n')
+               for index in range(12)}
+    sources['F07.cs'] = b'// caf\xe9\nclass T { void M() { x.Should().BeTrue(); } }\n'
+    runs = {}
+    for name, workers in (('serial', 1), ('pool', 3)):
+        root = tmp_path / name
+        root.mkdir()
+        for file_name, data in sources.items():
+            (root / file_name).write_bytes(data)
+        stage = Registry.load().stage('fix_all_should')
+        paths = [str(root / file_name) for file_name in sorted(sources)]
+        changed = [os.path.basename(path) for path in rewrite_files(paths, stage, workers=workers, chunk_size=2)]
+        contents = {file_name: (root / file_name).read_bytes() for file_name in sources}
+        errors = [line.split(os.sep)[-1] for line in capsys.readouterr().out.splitlines()]
+        runs[name] = changed, contents, errors, stage.hits
+
+    assert runs['pool'] == runs['serial']
+    changed, _, errors, hits = runs['pool']
+    assert changed == sorted(changed) and len(changed) == 7
+    assert len(errors) == 1 and errors[0].startswith('F07.cs: ')
+    assert hits['Be'] == 7
@@ -0,0 +1,99 @@
+"""Tests for the change batching of the watch mode (codemod/watch.py)"""
+import os
+import sys
+import time
+
+import pytest
+
+from codemod import watch
+from codemod.watch import InotifyWatcher, PollingWatcher, batches
+
+
+class Clock:
+    """Stands in for the time module in codemod.watch: sleeping only advances monotonic()"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def monotonic(self):
+        return self.now
+
+    perf_counter = monotonic
+
+
+class ScriptedWatcher:
+    """Polled watcher whose read() returns the given change sets, then nothing"""
+
+    def __init__(self, changes):
+        self.changes = list(changes)
+
+    def fileno(self):
+        return None
+
+    def read(self):
+        return self.changes.pop(0) if self.changes else set()
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(watch, 'time', clock)
+    monkeypatch.setattr(watch, 'POLL_INTERVAL', 0.125)  # exact in binary, so the clock does not drift
+    return clock
+
+
+def test_events_are_held_until_the_trees_are_quiet(clock):
+    stream = batches(ScriptedWatcher([{'a'}, {'b'}, {'a', 'c'}, set(), {'d'}]), debounce=0.125)
+    assert next(stream) == {'a', 'b', 'c'}
+    assert clock.now == 0.5
+    assert next(stream) == {'d'}
+
+
+def test_continuous_events_are_flushed_after_max_delay(clock):
+    stream = batches(ScriptedWatcher({f'f{index}'} for index in range(100)), debounce=0.125, max_delay=0.5)
+    assert next(stream) == {f'f{index}' for index in range(5)}
+    assert clock.now == 0.625
+    assert next(stream) == {f'f{index}' for index in range(5, 10)}
+
+
+def test_overflow_discards_pending_changes(clock):
+    stream = batches(ScriptedWatcher([{'a'}, None, {'b'}]), debounce=0.125)
+    assert next(stream) is None
+    assert next(stream) == {'b'}
+
+
+def test_polling_watcher_reports_changed_files(tmp_path):
+    a, b = tmp_path / 'A.cs', tmp_path / 'B.cs'
+    a.write_bytes(b'class A {}\n')
+    (tmp_path / 'obj').mkdir()
+    watcher = PollingWatcher([str(tmp_path)])
+    assert watcher.read() == set()
+
+    a.write_bytes(b'class A { }\n')
+    b.write_bytes(b'class B {}\n')
+    (tmp_path / 'obj' / 'Generated.cs').write_bytes(b'class G {}\n')
+    assert watcher.read() == {str(a), str(b)}
+    assert watcher.read() == set()
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='inotify is Linux only')
+def test_inotify_batch_holds_a_burst_of_writes(tmp_path):
+    watcher = InotifyWatcher([str(tmp_path)])
+    try:
+        (tmp_path / 'A.cs').write_bytes(b'class A {}\n')
+        (tmp_path / 'Sub').mkdir()
+        (tmp_path / 'Sub' / 'B.cs').write_bytes(b'class B {}\n')
+        (tmp_path / '.codemod-staging-x').mkdir()
+        os.replace(tmp_path / 'A.cs', tmp_path / 'C.cs')
+        started = time.monotonic()
+        batch = next(batches(watcher, debounce=0.05))
+    finally:
+        watcher.close()
+    assert batch == {str(tmp_path / 'A.cs'), str(tmp_path / 'C.cs'), str(tmp_path / 'Sub' / 'B.cs')}
+    assert time.monotonic() - started >= 0.05